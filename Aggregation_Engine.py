@@ -0,0 +1,178 @@
+"""
+Aggregation Engine
+Shared group-by engine for the analysis report and the visualizations.
+
+Every grouping column is factorized (hashed to dense integer codes) once and
+cached; each report section is then a handful of `np.bincount` calls over
+those codes instead of a separate `DataFrame.groupby` with its own hashing
+and sorting.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class AggregationEngine:
+    def __init__(self, df):
+        """Wrap a final dataset; nothing is computed until a section asks for it"""
+        self.df = df
+        self._factorized = {}
+        self._values = {}
+        self._filled_values = {}
+        self._groups = {}
+
+    def factorize(self, column):
+        """Return (codes, uniques) for a column, computed once per column
+
+        Codes follow the sorted order of the values (category order for
+        categoricals), matching the ordering of `groupby(sort=True)`.
+        Missing values get code -1.
+        """
+        if column not in self._factorized:
+            codes, uniques = pd.factorize(self.df[column], sort=True)
+            self._factorized[column] = (codes.astype(np.int64), uniques)
+        return self._factorized[column]
+
+    def values(self, column):
+        """Return a column as a float64 array (NaN for missing), cached"""
+        if column not in self._values:
+            self._values[column] = self.df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        return self._values[column]
+
+    def group_codes(self, keys, dropna=True):
+        """Combine one or more factorized keys into dense group codes
+
+        Returns (codes, index) where `codes` holds one group number per row
+        (-1 when any key is missing, like groupby's dropna) and `index` is the
+        matching pandas Index / MultiIndex of observed groups. With
+        dropna=False a missing value is a group of its own, sorted last.
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+
+        factorized = [self.factorize(key) for key in keys]
+        if not dropna:
+            factorized = [_missing_as_group(codes, uniques) for codes, uniques in factorized]
+        if len(factorized) == 1:
+            codes, uniques = factorized[0]
+            return codes, pd.Index(uniques, name=keys[0])
+
+        # Mixed-radix combination of the per-key codes (lexicographic order),
+        # re-compacted whenever the radix would overflow int64
+        combined = np.zeros(len(self.df), dtype=np.int64)
+        missing = np.zeros(len(self.df), dtype=bool)
+        radix = 1
+        for codes, uniques in factorized:
+            if radix * max(len(uniques), 1) >= 2 ** 62:
+                combined, compacted = pd.factorize(combined, sort=True)
+                radix = len(compacted)
+            combined = combined * len(uniques) + np.maximum(codes, 0)
+            radix *= max(len(uniques), 1)
+            missing |= codes < 0
+
+        # Only observed combinations get a group number (hash based, only the
+        # distinct combinations are sorted)
+        present = ~missing
+        codes, observed = pd.factorize(combined[present], sort=True)
+        group_codes = np.full(len(self.df), -1, dtype=np.int64)
+        group_codes[present] = codes
+
+        first_rows = _first_positions(codes, len(observed))
+        index = pd.MultiIndex.from_arrays(
+            [uniques.take(key_codes[present][first_rows]) for key_codes, uniques in factorized],
+            names=keys
+        )
+        return group_codes, index
+
+    def aggregate(self, keys, sums=(), means=(), nunique=(), first=(), counts=(), dropna=True):
+        """Aggregate per group of `keys` in one pass over the shared codes
+
+        Always returns a 'count' column (rows per group) plus
+        '<column>_sum', '<column>_mean', '<column>_nunique',
+        '<column>_first' and '<column>_count' (non-missing values) for the
+        requested columns. Missing values are
+        skipped the same way pandas does; rows with a missing key are
+        dropped unless dropna=False.
+        """
+        codes, index = self._bucketed_codes(keys, dropna)
+        n_groups = len(index)
+
+        def bincount(weights=None):
+            # Rows with a missing key land in the extra last bucket
+            return np.bincount(codes, weights=weights, minlength=n_groups + 1)[:n_groups]
+
+        result = {'count': bincount()}
+
+        for column in dict.fromkeys(list(sums) + list(means)):
+            filled, present = self._filled(column)
+            total = bincount(filled)
+            if column in sums:
+                result[f'{column}_sum'] = total
+            if column in means:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result[f'{column}_mean'] = total / bincount(present)
+
+        for column in counts:
+            _, present = self._filled(column)
+            result[f'{column}_count'] = bincount(present).astype(np.int64)
+
+        for column in nunique:
+            value_codes, uniques = self.factorize(column)
+            valid = (codes < n_groups) & (value_codes >= 0)
+            pairs = pd.unique(codes[valid] * len(uniques) + value_codes[valid])
+            result[f'{column}_nunique'] = np.bincount(pairs // len(uniques), minlength=n_groups)
+
+        for column in first:
+            _, present = self._filled(column)
+            value_codes = np.where(present > 0, codes, n_groups)
+            positions = _first_positions(value_codes, n_groups + 1)[:n_groups]
+            firsts = self.values(column)[np.maximum(positions, 0)]
+            firsts[positions < 0] = np.nan
+            result[f'{column}_first'] = firsts
+
+        return pd.DataFrame(result, index=index)
+
+    def _bucketed_codes(self, keys, dropna=True):
+        """Group codes with missing keys mapped to an extra bucket, cached per key set"""
+        cache_key = ((keys,) if isinstance(keys, str) else tuple(keys), dropna)
+        if cache_key not in self._groups:
+            codes, index = self.group_codes(keys, dropna)
+            self._groups[cache_key] = (np.where(codes < 0, len(index), codes), index)
+        return self._groups[cache_key]
+
+    def _filled(self, column):
+        """(values with NaN as 0, 1.0/0.0 presence weights) for a numeric column"""
+        if column not in self._filled_values:
+            values = self.values(column)
+            present = ~np.isnan(values)
+            self._filled_values[column] = (np.where(present, values, 0.0), present.astype(np.float64))
+        return self._filled_values[column]
+
+    def summary(self, column):
+        """Whole-column statistics for the revenue distribution section"""
+        values = self.values(column)
+        values = values[~np.isnan(values)]
+        return {
+            'sum': values.sum(),
+            'mean': values.mean(),
+            'median': np.median(values),
+            'std': values.std(ddof=1),
+            'min': values.min(),
+            'max': values.max(),
+        }
+
+
+def _missing_as_group(codes, uniques):
+    """Factorized key with missing values (-1) turned into a last, NaN group"""
+    missing = codes < 0
+    if not missing.any():
+        return codes, uniques
+    return np.where(missing, len(uniques), codes), uniques.insert(len(uniques), np.nan)
+
+
+def _first_positions(codes, n_groups):
+    """Position of the first row of every group (-1 for empty groups)"""
+    positions = np.full(n_groups, -1, dtype=np.int64)
+    # Assign in reverse so the earliest row of each group is written last
+    positions[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+    return positions
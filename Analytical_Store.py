@@ -0,0 +1,248 @@
+"""
+Analytical Store
+Persistent local SQL store of the integrated dataset for ad-hoc questions
+("revenue of Italian food in Pune in Q3") without reloading the CSV.
+
+The final dataset is materialized into one `orders` table, either in a
+DuckDB database (a `.duckdb` path, requires the duckdb package) or in
+SQLite (any other path, standard library). Rows are inserted sorted by
+order_date. DuckDB keeps min/max zonemaps per row group, so date filters on
+the sorted table skip most of it. SQLite gets B-tree indexes:
+
+- order_date;
+- (restaurant_id, order_date);
+- (city, cuisine, order_date, total_amount), which covers revenue questions
+  by city and cuisine without touching the table.
+
+Dates are stored as ISO 'YYYY-MM-DD' (a DATE in DuckDB).
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+TABLE = 'orders'
+
+# SQLite indexes: name -> columns (DuckDB relies on the order_date sort)
+SQLITE_INDEXES = {
+    'idx_orders_order_date': ['order_date'],
+    'idx_orders_restaurant': ['restaurant_id', 'order_date'],
+    'idx_orders_city_cuisine': ['city', 'cuisine', 'order_date', 'total_amount'],
+}
+
+# Rows converted to Python values and inserted per executemany() (SQLite)
+INSERT_BLOCK_ROWS = 100_000
+
+# Measures of summarize()
+SUMMARY_MEASURES = (
+    "COUNT(*) AS orders, SUM(total_amount) AS revenue, "
+    "AVG(total_amount) AS avg_order_value, COUNT(DISTINCT user_id) AS unique_users"
+)
+
+
+class AnalyticalStore:
+    def __init__(self, path, engine=None):
+        """Open (or create) the store at `path`
+
+        `engine` is 'duckdb' or 'sqlite'; by default a `.duckdb` extension
+        selects DuckDB and anything else SQLite.
+        """
+        if engine is None:
+            engine = 'duckdb' if os.path.splitext(path)[1].lower() == '.duckdb' else 'sqlite'
+        if engine not in ('duckdb', 'sqlite'):
+            raise ValueError("engine must be 'duckdb' or 'sqlite'")
+        self.path = path
+        self.engine = engine
+        if engine == 'duckdb':
+            import duckdb
+            self.conn = duckdb.connect(path)
+        else:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode = WAL")
+
+    def write(self, df, replace=False):
+        """Insert the rows of a final dataset (or a chunk of one), sorted by order_date
+
+        `replace=True` drops the existing table first. Indexes are built by
+        finish(), after the bulk load.
+        """
+        if replace:
+            self.conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        df = df.sort_values('order_date', kind='stable')
+        if not self.columns:
+            self.conn.execute(f"CREATE TABLE {TABLE} ({self._schema(df)})")
+
+        if self.engine == 'duckdb':
+            # Categoricals arrive as ENUMs and datetimes as TIMESTAMPs
+            select = ', '.join(
+                f"CAST({column} AS {self._column_type(df[column])})" for column in df.columns
+            )
+            self.conn.register('chunk', df)
+            self.conn.execute(f"INSERT INTO {TABLE} SELECT {select} FROM chunk")
+            self.conn.unregister('chunk')
+            return
+        insert = f"INSERT INTO {TABLE} ({', '.join(df.columns)}) VALUES ({', '.join('?' * len(df.columns))})"
+        with self.conn:
+            for start in range(0, len(df), INSERT_BLOCK_ROWS):
+                block = df.iloc[start:start + INSERT_BLOCK_ROWS]
+                self.conn.executemany(insert, zip(*(_sqlite_values(block[column]) for column in block.columns)))
+
+    def finish(self):
+        """Create the indexes and refresh the planner statistics"""
+        if self.engine == 'duckdb':
+            self.conn.execute("CHECKPOINT")
+            return
+        with self.conn:
+            for name, columns in SQLITE_INDEXES.items():
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE} ({', '.join(columns)})")
+            self.conn.execute("ANALYZE")
+
+    def materialize(self, df):
+        """Replace the stored table with `df` and index it"""
+        self.write(df, replace=True)
+        self.finish()
+        return self.row_count()
+
+    def query(self, sql, params=()):
+        """Result of a SQL query as a DataFrame"""
+        if self.engine == 'duckdb':
+            return self.conn.execute(sql, list(params)).df()
+        return pd.read_sql_query(sql, self.conn, params=list(params))
+
+    def summarize(self, by=(), start=None, end=None, **filters):
+        """Orders, revenue, average order value and unique users, grouped by `by`
+
+        `start`/`end` bound order_date (inclusive, 'YYYY-MM-DD'); every other
+        keyword filters a column on a value or a list of values, e.g.
+        summarize(['cuisine'], city='Pune', quarter=3).
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = set(by) | set(filters)
+        unknown -= set(self.columns)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+
+        conditions, params = [], []
+        date_param = 'CAST(? AS DATE)' if self.engine == 'duckdb' else '?'
+        if start is not None:
+            conditions.append(f"order_date >= {date_param}")
+            params.append(str(start))
+        if end is not None:
+            conditions.append(f"order_date <= {date_param}")
+            params.append(str(end))
+        for column, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        sql = f"SELECT {', '.join(by + [SUMMARY_MEASURES])} FROM {TABLE}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if by:
+            sql += f" GROUP BY {', '.join(by)} ORDER BY revenue DESC"
+        return self.query(sql, params)
+
+    @property
+    def columns(self):
+        """Columns of the stored table (empty before the first write)"""
+        if self.engine == 'duckdb':
+            rows = self.conn.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = ? "
+                "ORDER BY ordinal_position", [TABLE]).fetchall()
+        else:
+            rows = self.conn.execute(f"SELECT name FROM pragma_table_info('{TABLE}')").fetchall()
+        return [row[0] for row in rows]
+
+    def row_count(self):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _schema(self, df):
+        return ', '.join(f"{column} {self._column_type(df[column])}" for column in df.columns)
+
+    def _column_type(self, series):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return 'DATE' if self.engine == 'duckdb' else 'TEXT'
+        if pd.api.types.is_integer_dtype(series):
+            return 'BIGINT' if self.engine == 'duckdb' else 'INTEGER'
+        if pd.api.types.is_float_dtype(series):
+            return 'DOUBLE' if self.engine == 'duckdb' else 'REAL'
+        return 'VARCHAR' if self.engine == 'duckdb' else 'TEXT'
+
+
+def _sqlite_values(series):
+    """Python values of a column for executemany (NULL for missing values)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # Formatted once per distinct day
+        codes, uniques = pd.factorize(series)
+        labels = np.append(uniques.strftime('%Y-%m-%d').to_numpy(dtype=object), None)
+        return labels[codes].tolist()
+    if series.dtype == np.float32:
+        # Widen without float32 artifacts (4.1 -> 4.099999904...)
+        return series.astype('float64').round(6).tolist()
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_float_dtype(series):
+        return series.tolist()
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def parse_filter(text):
+    """'city=Pune' or 'quarter=3' -> ('city', 'Pune') / ('quarter', 3); commas give a list"""
+    column, _, value = text.partition('=')
+    if not column or not value:
+        raise argparse.ArgumentTypeError(f"Expected COLUMN=VALUE, got {text!r}")
+    values = [int(part) if part.lstrip('-').isdigit() else part for part in value.split(',')]
+    return column, values if len(values) > 1 else values[0]
+
+
+def parse_args(argv=None):
+    """Command line options for querying a store"""
+    parser = argparse.ArgumentParser(description="Query the materialized food delivery dataset")
+    parser.add_argument('store', help="Store written by the pipeline's --store option")
+    parser.add_argument('sql', nargs='?', help="SQL to run against the `orders` table")
+    parser.add_argument('--by', nargs='+', default=[], help="Group the summary by these columns")
+    parser.add_argument('--where', nargs='+', type=parse_filter, default=[], metavar='COLUMN=VALUE',
+                        help="Summary filters, e.g. city=Pune cuisine=Italian,Chinese quarter=3")
+    parser.add_argument('--start', help="First order_date of the summary (YYYY-MM-DD)")
+    parser.add_argument('--end', help="Last order_date of the summary (YYYY-MM-DD)")
+    parser.add_argument('--engine', choices=['duckdb', 'sqlite'],
+                        help="Store engine (default: from the file extension)")
+    parser.add_argument('--output', help="Also save the result as CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.store):
+        raise SystemExit(f"No store at {args.store}")
+
+    with AnalyticalStore(args.store, args.engine) as store:
+        start = time.perf_counter()
+        if args.sql:
+            result = store.query(args.sql)
+        else:
+            result = store.summarize(args.by, args.start, args.end, **dict(args.where))
+        elapsed = time.perf_counter() - start
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(result.to_string(index=False))
+    print(f"\n✓ {len(result)} rows in {elapsed:.3f} s")
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"✓ Result saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Benchmark Harness
+Times every stage of the integration pipeline and every chart on a source
+dataset (generated with Synthetic_Data.py when none is given), and appends
+the results to a JSON Lines history so that runs can be compared.
+
+Each run is stored with its dataset parameters, settings, git commit and
+host details. `--compare-to previous` (the default) compares the new run
+with the last stored run on the same dataset and settings and flags stages
+that got slower than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from Create_Visualizations import compute_chart_data, render_charts
+from Food_Delivery_Data_Integration import FoodDeliveryDataIntegration
+from Pipeline_Profiler import StageProfiler
+from Synthetic_Data import generate_dataset
+
+DEFAULT_RESULTS_PATH = 'benchmarks/results.jsonl'
+
+# Stages slower than the baseline by more than this fraction are flagged
+DEFAULT_THRESHOLD = 0.10
+
+
+def run_pipeline(paths, work_dir, charts=True, dpi=72, workers=1, chart_workers=1, join_mode='index',
+                 concurrent_load=False, validate=False):
+    """One measured run of steps 1-5, the report and (optionally) the charts"""
+    profiler = StageProfiler()
+    integration = FoodDeliveryDataIntegration(
+        paths['orders'], paths['users'], paths['restaurants'],
+        join_mode=join_mode, profiler=profiler, verbose=False, workers=workers
+    )
+    if concurrent_load:
+        integration.load_sources()
+    else:
+        integration.load_csv_data()
+        integration.load_json_data()
+        integration.load_sql_data()
+    if validate:
+        integration.validate_sources()
+    integration.merge_datasets()
+    integration.create_final_dataset(os.path.join(work_dir, 'final_food_delivery_dataset.csv'))
+    integration.generate_analysis_report()
+
+    if charts:
+        # Charts roll up the cube built by the report
+        with profiler.stage('compute_chart_data', rows_in=integration.cube.size):
+            chart_data = compute_chart_data(integration.cube)
+        render_charts(chart_data, os.path.join(work_dir, 'charts'), dpi=dpi, workers=chart_workers,
+                      profiler=profiler)
+    return profiler.records
+
+
+def best_of(runs):
+    """Per stage, the record of the fastest run (wall time)"""
+    best = {}
+    for records in runs:
+        for record in records:
+            stage = record['stage']
+            if stage not in best or record['wall_s'] < best[stage]['wall_s']:
+                best[stage] = record
+    return list(best.values())
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_result(path, result):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(result, default=str) + '\n')
+
+
+def find_baseline(results, current, compare_to='previous'):
+    """Last stored run comparable with `current` ('previous') or with a given label"""
+    for result in reversed(results):
+        if compare_to == 'previous':
+            if result['dataset'] == current['dataset'] and result['settings'] == current['settings']:
+                return result
+        elif result.get('label') == compare_to:
+            return result
+    return None
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Stage-by-stage wall time of two runs, with slower stages flagged"""
+    base = {record['stage']: record['wall_s'] for record in baseline['stages']}
+    rows = []
+    for record in current['stages']:
+        before = base.get(record['stage'])
+        change = (record['wall_s'] / before - 1) if before else None
+        rows.append({
+            'stage': record['stage'],
+            'baseline_s': before,
+            'current_s': record['wall_s'],
+            'change_%': round(change * 100, 1) if change is not None else None,
+            'regression': change is not None and change > threshold,
+        })
+    return pd.DataFrame(rows)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def host_info():
+    return {
+        'machine': platform.node(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+    }
+
+
+def parse_args(argv=None):
+    """Command line options for the benchmark harness"""
+    parser = argparse.ArgumentParser(description="Benchmark the food delivery pipeline")
+    parser.add_argument('--data-dir',
+                        help="Existing orders.csv / users.json(l) / restaurants.sql to benchmark "
+                             "(default: generate synthetic data)")
+    parser.add_argument('--orders', type=int, default=1_000_000, help="Synthetic orders")
+    parser.add_argument('--users', type=int, default=100_000, help="Synthetic users")
+    parser.add_argument('--restaurants', type=int, default=5_000, help="Synthetic restaurants")
+    parser.add_argument('--user-skew', type=float, default=1.0, help="Zipf exponent of order user_ids")
+    parser.add_argument('--restaurant-skew', type=float, default=0.8,
+                        help="Zipf exponent of order restaurant_ids")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed of the synthetic data")
+    parser.add_argument('--work-dir', help="Where data and outputs are written (default: a temp dir)")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per benchmark; the fastest counts")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for the report's cube and the CSV output")
+    parser.add_argument('--join', choices=['index', 'merge', 'spill'], default='index', help="Join strategy")
+    parser.add_argument('--concurrent-load', action='store_true',
+                        help="Load the three sources concurrently")
+    parser.add_argument('--validate', action='store_true',
+                        help="Run the data-quality validation stage before the merge")
+    parser.add_argument('--no-charts', action='store_true', help="Skip chart rendering")
+    parser.add_argument('--dpi', type=int, default=72, help="Chart resolution")
+    parser.add_argument('--chart-workers', type=int, default=1, help="Chart rendering processes")
+    parser.add_argument('--label', help="Name stored with the run (e.g. a branch or change)")
+    parser.add_argument('--results', default=DEFAULT_RESULTS_PATH, help="JSON Lines history of runs")
+    parser.add_argument('--compare-to', default='previous',
+                        help="'previous' comparable run, a stored --label, or 'none'")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Flag stages slower than the baseline by more than this fraction")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="Exit with status 1 when a stage is flagged")
+    return parser.parse_args(argv)
+
+
+def users_path(data_dir):
+    """users.json, or users.jsonl (as Synthetic_Data writes with users_format='jsonl'), in `data_dir`"""
+    for name in ['users.json', 'users.jsonl']:
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No users.json or users.jsonl in {data_dir}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='food_delivery_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    if args.data_dir:
+        paths = {
+            'orders': os.path.join(args.data_dir, 'orders.csv'),
+            'users': users_path(args.data_dir),
+            'restaurants': os.path.join(args.data_dir, 'restaurants.sql'),
+        }
+        dataset = {'data_dir': os.path.abspath(args.data_dir),
+                   'orders_bytes': os.path.getsize(paths['orders'])}
+    else:
+        dataset = {
+            'orders': args.orders, 'users': args.users, 'restaurants': args.restaurants,
+            'user_skew': args.user_skew, 'restaurant_skew': args.restaurant_skew, 'seed': args.seed,
+        }
+        print(f"Generating synthetic data in {work_dir} ...")
+        paths = generate_dataset(os.path.join(work_dir, 'data'), **dataset)
+
+    settings = {
+        'workers': args.workers, 'join': args.join, 'concurrent_load': args.concurrent_load,
+        'validate': args.validate,
+        'charts': not args.no_charts,
+        'dpi': args.dpi, 'chart_workers': args.chart_workers,
+    }
+    runs = []
+    for run in range(1, args.repeat + 1):
+        print(f"Run {run}/{args.repeat} ...")
+        runs.append(run_pipeline(paths, work_dir, charts=not args.no_charts, dpi=args.dpi,
+                                 workers=args.workers, chart_workers=args.chart_workers,
+                                 join_mode=args.join, concurrent_load=args.concurrent_load,
+                                 validate=args.validate))
+
+    result = {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'label': args.label,
+        'commit': git_commit(),
+        'host': host_info(),
+        'dataset': dataset,
+        'settings': settings,
+        'repeat': args.repeat,
+        'stages': best_of(runs),
+    }
+
+    profiler = StageProfiler()
+    profiler.records = result['stages']
+    profiler.print_summary()
+    print(f"Total wall time: {profiler.total_wall_s:.2f} s")
+
+    regressions = False
+    baseline = None if args.compare_to == 'none' else find_baseline(
+        load_results(args.results), result, args.compare_to)
+    if baseline is not None:
+        comparison = compare(result, baseline, args.threshold)
+        print()
+        print(f"Compared with {baseline.get('label') or baseline['commit']} ({baseline['run_at']}):")
+        print(comparison.astype(object).fillna('-').to_string(index=False))
+        regressions = bool(comparison['regression'].any())
+
+    save_result(args.results, result)
+    print(f"\n✓ Results appended to: {args.results}")
+
+    if regressions and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Binned Histogram
+Fixed-grid histograms of a numeric column with exact count, sum, min and
+max and a median at grid resolution, built in one streaming pass.
+
+Values are counted on a grid of `width` (0.01 for amounts, 0.1 for
+ratings), so a histogram is one small integer array whatever the number of
+rows. Blocks are folded in with `add` and histograms combine with `merge`;
+the mean and median need no second pass and no sort. Values already on the
+grid (amounts in cents, one-decimal ratings) get their exact median.
+`binned` regroups the grid counts into the display bins of a chart.
+
+The counts are a dense array over the grid from the lowest to the highest
+value while that span has at most MAX_DENSE_BINS bins. A wider span (e.g.
+one corrupt amount of 5e6 on the 0.01 grid) switches the histogram to a
+sparse form: only the occupied grid bins and their counts, so memory
+follows the number of distinct values, not the range.
+"""
+
+import numpy as np
+
+from OLAP_Cube import weighted_median
+
+# Widest dense grid (8 MB of counts); wider spans are stored sparsely
+MAX_DENSE_BINS = 1_000_000
+
+
+class BinnedHistogram:
+    def __init__(self, width):
+        """Empty histogram on a grid of `width`"""
+        if width <= 0:
+            raise ValueError("width must be positive")
+        self.width = width
+        self.offset = 0  # grid index of counts[0] (dense)
+        self.grid = None  # grid index of every count (sparse), None while dense
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values, weights=None):
+        """Count a block of values (value i `weights[i]` times); missing values are skipped"""
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values), dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+        present = ~np.isnan(values) & (weights > 0)
+        values, weights = values[present], weights[present]
+        if not len(values):
+            return self
+
+        grid = np.rint(values / self.width).astype(np.int64)
+        if self._fits_dense(grid.min(), grid.max()):
+            self._extend(grid.min(), grid.max())
+            self.counts += np.bincount(grid - self.offset, weights=weights,
+                                       minlength=len(self.counts)).astype(np.int64)
+        else:
+            self._add_sparse(grid, weights)
+        self.total += float(values @ weights)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        return self
+
+    def merge(self, other):
+        """Fold another histogram of the same grid into this one"""
+        if other.width != self.width:
+            raise ValueError("Only histograms with the same grid width can be merged")
+        if other.n:
+            if other.grid is None and self._fits_dense(other.offset, other.offset + len(other.counts) - 1):
+                self._extend(other.offset, other.offset + len(other.counts) - 1)
+                start = other.offset - self.offset
+                self.counts[start:start + len(other.counts)] += other.counts
+            else:
+                self._add_sparse(*other._grid_counts())
+            self.total += other.total
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def n(self):
+        return int(self.counts.sum())
+
+    @property
+    def values(self):
+        """Grid value of every bin"""
+        return self._grid_counts()[0] * self.width
+
+    @property
+    def mean(self):
+        """Mean of the values (NaN while empty)"""
+        n = self.n
+        return self.total / n if n else np.nan
+
+    def median(self):
+        """Median like np.median, of the values rounded to the grid"""
+        return weighted_median(self.values, self.counts)
+
+    def binned(self, bins):
+        """(counts, edges) of `bins` equal-width bins from the lowest to the highest value, like np.histogram
+
+        An empty histogram gives all-zero counts over np.histogram's default 0-1 range.
+        """
+        occupied = self.counts > 0
+        values = self.values[occupied]
+        value_range = (values.min(), values.max()) if len(values) else None
+        return np.histogram(values, bins=bins, range=value_range, weights=self.counts[occupied])
+
+    def _fits_dense(self, low, high):
+        """Whether grid indexes low..high (with the current ones) fit the dense array"""
+        if self.grid is not None:
+            return False
+        if len(self.counts):
+            low, high = min(low, self.offset), max(high, self.offset + len(self.counts) - 1)
+        return high - low + 1 <= MAX_DENSE_BINS
+
+    def _grid_counts(self):
+        """(grid index, count) of every bin, in grid order"""
+        if self.grid is not None:
+            return self.grid, self.counts
+        return self.offset + np.arange(len(self.counts), dtype=np.int64), self.counts
+
+    def _add_sparse(self, grid, weights):
+        """Fold weighted grid indexes in, storing only occupied bins"""
+        current, counts = self._grid_counts()
+        grid, inverse = np.unique(np.concatenate([current, grid]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([counts, weights]),
+                             minlength=len(grid)).astype(np.int64)
+        occupied = counts > 0
+        self.grid, self.counts = grid[occupied], counts[occupied]
+
+    def _extend(self, low, high):
+        """Grow the counts array to cover grid indexes low..high"""
+        if not len(self.counts):
+            self.offset = low
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            return
+        before = max(self.offset - low, 0)
+        after = max(high - (self.offset + len(self.counts) - 1), 0)
+        if before or after:
+            self.counts = np.pad(self.counts, (before, after))
+            self.offset -= before
@@ -1,228 +1,442 @@
 """
 Food Delivery Data Visualization Script
 Generates comprehensive visualizations for the integrated dataset
+
+Every chart is a registered function that draws from pre-computed
+aggregates: `compute_chart_data` rolls them up from the OLAP cube (read with
+--cube, or built from the dataset in one streaming scan of its chart
+columns), then the selected charts are rendered in parallel worker
+processes. The rating and amount distributions are fixed-grid histograms
+with their mean and median, so charts 6 and 7 draw pre-binned counts.
 """
 
-import pandas as pd
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend, safe in worker processes
+
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from datetime import datetime
+
+from Binned_Histogram import BinnedHistogram
+from Food_Delivery_Data_Integration import DAY_NAMES, DEFAULT_CHUNK_SIZE, iter_dataset, load_dataset
+from Intermediate_Cache import IntermediateCache
+from OLAP_Cube import OLAPCube
+from Pipeline_Profiler import StageProfiler
 
 # Set style
 plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
 
-# Load the final dataset
-df = pd.read_csv('/home/claude/final_food_delivery_dataset.csv')
-df['order_date'] = pd.to_datetime(df['order_date'])
+DEFAULT_DATASET_PATH = '/home/claude/final_food_delivery_dataset.csv'
+DEFAULT_OUTPUT_DIR = '/home/claude/visualizations'
+DEFAULT_DPI = 300
 
-print("Creating visualizations...")
-print("=" * 70)
+# Only the columns used by the charts are read
+CHART_COLUMNS = [
+    'year', 'month', 'day_of_week', 'quarter',
+    'city', 'membership', 'restaurant_id', 'restaurant_name', 'cuisine', 'rating',
+    'total_amount'
+]
+
+# Grid widths of the distribution histograms (ratings have one decimal,
+# amounts are in cents)
+RATING_GRID = 0.1
+AMOUNT_GRID = 0.01
+
+# Chart registry: name -> (output file, drawing function), in report order
+CHARTS = {}
+
+
+def register_chart(name, filename):
+    """Decorator adding a chart function to the registry"""
+    def decorator(function):
+        CHARTS[name] = (filename, function)
+        return function
+    return decorator
+
+
+def compute_chart_data(cube):
+    """Roll up the aggregates behind every chart from the OLAP cube"""
+    monthly = cube.rollup(['year', 'month'])
+    monthly.index = [f"{year}-{month:02d}" for year, month in monthly.index]
+
+    membership = cube.rollup('membership')
+    city_cuisine = cube.rollup(['city', 'cuisine'])
+
+    return {
+        'revenue_trend': monthly['revenue'],
+        'orders_by_city': cube.rollup('city')['orders'].sort_values(ascending=False),
+        'revenue_by_cuisine': cube.rollup('cuisine')['revenue'].sort_values(ascending=True),
+        'membership_analysis': {
+            'orders': membership['orders'].sort_values(ascending=False),
+            'revenue': membership['revenue'],
+        },
+        'day_of_week_analysis': cube.rollup('day_of_week').reindex(DAY_NAMES),
+        # Distributions as orders per distinct value
+        'rating_distribution': rating_histogram(cube),
+        'order_amount_distribution': amount_histogram(cube),
+        'top_restaurants': cube.rollup('restaurant_name')['revenue'].sort_values(ascending=True).tail(10),
+        'city_cuisine_heatmap': city_cuisine['revenue'].unstack('cuisine'),
+        'quarterly_performance': cube.rollup('quarter'),
+    }
 
-# Create figure directory
-import os
-os.makedirs('/home/claude/visualizations', exist_ok=True)
 
 # 1. Revenue Trend Over Time
-plt.figure(figsize=(14, 6))
-monthly_revenue = df.groupby(df['order_date'].dt.to_period('M'))['total_amount'].sum()
-plt.plot(monthly_revenue.index.astype(str), monthly_revenue.values, marker='o', linewidth=2, markersize=8)
-plt.title('Monthly Revenue Trend - 2023', fontsize=16, fontweight='bold')
-plt.xlabel('Month', fontsize=12)
-plt.ylabel('Revenue ($)', fontsize=12)
-plt.xticks(rotation=45, ha='right')
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig('/home/claude/visualizations/1_revenue_trend.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 1_revenue_trend.png")
-plt.close()
+@register_chart('revenue_trend', '1_revenue_trend.png')
+def plot_revenue_trend(monthly_revenue):
+    plt.figure(figsize=(14, 6))
+    plt.plot(monthly_revenue.index.astype(str), monthly_revenue.values, marker='o', linewidth=2, markersize=8)
+    plt.title('Monthly Revenue Trend - 2023', fontsize=16, fontweight='bold')
+    plt.xlabel('Month', fontsize=12)
+    plt.ylabel('Revenue ($)', fontsize=12)
+    plt.xticks(rotation=45, ha='right')
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
 
 # 2. Order Volume by City
-plt.figure(figsize=(10, 6))
-city_orders = df['city'].value_counts()
-colors = sns.color_palette("viridis", len(city_orders))
-bars = plt.bar(city_orders.index, city_orders.values, color=colors)
-plt.title('Total Orders by City', fontsize=16, fontweight='bold')
-plt.xlabel('City', fontsize=12)
-plt.ylabel('Number of Orders', fontsize=12)
-plt.xticks(rotation=0)
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'{int(height)}',
-             ha='center', va='bottom', fontsize=10)
-plt.tight_layout()
-plt.savefig('/home/claude/visualizations/2_orders_by_city.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 2_orders_by_city.png")
-plt.close()
+@register_chart('orders_by_city', '2_orders_by_city.png')
+def plot_orders_by_city(city_orders):
+    plt.figure(figsize=(10, 6))
+    colors = sns.color_palette("viridis", len(city_orders))
+    bars = plt.bar(city_orders.index.astype(str), city_orders.values, color=colors)
+    plt.title('Total Orders by City', fontsize=16, fontweight='bold')
+    plt.xlabel('City', fontsize=12)
+    plt.ylabel('Number of Orders', fontsize=12)
+    plt.xticks(rotation=0)
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height,
+                 f'{int(height)}',
+                 ha='center', va='bottom', fontsize=10)
+    plt.tight_layout()
+
 
 # 3. Revenue by Cuisine
-plt.figure(figsize=(10, 6))
-cuisine_revenue = df.groupby('cuisine')['total_amount'].sum().sort_values(ascending=True)
-colors = sns.color_palette("rocket", len(cuisine_revenue))
-plt.barh(cuisine_revenue.index, cuisine_revenue.values, color=colors)
-plt.title('Total Revenue by Cuisine Type', fontsize=16, fontweight='bold')
-plt.xlabel('Revenue ($)', fontsize=12)
-plt.ylabel('Cuisine', fontsize=12)
-for i, v in enumerate(cuisine_revenue.values):
-    plt.text(v, i, f' ${v:,.0f}', va='center', fontsize=10)
-plt.tight_layout()
-plt.savefig('/home/claude/visualizations/3_revenue_by_cuisine.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 3_revenue_by_cuisine.png")
-plt.close()
+@register_chart('revenue_by_cuisine', '3_revenue_by_cuisine.png')
+def plot_revenue_by_cuisine(cuisine_revenue):
+    plt.figure(figsize=(10, 6))
+    colors = sns.color_palette("rocket", len(cuisine_revenue))
+    plt.barh(cuisine_revenue.index.astype(str), cuisine_revenue.values, color=colors)
+    plt.title('Total Revenue by Cuisine Type', fontsize=16, fontweight='bold')
+    plt.xlabel('Revenue ($)', fontsize=12)
+    plt.ylabel('Cuisine', fontsize=12)
+    for i, v in enumerate(cuisine_revenue.values):
+        plt.text(v, i, f' ${v:,.0f}', va='center', fontsize=10)
+    plt.tight_layout()
+
 
 # 4. Membership Comparison
-plt.figure(figsize=(12, 5))
-
-plt.subplot(1, 2, 1)
-membership_orders = df['membership'].value_counts()
-colors = ['#FF6B6B', '#4ECDC4']
-plt.pie(membership_orders.values, labels=membership_orders.index, autopct='%1.1f%%',
-        startangle=90, colors=colors, textprops={'fontsize': 12})
-plt.title('Order Distribution by Membership', fontsize=14, fontweight='bold')
-
-plt.subplot(1, 2, 2)
-membership_revenue = df.groupby('membership')['total_amount'].sum()
-bars = plt.bar(membership_revenue.index, membership_revenue.values, color=colors)
-plt.title('Revenue by Membership Type', fontsize=14, fontweight='bold')
-plt.ylabel('Revenue ($)', fontsize=12)
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'${height:,.0f}',
-             ha='center', va='bottom', fontsize=10)
-
-plt.tight_layout()
-plt.savefig('/home/claude/visualizations/4_membership_analysis.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 4_membership_analysis.png")
-plt.close()
+@register_chart('membership_analysis', '4_membership_analysis.png')
+def plot_membership_analysis(membership):
+    plt.figure(figsize=(12, 5))
+
+    plt.subplot(1, 2, 1)
+    membership_orders = membership['orders']
+    colors = ['#FF6B6B', '#4ECDC4']
+    plt.pie(membership_orders.values, labels=membership_orders.index.astype(str), autopct='%1.1f%%',
+            startangle=90, colors=colors, textprops={'fontsize': 12})
+    plt.title('Order Distribution by Membership', fontsize=14, fontweight='bold')
+
+    plt.subplot(1, 2, 2)
+    membership_revenue = membership['revenue']
+    bars = plt.bar(membership_revenue.index.astype(str), membership_revenue.values, color=colors)
+    plt.title('Revenue by Membership Type', fontsize=14, fontweight='bold')
+    plt.ylabel('Revenue ($)', fontsize=12)
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height,
+                 f'${height:,.0f}',
+                 ha='center', va='bottom', fontsize=10)
+
+    plt.tight_layout()
+
 
 # 5. Day of Week Analysis
-plt.figure(figsize=(12, 6))
-day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-dow_stats = df.groupby('day_of_week').agg({
-    'order_id': 'count',
-    'total_amount': 'sum'
-})
-dow_stats = dow_stats.reindex(day_order)
-
-x = np.arange(len(day_order))
-width = 0.35
-
-fig, ax1 = plt.subplots(figsize=(12, 6))
-
-color1 = '#3498db'
-ax1.set_xlabel('Day of Week', fontsize=12)
-ax1.set_ylabel('Number of Orders', color=color1, fontsize=12)
-bars1 = ax1.bar(x - width/2, dow_stats['order_id'], width, label='Orders', color=color1, alpha=0.8)
-ax1.tick_params(axis='y', labelcolor=color1)
-ax1.set_xticks(x)
-ax1.set_xticklabels(day_order, rotation=45, ha='right')
-
-ax2 = ax1.twinx()
-color2 = '#e74c3c'
-ax2.set_ylabel('Revenue ($)', color=color2, fontsize=12)
-bars2 = ax2.bar(x + width/2, dow_stats['total_amount'], width, label='Revenue', color=color2, alpha=0.8)
-ax2.tick_params(axis='y', labelcolor=color2)
-
-plt.title('Orders and Revenue by Day of Week', fontsize=16, fontweight='bold')
-fig.tight_layout()
-plt.savefig('/home/claude/visualizations/5_day_of_week_analysis.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 5_day_of_week_analysis.png")
-plt.close()
+@register_chart('day_of_week_analysis', '5_day_of_week_analysis.png')
+def plot_day_of_week_analysis(dow_stats):
+    x = np.arange(len(DAY_NAMES))
+    width = 0.35
+
+    fig, ax1 = plt.subplots(figsize=(12, 6))
+
+    color1 = '#3498db'
+    ax1.set_xlabel('Day of Week', fontsize=12)
+    ax1.set_ylabel('Number of Orders', color=color1, fontsize=12)
+    ax1.bar(x - width/2, dow_stats['orders'], width, label='Orders', color=color1, alpha=0.8)
+    ax1.tick_params(axis='y', labelcolor=color1)
+    ax1.set_xticks(x)
+    ax1.set_xticklabels(DAY_NAMES, rotation=45, ha='right')
+
+    ax2 = ax1.twinx()
+    color2 = '#e74c3c'
+    ax2.set_ylabel('Revenue ($)', color=color2, fontsize=12)
+    ax2.bar(x + width/2, dow_stats['revenue'], width, label='Revenue', color=color2, alpha=0.8)
+    ax2.tick_params(axis='y', labelcolor=color2)
+
+    plt.title('Orders and Revenue by Day of Week', fontsize=16, fontweight='bold')
+    fig.tight_layout()
+
+
+def rating_histogram(cube):
+    """Histogram of restaurant ratings, one value per restaurant (not per order)"""
+    restaurant = 'restaurant_id' if 'restaurant_id' in cube.cuboids['restaurants'] else 'restaurant_name'
+    ratings = cube.rollup([restaurant, 'rating']).index.get_level_values('rating')
+    return BinnedHistogram(RATING_GRID).add(ratings)
+
+
+def amount_histogram(cube):
+    """Histogram of order amounts from the cube's distinct amounts (or KLL items)"""
+    amounts = cube.amount_distribution()
+    return BinnedHistogram(AMOUNT_GRID).add(amounts.index, weights=amounts.to_numpy())
+
 
 # 6. Rating Distribution
-plt.figure(figsize=(10, 6))
-plt.hist(df['rating'], bins=20, color='#9b59b6', edgecolor='black', alpha=0.7)
-plt.axvline(df['rating'].mean(), color='red', linestyle='dashed', linewidth=2, label=f'Mean: {df["rating"].mean():.2f}')
-plt.axvline(df['rating'].median(), color='green', linestyle='dashed', linewidth=2, label=f'Median: {df["rating"].median():.2f}')
-plt.title('Distribution of Restaurant Ratings', fontsize=16, fontweight='bold')
-plt.xlabel('Rating', fontsize=12)
-plt.ylabel('Frequency', fontsize=12)
-plt.legend(fontsize=10)
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig('/home/claude/visualizations/6_rating_distribution.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 6_rating_distribution.png")
-plt.close()
+@register_chart('rating_distribution', '6_rating_distribution.png')
+def plot_rating_distribution(histogram):
+    counts, edges = histogram.binned(20)
+    mean, median = histogram.mean, histogram.median()
+    plt.figure(figsize=(10, 6))
+    plt.hist(edges[:-1], bins=edges, weights=counts, color='#9b59b6', edgecolor='black', alpha=0.7)
+    plt.axvline(mean, color='red', linestyle='dashed', linewidth=2, label=f'Mean: {mean:.2f}')
+    plt.axvline(median, color='green', linestyle='dashed', linewidth=2, label=f'Median: {median:.2f}')
+    plt.title('Distribution of Restaurant Ratings', fontsize=16, fontweight='bold')
+    plt.xlabel('Rating', fontsize=12)
+    plt.ylabel('Restaurants', fontsize=12)
+    plt.legend(fontsize=10)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
 
 # 7. Order Amount Distribution
-plt.figure(figsize=(10, 6))
-plt.hist(df['total_amount'], bins=30, color='#16a085', edgecolor='black', alpha=0.7)
-plt.axvline(df['total_amount'].mean(), color='red', linestyle='dashed', linewidth=2, 
-           label=f'Mean: ${df["total_amount"].mean():.2f}')
-plt.axvline(df['total_amount'].median(), color='green', linestyle='dashed', linewidth=2,
-           label=f'Median: ${df["total_amount"].median():.2f}')
-plt.title('Distribution of Order Amounts', fontsize=16, fontweight='bold')
-plt.xlabel('Order Amount ($)', fontsize=12)
-plt.ylabel('Frequency', fontsize=12)
-plt.legend(fontsize=10)
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig('/home/claude/visualizations/7_order_amount_distribution.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 7_order_amount_distribution.png")
-plt.close()
+@register_chart('order_amount_distribution', '7_order_amount_distribution.png')
+def plot_order_amount_distribution(histogram):
+    counts, edges = histogram.binned(30)
+    mean, median = histogram.mean, histogram.median()
+    plt.figure(figsize=(10, 6))
+    plt.hist(edges[:-1], bins=edges, weights=counts, color='#16a085', edgecolor='black', alpha=0.7)
+    plt.axvline(mean, color='red', linestyle='dashed', linewidth=2,
+               label=f'Mean: ${mean:.2f}')
+    plt.axvline(median, color='green', linestyle='dashed', linewidth=2,
+               label=f'Median: ${median:.2f}')
+    plt.title('Distribution of Order Amounts', fontsize=16, fontweight='bold')
+    plt.xlabel('Order Amount ($)', fontsize=12)
+    plt.ylabel('Frequency', fontsize=12)
+    plt.legend(fontsize=10)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
 
 # 8. Top 10 Restaurants by Revenue
-plt.figure(figsize=(12, 7))
-top_restaurants = df.groupby('restaurant_name')['total_amount'].sum().sort_values(ascending=True).tail(10)
-colors = sns.color_palette("coolwarm", len(top_restaurants))
-plt.barh(range(len(top_restaurants)), top_restaurants.values, color=colors)
-plt.yticks(range(len(top_restaurants)), top_restaurants.index, fontsize=10)
-plt.xlabel('Total Revenue ($)', fontsize=12)
-plt.title('Top 10 Restaurants by Revenue', fontsize=16, fontweight='bold')
-for i, v in enumerate(top_restaurants.values):
-    plt.text(v, i, f' ${v:,.0f}', va='center', fontsize=9)
-plt.tight_layout()
-plt.savefig('/home/claude/visualizations/8_top_restaurants.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 8_top_restaurants.png")
-plt.close()
+@register_chart('top_restaurants', '8_top_restaurants.png')
+def plot_top_restaurants(top_restaurants):
+    plt.figure(figsize=(12, 7))
+    colors = sns.color_palette("coolwarm", len(top_restaurants))
+    plt.barh(range(len(top_restaurants)), top_restaurants.values, color=colors)
+    plt.yticks(range(len(top_restaurants)), top_restaurants.index.astype(str), fontsize=10)
+    plt.xlabel('Total Revenue ($)', fontsize=12)
+    plt.title('Top 10 Restaurants by Revenue', fontsize=16, fontweight='bold')
+    for i, v in enumerate(top_restaurants.values):
+        plt.text(v, i, f' ${v:,.0f}', va='center', fontsize=9)
+    plt.tight_layout()
+
 
 # 9. Heatmap: City vs Cuisine Revenue
-plt.figure(figsize=(10, 6))
-pivot_data = df.pivot_table(values='total_amount', index='city', columns='cuisine', aggfunc='sum')
-sns.heatmap(pivot_data, annot=True, fmt='.0f', cmap='YlOrRd', cbar_kws={'label': 'Revenue ($)'})
-plt.title('Revenue Heatmap: City vs Cuisine', fontsize=16, fontweight='bold')
-plt.xlabel('Cuisine', fontsize=12)
-plt.ylabel('City', fontsize=12)
-plt.tight_layout()
-plt.savefig('/home/claude/visualizations/9_city_cuisine_heatmap.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 9_city_cuisine_heatmap.png")
-plt.close()
+@register_chart('city_cuisine_heatmap', '9_city_cuisine_heatmap.png')
+def plot_city_cuisine_heatmap(pivot_data):
+    plt.figure(figsize=(10, 6))
+    sns.heatmap(pivot_data, annot=True, fmt='.0f', cmap='YlOrRd', cbar_kws={'label': 'Revenue ($)'})
+    plt.title('Revenue Heatmap: City vs Cuisine', fontsize=16, fontweight='bold')
+    plt.xlabel('Cuisine', fontsize=12)
+    plt.ylabel('City', fontsize=12)
+    plt.tight_layout()
+
 
 # 10. Quarterly Performance
-plt.figure(figsize=(10, 6))
-quarterly_data = df.groupby('quarter').agg({
-    'order_id': 'count',
-    'total_amount': 'sum'
-})
-
-fig, ax1 = plt.subplots(figsize=(10, 6))
-
-x = quarterly_data.index
-width = 0.35
-
-color1 = '#2ecc71'
-ax1.set_xlabel('Quarter', fontsize=12)
-ax1.set_ylabel('Number of Orders', color=color1, fontsize=12)
-bars1 = ax1.bar(x - width/2, quarterly_data['order_id'], width, label='Orders', color=color1, alpha=0.8)
-ax1.tick_params(axis='y', labelcolor=color1)
-
-ax2 = ax1.twinx()
-color2 = '#e67e22'
-ax2.set_ylabel('Revenue ($)', color=color2, fontsize=12)
-bars2 = ax2.bar(x + width/2, quarterly_data['total_amount'], width, label='Revenue', color=color2, alpha=0.8)
-ax2.tick_params(axis='y', labelcolor=color2)
-
-plt.title('Quarterly Performance - Orders and Revenue', fontsize=16, fontweight='bold')
-fig.tight_layout()
-plt.savefig('/home/claude/visualizations/10_quarterly_performance.png', dpi=300, bbox_inches='tight')
-print("✓ Created: 10_quarterly_performance.png")
-plt.close()
-
-print()
-print("=" * 70)
-print("All visualizations created successfully!")
-print(" Location: /home/claude/visualizations/")
-print("=" * 70)
+@register_chart('quarterly_performance', '10_quarterly_performance.png')
+def plot_quarterly_performance(quarterly_data):
+    fig, ax1 = plt.subplots(figsize=(10, 6))
+
+    x = quarterly_data.index.to_numpy()
+    width = 0.35
+
+    color1 = '#2ecc71'
+    ax1.set_xlabel('Quarter', fontsize=12)
+    ax1.set_ylabel('Number of Orders', color=color1, fontsize=12)
+    ax1.bar(x - width/2, quarterly_data['orders'], width, label='Orders', color=color1, alpha=0.8)
+    ax1.tick_params(axis='y', labelcolor=color1)
+
+    ax2 = ax1.twinx()
+    color2 = '#e67e22'
+    ax2.set_ylabel('Revenue ($)', color=color2, fontsize=12)
+    ax2.bar(x + width/2, quarterly_data['revenue'], width, label='Revenue', color=color2, alpha=0.8)
+    ax2.tick_params(axis='y', labelcolor=color2)
+
+    plt.title('Quarterly Performance - Orders and Revenue', fontsize=16, fontweight='bold')
+    fig.tight_layout()
+
+
+def render_chart(name, data, output_dir, dpi=DEFAULT_DPI):
+    """Draw one registered chart from its aggregate and save it as PNG"""
+    filename, draw = CHARTS[name]
+    draw(data)
+    plt.savefig(os.path.join(output_dir, filename), dpi=dpi, bbox_inches='tight')
+    plt.close('all')
+    return filename
+
+
+def render_charts(chart_data, output_dir, charts=None, dpi=DEFAULT_DPI, workers=None, profiler=None):
+    """Render the selected charts (all by default), in parallel when workers > 1
+
+    Each worker only receives the small aggregate its chart needs. With a
+    `profiler`, every chart is recorded as a 'chart:<name>' stage (measured
+    in the process that draws it).
+    """
+    charts = list(CHARTS) if charts is None else charts
+    os.makedirs(output_dir, exist_ok=True)
+    workers = min(len(charts), os.cpu_count() or 1) if workers is None else workers
+    profile = profiler is not None and profiler.enabled
+
+    if workers <= 1:
+        for name in charts:
+            filename, record = _render_chart_measured(name, chart_data[name], output_dir, dpi, profile)
+            print(f"✓ Created: {filename}")
+            if record:
+                profiler.add(record)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_render_chart_measured, name, chart_data[name], output_dir, dpi, profile)
+                   for name in charts]
+        for future in futures:
+            filename, record = future.result()
+            print(f"✓ Created: {filename}")
+            if record:
+                profiler.add(record)
+
+
+def _render_chart_measured(name, data, output_dir, dpi, profile):
+    """render_chart plus its stage record (None when not profiling)"""
+    if not profile:
+        return render_chart(name, data, output_dir, dpi), None
+    profiler = StageProfiler()
+    with profiler.stage(f"chart:{name}") as record:
+        filename = render_chart(name, data, output_dir, dpi)
+    return filename, record
+
+
+def resolve_charts(selection):
+    """Map chart names or 1-based chart numbers to registry names"""
+    if not selection:
+        return None
+    names = list(CHARTS)
+    charts = []
+    for item in selection:
+        if item.isdigit() and 1 <= int(item) <= len(names):
+            charts.append(names[int(item) - 1])
+        elif item in CHARTS:
+            charts.append(item)
+        else:
+            raise ValueError(f"Unknown chart '{item}'. Available: {', '.join(names)}")
+    return charts
+
+
+def parse_args(argv=None):
+    """Command line options for the visualization script"""
+    parser = argparse.ArgumentParser(description="Food Delivery Data Visualizations")
+    parser.add_argument('dataset', nargs='?', default=DEFAULT_DATASET_PATH,
+                        help="Final dataset (CSV, Parquet or Arrow IPC)")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help="Directory for the PNG files")
+    parser.add_argument('--charts', nargs='+',
+                        help="Subset of charts to draw, by name or number (default: all)")
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                        help="Resolution of the saved charts (e.g. 72 for quick previews)")
+    parser.add_argument('--workers', type=int,
+                        help="Worker processes for rendering (default: one per chart/core, 1 = serial)")
+    parser.add_argument('--cube', metavar='PATH',
+                        help="Draw from an OLAP cube saved by the pipeline's --cube option "
+                             "instead of reading the dataset")
+    parser.add_argument('--approx', action='store_true',
+                        help="Build the cube with a KLL sketch of order amounts instead of exact "
+                             "per-amount counts (chart 7)")
+    parser.add_argument('--quantile-error', type=float, default=0.01,
+                        help="Rank error of the KLL sketch with --approx")
+    parser.add_argument('--start', help="First order_date to chart (YYYY-MM-DD); partitioned datasets "
+                                        "only read the months in range")
+    parser.add_argument('--end', help="Last order_date to chart (YYYY-MM-DD)")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Dataset rows read and aggregated per batch when building the cube")
+    parser.add_argument('--cache-dir',
+                        help="Reuse the chart columns of an unchanged dataset from this cache "
+                             "(shared with the pipeline's --cache-dir)")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Measure loading, aggregation and every chart; print a summary table "
+                             "and save it to PATH (.json, or .csv)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    charts = resolve_charts(args.charts)
+    profiler = StageProfiler(enabled=bool(args.profile))
+
+    if args.cube:
+        with profiler.stage('load_cube') as record:
+            cube = OLAPCube.load(args.cube)
+            record['rows_out'] = cube.size
+    else:
+        settings = {'approximate': args.approx, 'quantile_error': args.quantile_error}
+        if args.cache_dir:
+            # Load the cached chart columns and aggregate them into the cube
+            with profiler.stage('load_dataset') as record:
+                df = IntermediateCache(args.cache_dir).load_or_compute(
+                    'chart_dataset', [args.dataset],
+                    lambda: load_dataset(args.dataset, columns=CHART_COLUMNS, start=args.start, end=args.end),
+                    params=[CHART_COLUMNS, args.start, args.end]
+                )
+                record['rows_out'] = len(df)
+            with profiler.stage('build_cube', rows_in=len(df)) as record:
+                cube = OLAPCube.build(df, **settings)
+                record['rows_out'] = cube.size
+        else:
+            # Stream the chart columns batch by batch into the cube
+            with profiler.stage('build_cube') as record:
+                batches = iter_dataset(args.dataset, CHART_COLUMNS, args.batch_rows, args.start, args.end)
+                first = next(batches, None)
+                cube = (OLAPCube.build_batches(itertools.chain([first], batches), **settings)
+                        if first is not None else None)
+                record['rows_out'] = cube.size if cube is not None else 0
+
+    if cube is None or not next(iter(cube.cuboids.values()))['orders'].sum():
+        # e.g. a --start/--end range that no partition overlaps
+        period = f" from {args.start or 'the start'} to {args.end or 'the end'}" if args.start or args.end else ""
+        print(f"No orders{period} in {args.cube or args.dataset}; no charts created")
+    else:
+        print("Creating visualizations...")
+        print("=" * 70)
+
+        with profiler.stage('compute_chart_data', rows_in=cube.size):
+            chart_data = compute_chart_data(cube)
+        render_charts(chart_data, args.output_dir, charts=charts, dpi=args.dpi, workers=args.workers,
+                      profiler=profiler)
+
+        print()
+        print("=" * 70)
+        print("All visualizations created successfully!")
+        print(f" Location: {args.output_dir}/")
+        print("=" * 70)
+
+    if profiler.enabled:
+        print()
+        profiler.print_summary()
+        profiler.save(args.profile)
+
+
+if __name__ == "__main__":
+    main()
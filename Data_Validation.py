@@ -0,0 +1,147 @@
+"""
+Data Validation
+Declared data-quality rules checked between loading and merging, with the
+failing rows set aside in quarantine files.
+
+Every rule is a vectorized check over whole columns (comparisons, a sorted
+or hashed duplicate scan, a key lookup against a dimension table) that
+returns a boolean mask of failing rows; there is no per-row Python code.
+A row failing several rules gets all their reason codes, e.g.
+"negative_total_amount|orphan_user_id". Dimension tables are validated
+before orders, so orders referencing a quarantined restaurant are
+quarantined as orphans rather than joined to nothing.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Valid restaurant ratings (inclusive)
+RATING_RANGE = (0.0, 5.0)
+
+# Tables in validation order: dimensions first, their keys are then checked
+VALIDATION_ORDER = ['users', 'restaurants', 'orders']
+
+SUMMARY_FILE = 'summary.json'
+
+
+def duplicated_keys(keys):
+    """Rows repeating a key seen earlier in the table (the first occurrence is kept)"""
+    keys = pd.Series(keys)
+    if keys.is_monotonic_increasing:
+        # Sorted ids (the usual case for order_id): a neighbour comparison
+        values = keys.to_numpy()
+        repeated = np.zeros(len(values), dtype=bool)
+        repeated[1:] = values[1:] == values[:-1]
+        return repeated
+    return keys.duplicated(keep='first').to_numpy()
+
+
+def missing_keys(ids, keys):
+    """Ids with no row in the referenced table (missing ids included)
+
+    Dense integer keys are checked through a presence array indexed by id,
+    anything else with a hash lookup.
+    """
+    ids, keys = pd.Series(ids), pd.Series(keys).dropna()
+    if ids.dtype.kind in 'iu' and keys.dtype.kind in 'iu' and len(keys):
+        low, high = int(keys.min()), int(keys.max())
+        if high - low + 1 <= 4 * len(keys):
+            present = np.zeros(high - low + 1, dtype=bool)
+            present[keys.to_numpy().astype(np.int64) - low] = True
+            slots = ids.to_numpy().astype(np.int64) - low
+            in_range = (slots >= 0) & (slots <= high - low)
+            found = np.zeros(len(slots), dtype=bool)
+            found[in_range] = present[slots[in_range]]
+            return ~found
+    return ~ids.isin(keys).to_numpy()
+
+
+def outside(values, low, high):
+    """Values below `low` or above `high` (missing values pass)"""
+    values = pd.Series(values).to_numpy(dtype=np.float64, na_value=np.nan)
+    return (values < low) | (values > high)
+
+
+# Declared rules: reason code -> (table checked, tables referenced, check)
+# A check receives the table and the already validated tables by name and
+# returns a boolean mask of the failing rows.
+VALIDATION_RULES = {
+    'duplicate_order_id': ('orders', [], lambda df, tables: duplicated_keys(df['order_id'])),
+    'negative_total_amount': ('orders', [], lambda df, tables: outside(df['total_amount'], 0, np.inf)),
+    'orphan_user_id': ('orders', ['users'],
+                       lambda df, tables: missing_keys(df['user_id'], tables['users']['user_id'])),
+    'orphan_restaurant_id': ('orders', ['restaurants'],
+                             lambda df, tables: missing_keys(df['restaurant_id'],
+                                                             tables['restaurants']['restaurant_id'])),
+    'rating_out_of_range': ('restaurants', [], lambda df, tables: outside(df['rating'], *RATING_RANGE)),
+}
+
+
+def validate_tables(tables, rules=VALIDATION_RULES):
+    """Check `rules` against the loaded tables (name -> DataFrame or None)
+
+    Returns (valid tables, quarantined rows per table with a `reason`
+    column, failing rows per rule). Rules over a table that is not loaded,
+    or referencing one, are skipped and counted as None.
+    """
+    valid = dict(tables)
+    quarantine = {}
+    counts = {}
+    for table in VALIDATION_ORDER:
+        table_rules = [(code, references, check) for code, (name, references, check) in rules.items()
+                       if name == table]
+        if not table_rules:
+            continue
+        df = valid.get(table)
+        flags = np.zeros(len(df), dtype=np.int64) if df is not None else None
+        codes = []
+        for code, references, check in table_rules:
+            if df is None or any(valid.get(reference) is None for reference in references):
+                counts[code] = None
+                continue
+            failing = np.asarray(check(df, valid), dtype=bool)
+            counts[code] = int(failing.sum())
+            flags |= failing.astype(np.int64) << len(codes)
+            codes.append(code)
+        if df is None:
+            continue
+
+        bad = flags != 0
+        if bad.any():
+            # One label per distinct combination of failed rules, not per row
+            combinations, inverse = np.unique(flags[bad], return_inverse=True)
+            labels = ['|'.join(code for bit, code in enumerate(codes) if combination >> bit & 1)
+                      for combination in combinations]
+            quarantine[table] = df[bad].assign(reason=pd.Categorical.from_codes(inverse, labels))
+            valid[table] = df[~bad].reset_index(drop=True)
+        else:
+            quarantine[table] = df.iloc[:0].assign(reason=pd.Series(dtype='category'))
+    return valid, quarantine, counts
+
+
+def write_quarantine(quarantine, counts, directory):
+    """Write `<table>.csv` of quarantined rows per table and the per-rule counts
+
+    Files are replaced atomically; a table with no failing rows gets a
+    header-only file, so no stale rows of an earlier run remain.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for table, rows in quarantine.items():
+        path = os.path.join(directory, f"{table}.csv")
+        rows.to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        paths[table] = path
+    summary = {
+        'validated_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'rules': counts,
+        'quarantined_rows': {table: len(rows) for table, rows in quarantine.items()},
+    }
+    path = os.path.join(directory, SUMMARY_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(summary, f, indent=2)
+    os.replace(path + '.tmp', path)
+    return paths
@@ -0,0 +1,136 @@
+"""
+Dimension Index
+Pre-built id -> row position lookup for the users and restaurants tables.
+
+Dimension keys are dense integer ids, so the lookup is normally a plain
+array indexed by `id - min_id`; enriching a block of orders is then one
+vectorized gather per dimension column instead of a hash join. Sparse or
+non-integer keys fall back to a pandas hash index. An index can be saved
+and reloaded; it records a fingerprint of the keys so a stale file is
+detected and rebuilt.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Use the dense array while it has at most this many slots per key
+MAX_DENSE_SLOTS_PER_KEY = 4
+
+
+class DimensionIndex:
+    def __init__(self, table, key):
+        """Build the lookup for `table` on its unique `key` column"""
+        self.table = table.reset_index(drop=True)
+        self.key = key
+        keys = self.table[key]
+        if keys.duplicated().any():
+            raise ValueError(f"Dimension key '{key}' is not unique")
+
+        self.fingerprint = key_fingerprint(keys)
+        self.offset = 0
+        self.positions = None
+        self.hash_index = None
+
+        values = keys.to_numpy()
+        if values.dtype.kind in 'iu' and len(values):
+            low, high = int(values.min()), int(values.max())
+            if high - low + 1 <= MAX_DENSE_SLOTS_PER_KEY * len(values):
+                self.offset = low
+                self.positions = np.full(high - low + 1, -1, dtype=np.int64)
+                self.positions[values - low] = np.arange(len(values))
+        if self.positions is None:
+            self.hash_index = pd.Index(values)
+
+    @property
+    def mode(self):
+        return 'dense' if self.positions is not None else 'hash'
+
+    def lookup(self, ids):
+        """Row position of every id in the dimension table (-1 when absent)"""
+        ids = pd.Series(ids)
+        if self.hash_index is not None:
+            return self.hash_index.get_indexer(ids)
+
+        if ids.isna().any() or ids.dtype.kind not in 'iu':
+            # Missing or non-integer ids never match a dense key
+            numeric = pd.to_numeric(ids, errors='coerce')
+            valid = numeric.notna() & (numeric == np.floor(numeric))
+            result = np.full(len(ids), -1, dtype=np.int64)
+            result[valid.to_numpy()] = self.lookup(numeric[valid].astype(np.int64))
+            return result
+
+        slots = ids.to_numpy().astype(np.int64) - self.offset
+        in_range = (slots >= 0) & (slots < len(self.positions))
+        result = np.full(len(slots), -1, dtype=np.int64)
+        result[in_range] = self.positions[slots[in_range]]
+        return result
+
+    def gather(self, ids, columns=None):
+        """Dimension columns for each id, like a LEFT JOIN (NaN when unmatched)"""
+        columns = [column for column in self.table.columns if column != self.key] \
+            if columns is None else columns
+        positions = self.lookup(ids)
+        return {
+            column: pd.api.extensions.take(self.table[column].array, positions, allow_fill=True)
+            for column in columns
+        }
+
+    def join(self, df, suffixes=('_x', '_y')):
+        """LEFT JOIN `df` with the dimension table on the key column
+
+        Column naming follows pd.merge: overlapping non-key columns get
+        `suffixes` (left, right).
+        """
+        gathered = self.gather(df[self.key])
+        result = df.copy(deep=False)
+        for column, values in gathered.items():
+            if column in df.columns:
+                result = result.rename(columns={column: column + suffixes[0]})
+                column = column + suffixes[1]
+            result[column] = values
+        return result
+
+    def matches(self, table):
+        """True if this index was built for the same keys as `table`"""
+        return key_fingerprint(table[self.key]) == self.fingerprint
+
+    def save(self, path):
+        """Persist the lookup structure (not the table itself)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        keys = self.hash_index.to_numpy() if self.hash_index is not None else np.array([])
+        if keys.dtype == object:
+            keys = keys.astype(str)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, key=self.key, fingerprint=np.array(self.fingerprint, dtype=np.uint64),
+                     offset=self.offset,
+                     positions=self.positions if self.positions is not None else np.array([], dtype=np.int64),
+                     hash_keys=keys)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path, table):
+        """Reattach a saved index to `table`; None if missing or stale"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as saved:
+            key = str(saved['key'])
+            if key not in table.columns or key_fingerprint(table[key]) != int(saved['fingerprint']):
+                return None
+            index = cls.__new__(cls)
+            index.table = table.reset_index(drop=True)
+            index.key = key
+            index.fingerprint = int(saved['fingerprint'])
+            index.offset = int(saved['offset'])
+            index.positions = saved['positions'] if saved['positions'].size else None
+            index.hash_index = pd.Index(saved['hash_keys']) if index.positions is None else None
+        return index
+
+
+def key_fingerprint(keys):
+    """Order-sensitive 64-bit fingerprint of a key column"""
+    hashes = pd.util.hash_pandas_object(pd.Series(keys).reset_index(drop=True), index=False).to_numpy()
+    weights = np.arange(1, len(hashes) + 1, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        return int(np.bitwise_xor.reduce(hashes * weights) if len(hashes) else 0) ^ len(hashes)
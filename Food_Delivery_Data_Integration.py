@@ -6,81 +6,704 @@ This script loads, merges, and analyzes data from three different sources:
 - restaurants.sql (Restaurant Master Data)
 """
 
+import argparse
 import pandas as pd
 import json
+import os
 import re
+import shutil
 import sqlite3
+import tempfile
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from Aggregation_Engine import AggregationEngine
+from Analytical_Store import AnalyticalStore
+from Customer_Features import (FEATURE_INPUT_COLUMNS, ORDER_DAY_COLUMNS, customer_features, order_days,
+                               refresh_customer_features)
+from Data_Validation import validate_tables, write_quarantine
+from Dimension_Index import DimensionIndex
+from Partitioned_Execution import PartitionedExecutor, default_workers, partition_orders
+from Pipeline_Profiler import StageProfiler, profiled
+from Incremental_State import IncrementalState
+from Intermediate_Cache import DEFAULT_MAX_BYTES, IntermediateCache
+from JSON_Loader import iter_json_records, load_json_records
+from OLAP_Cube import OLAPCube, approximate_amount_summary
+from Partition_Manifest import PartitionManifest, filter_date_range, is_partitioned, month_groups
+from SQL_Dump_Loader import UnsupportedSQLError, load_sql_dump
+from Spill_Join import DEFAULT_MEMORY_BUDGET_MB, SPILL_BLOCK_ROWS, SpillPartitions, bucket_count, concat_buckets
+
 # Set visualization style
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 6)
 
+# Column layout of the final integrated dataset
+FINAL_COLUMNS = [
+    'order_id', 'order_date', 'year', 'month', 'month_name', 
+    'day_of_week', 'quarter',
+    'user_id', 'name', 'city', 'membership',
+    'restaurant_id', 'restaurant_name', 'cuisine', 'rating',
+    'total_amount'
+]
+
+# Fields of users.json used by the merge
+USER_COLUMNS = ['user_id', 'name', 'city', 'membership']
+
+# Default number of order rows per chunk in streaming mode
+DEFAULT_CHUNK_SIZE = 500_000
+
+# String columns stored as dictionary-encoded categoricals in columnar output
+CATEGORICAL_COLUMNS = [
+    'month_name', 'day_of_week', 'name', 'city', 'membership',
+    'restaurant_name', 'cuisine'
+]
+
+MONTH_NAMES = [
+    'January', 'February', 'March', 'April', 'May', 'June', 'July',
+    'August', 'September', 'October', 'November', 'December'
+]
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTH_NAME_DTYPE = pd.CategoricalDtype(MONTH_NAMES)
+DAY_NAME_DTYPE = pd.CategoricalDtype(DAY_NAMES)
+
+# Compact in-memory schema applied at load time:
+#   'id'       -> smallest integer type that fits the column's range
+#   'category' -> dictionary-encoded strings
+#   anything else is a plain numpy/pandas dtype
+COMPACT_SCHEMA = {
+    'order_id': 'id',
+    'user_id': 'id',
+    'restaurant_id': 'id',
+    'name': 'category',
+    'city': 'category',
+    'membership': 'category',
+    'restaurant_name': 'category',
+    'cuisine': 'category',
+    'rating': 'float32',
+    'year': 'int16',
+    'month': 'int8',
+    'quarter': 'int8',
+    'month_name': MONTH_NAME_DTYPE,
+    'day_of_week': DAY_NAME_DTYPE,
+}
+ID_COLUMNS = [column for column, kind in COMPACT_SCHEMA.items() if kind == 'id']
+
+# Columns read by generate_analysis_report when loading a saved dataset
+REPORT_COLUMNS = [
+    'order_id', 'year', 'month_name', 'day_of_week', 'quarter',
+    'user_id', 'city', 'membership',
+    'restaurant_id', 'restaurant_name', 'cuisine', 'rating',
+    'total_amount'
+]
+
+# Ways of joining orders with the dimension tables (see the constructor)
+JOIN_MODES = ('index', 'merge', 'spill')
+
+# Source tables in loading order: name -> console step title
+SOURCE_STEPS = {
+    'orders': "STEP 1: Loading CSV Data (orders.csv)",
+    'users': "STEP 2: Loading JSON Data (users.json)",
+    'restaurants': "STEP 3: Loading SQL Data (restaurants.sql)",
+}
+
+# Rating bands of report section 10
+RATING_BINS = [0, 3.0, 3.5, 4.0, 4.5, 5.0]
+RATING_LABELS = ['Poor (0-3.0)', 'Fair (3.0-3.5)', 'Good (3.5-4.0)', 'Great (4.0-4.5)', 'Excellent (4.5-5.0)']
+
+# Loader/merge diagnostics: name -> (required columns, function of the table)
+DIAGNOSTICS = {
+    'columns': ([], lambda df: list(df.columns)),
+    'head': ([], lambda df: df.head()),
+    'dtypes': ([], lambda df: df.dtypes),
+    'null_counts': ([], lambda df: df.isnull().sum()),
+    'date_range': (['order_date'], lambda df: (df['order_date'].min(), df['order_date'].max())),
+    'membership_counts': (['membership'], lambda df: df['membership'].value_counts()),
+    'city_counts': (['city'], lambda df: df['city'].value_counts()),
+    'cuisine_counts': (['cuisine'], lambda df: df['cuisine'].value_counts()),
+    'rating_stats': (['rating'], lambda df: df['rating'].describe()),
+}
+
+# Dataset file extensions and their storage format (anything else is CSV)
+COLUMNAR_FORMATS = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+
+class SourceLoadError(Exception):
+    """One or more sources failed to load concurrently; `errors` maps each to its exception"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Failed to load " + "; ".join(
+            f"{name}: {type(error).__name__}: {error}" for name, error in errors.items()
+        ))
+
+
+def memory_usage_mb(df):
+    """Deep memory footprint of a DataFrame in MB (strings included)"""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def smallest_int_dtype(series):
+    """Narrowest signed integer dtype holding every value of an integer column"""
+    if series.dtype.kind not in 'iu' or series.empty:
+        return series.dtype
+    low, high = series.min(), series.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return series.dtype
+
+
+def compact_frame(df, schema=COMPACT_SCHEMA):
+    """Cast the columns of `df` named in `schema` to their compact dtypes
+    
+    Columns that are missing or hold missing values where the target type
+    cannot (e.g. NaN ids after an unmatched join) are left as they are.
+    """
+    dtypes = {}
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if kind == 'id':
+            dtype = smallest_int_dtype(series)
+        elif isinstance(kind, str) and kind == 'category':
+            # (a CategoricalDtype also compares equal to the string 'category')
+            dtype = 'category'
+        else:
+            dtype = kind
+        if isinstance(dtype, str) and dtype.startswith('int') and series.isna().any():
+            continue
+        if (isinstance(dtype, pd.CategoricalDtype) and isinstance(series.dtype, pd.CategoricalDtype)
+                and not series.dtype.categories.equals(dtype.categories)):
+            # Unordered categoricals compare (and astype) as equal whatever
+            # their category order, so recode explicitly
+            df = df.assign(**{column: series.cat.set_categories(dtype.categories)})
+        elif series.dtype != dtype:
+            dtypes[column] = dtype
+    return df.astype(dtypes) if dtypes else df
+
+
+def parse_dates(values, date_format=None):
+    """to_datetime over the distinct strings of `values`, broadcast back by code
+
+    Order files repeat a few hundred dates across millions of rows, so each
+    distinct string is parsed once; missing values become NaT.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(uniques, format=date_format).to_numpy()
+    if len(parsed) == 0 or (codes < 0).any():
+        parsed = np.append(parsed, np.datetime64('NaT', 'ns'))
+    return pd.Series(parsed[codes], index=values.index, name=values.name)
+
+
+def calendar_features(order_dates):
+    """Calendar columns of a datetime Series, derived once per distinct day
+
+    Dates become integer day numbers; year, month, quarter and the weekday
+    are computed for every day between the first and last order and
+    gathered back with the day number as array index.
+    """
+    days = order_dates.to_numpy().astype('datetime64[D]')
+    if np.isnat(days).any():
+        raise ValueError("order_date has missing values")
+    day_numbers = days.astype(np.int64)
+    first_day = day_numbers.min() if len(day_numbers) else 0
+    last_day = day_numbers.max() if len(day_numbers) else -1
+    codes = day_numbers - first_day
+
+    calendar = pd.DatetimeIndex(np.arange(first_day, last_day + 1).astype('datetime64[D]'))
+    month = calendar.month.to_numpy().astype(np.int8)[codes]
+    return {
+        'year': calendar.year.to_numpy().astype(np.int16)[codes],
+        'month': month,
+        'month_name': pd.Categorical.from_codes(month - 1, dtype=MONTH_NAME_DTYPE),
+        'day_of_week': pd.Categorical.from_codes(calendar.dayofweek.to_numpy()[codes], dtype=DAY_NAME_DTYPE),
+        'quarter': calendar.quarter.to_numpy().astype(np.int8)[codes],
+    }
+
+
+def dataset_format(path):
+    """Infer the storage format ('csv', 'parquet' or 'arrow') from a file extension"""
+    return COLUMNAR_FORMATS.get(os.path.splitext(path)[1].lower(), 'csv')
+
+
+def order_days_path(features_path):
+    """Where the distinct order days behind a customer feature table are kept"""
+    base, extension = os.path.splitext(features_path)
+    return f"{base}.order_days{extension}"
+
+
+def load_dataset(path, columns=None, compact=False, start=None, end=None):
+    """Load a final dataset written by the pipeline, reading only `columns`
+    
+    Parquet and Arrow IPC files keep their dtypes (datetime order_date,
+    categorical strings); CSV falls back to parsing order_date again.
+    A directory is read as the concatenation of its part files. With
+    `compact=True` the result is cast to COMPACT_SCHEMA. `start`/`end`
+    keep orders of those dates (inclusive); a partitioned dataset only
+    reads the parts that overlap them.
+    """
+    if os.path.isdir(path) or start is not None or end is not None:
+        read_columns = _with_order_date(columns) if start is not None or end is not None else columns
+        blocks = [filter_date_range(df, start, end) for df in _dataset_blocks(path, read_columns, start, end)]
+        df = pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame(columns=read_columns or FINAL_COLUMNS)
+        df = df[columns] if columns is not None else df
+        return compact_frame(df) if compact else df
+    
+    file_format = dataset_format(path)
+    if file_format == 'parquet':
+        df = pd.read_parquet(path, columns=columns)
+    elif file_format == 'arrow':
+        df = pd.read_feather(path, columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns)
+        if columns is not None:
+            df = df[columns]
+        if 'order_date' in df.columns:
+            df['order_date'] = parse_dates(df['order_date'])
+    return compact_frame(df) if compact else df
+
+
+def iter_dataset(path, columns=None, batch_rows=DEFAULT_CHUNK_SIZE, start=None, end=None):
+    """Yield a saved final dataset as DataFrames of at most `batch_rows` rows
+
+    Only `columns` are read and one batch is in memory at a time. Arrow IPC
+    files are read through a memory map record batch by record batch,
+    Parquet by row-group batches and CSV in chunks. `start`/`end` filter
+    order dates as in load_dataset, pruning the parts of a partitioned
+    dataset.
+    """
+    if os.path.isdir(path) or start is not None or end is not None:
+        read_columns = _with_order_date(columns) if start is not None or end is not None else columns
+        for part in _dataset_files(path, start, end):
+            for batch in iter_dataset(part, read_columns, batch_rows):
+                batch = filter_date_range(batch, start, end)
+                if len(batch):
+                    yield batch[columns] if columns is not None else batch
+        return
+
+    file_format = dataset_format(path)
+    if file_format == 'arrow':
+        import pyarrow as pa
+        import pyarrow.ipc
+
+        with pa.memory_map(path, 'r') as source:
+            reader = pyarrow.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                for start in range(0, batch.num_rows, batch_rows):
+                    yield batch.slice(start, batch_rows).to_pandas()
+    elif file_format == 'parquet':
+        import pyarrow.parquet
+
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=batch_rows):
+            if columns is not None:
+                chunk = chunk[columns]
+            if 'order_date' in chunk.columns:
+                chunk['order_date'] = parse_dates(chunk['order_date'])
+            yield chunk
+
+
+def _dataset_files(path, start=None, end=None):
+    """Files of a dataset: itself, its part files, or the parts of a partitioned
+    dataset that overlap [start, end]"""
+    if not os.path.isdir(path):
+        return [path]
+    if is_partitioned(path):
+        return [os.path.join(path, part['path'])
+                for part in PartitionManifest.load(path).select(start, end)]
+    return dataset_parts(path)
+
+
+def _with_order_date(columns):
+    """`columns` plus order_date, which date filters need"""
+    return columns if columns is None or 'order_date' in columns else list(columns) + ['order_date']
+
+
+def _dataset_blocks(path, columns=None, start=None, end=None):
+    """Every file of a dataset (see _dataset_files) loaded as a DataFrame"""
+    for part in _dataset_files(path, start, end):
+        yield load_dataset(part, columns)
+
+
+def dataset_parts(path):
+    """Part files of a dataset directory, in name order"""
+    parts = sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if dataset_format(name) == dataset_format(path) and not name.startswith('.')
+    )
+    if not parts:
+        raise FileNotFoundError(f"No dataset part files in {path}")
+    return parts
+
+
+def save_dataset(df, path, category_dtypes=None, partitioned=False):
+    """Write a complete final dataset in the format implied by `path`"""
+    writer = (PartitionedDatasetWriter if partitioned else DatasetWriter)(path, category_dtypes)
+    writer.write(df)
+    writer.close()
+
+
+class DatasetWriter:
+    """Write the final dataset block by block as CSV, Parquet or Arrow IPC
+    
+    For the columnar formats string columns are written as dictionary-encoded
+    categoricals. Pass `category_dtypes` (column -> CategoricalDtype) to pin
+    the dictionaries so that every block shares the same schema. With
+    `append=True` an existing CSV file is extended instead of replaced.
+    """
+    
+    def __init__(self, path, category_dtypes=None, append=False):
+        self.path = path
+        self.format = dataset_format(path)
+        self.category_dtypes = category_dtypes or {}
+        self.blocks_written = 0
+        self._writer = None
+        if append and self.format != 'csv':
+            raise ValueError("Appending is only supported for CSV; write columnar deltas as new part files")
+        self._has_header = append and os.path.exists(path) and os.path.getsize(path) > 0
+    
+    def write(self, df):
+        """Append one block of rows"""
+        if self.format == 'csv':
+            # First block creates the file with a header, the rest append
+            df.to_csv(
+                self.path,
+                mode='a' if self._has_header else 'w',
+                header=not self._has_header,
+                index=False
+            )
+            self._has_header = True
+        else:
+            table = self._to_arrow(df)
+            if self._writer is None:
+                self._writer = self._open_writer(table.schema)
+            self._writer.write_table(table)
+        self.blocks_written += 1
+    
+    def close(self):
+        """Finish the file (an empty dataset still gets its header/schema)"""
+        if self.blocks_written == 0 and not self._has_header:
+            self.write(pd.DataFrame(columns=FINAL_COLUMNS))
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+    
+    def _to_arrow(self, df):
+        import pyarrow as pa
+        
+        dtypes = {}
+        for column in CATEGORICAL_COLUMNS:
+            if column in df.columns:
+                dtypes[column] = self.category_dtypes.get(column, 'category')
+        # Compacted id widths can differ between blocks; keep one on-disk type
+        for column in ID_COLUMNS:
+            if column in df.columns and df[column].dtype.kind == 'i':
+                dtypes[column] = np.int64
+        return pa.Table.from_pandas(df.astype(dtypes), preserve_index=False)
+    
+    def _open_writer(self, schema):
+        try:
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError(
+                f"Writing {self.format} output requires pyarrow (pip install pyarrow)"
+            ) from e
+        
+        if self.format == 'parquet':
+            return pyarrow.parquet.ParquetWriter(self.path, schema)
+        return pyarrow.ipc.new_file(self.path, schema)
+
+class PartitionedDatasetWriter:
+    """Write the final dataset as year/month partitions sorted by order_date
+    
+    `path` becomes a directory of part files (see Partition_Manifest), in
+    the format of its extension. Every written block adds one part per
+    month it covers, sorted by order_date, and close() saves the manifest
+    with the parts' min/max statistics. With `append=True` the parts are
+    added to an existing partitioned dataset; otherwise it is replaced.
+    """
+    
+    def __init__(self, path, category_dtypes=None, append=False):
+        self.path = path
+        self.category_dtypes = category_dtypes or {}
+        self.blocks_written = 0
+        if os.path.isfile(path):
+            raise ValueError(f"{path} is a single file; partitioned output needs a directory")
+        if not append and os.path.isdir(path):
+            if not is_partitioned(path):
+                raise ValueError(f"{path} exists and is not a partitioned dataset; not replacing it")
+            shutil.rmtree(path)
+        self.manifest = PartitionManifest.load(path)
+        self._extension = os.path.splitext(path.rstrip(os.sep))[1] or '.csv'
+    
+    def write(self, df):
+        """Add one block of rows, split into monthly sorted parts"""
+        for year, month, rows in month_groups(df):
+            part_path = self.manifest.new_part_path(year, month, self._extension)
+            full_path = os.path.join(self.path, part_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            save_dataset(rows, full_path, self.category_dtypes)
+            self.manifest.add(part_path, rows)
+        self.blocks_written += 1
+    
+    def close(self):
+        """Save the manifest (an empty dataset gets one without parts)"""
+        self.manifest.save()
+
+
 class FoodDeliveryDataIntegration:
-    def __init__(self, orders_path, users_path, restaurants_path):
-        """Initialize the data integration pipeline"""
+    def __init__(self, orders_path, users_path, restaurants_path, compact=True,
+                 join_mode='index', index_dir=None, profiler=None, verbose=True, cache=None,
+                 store=None, approximate=False, hll_precision=14, quantile_error=0.01,
+                 partitioned=False, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, spill_dir=None,
+                 workers=1, partition_by='month'):
+        """Initialize the data integration pipeline
+        
+        join_mode='index' enriches orders through pre-built id -> row lookups
+        of the dimension tables (persisted in `index_dir` when given);
+        join_mode='merge' uses pd.merge LEFT JOINs; join_mode='spill' never
+        holds the users table in memory: users and orders are hash-partitioned
+        on user_id into on-disk buckets (under `spill_dir`, a temporary
+        directory by default) that fit in `memory_budget_mb`, and joined one
+        bucket pair at a time (the orders and the joined result stay in
+        memory). Steps are measured by
+        `profiler` (a StageProfiler) when one is given. With verbose=False
+        nothing is printed and the per-step diagnostics are not computed;
+        they remain available through `diagnostics()`. An IntermediateCache
+        in `cache` serves parsed tables and the merge for unchanged inputs.
+        The final dataset is also materialized into an AnalyticalStore given
+        as `store`, for ad-hoc SQL queries. With approximate=True the report
+        counts unique users with HyperLogLog sketches (`hll_precision`) and
+        estimates the median and percentiles with KLL sketches (rank error
+        `quantile_error`); the sketches also back the incremental state.
+        With partitioned=True the final dataset is written as year/month
+        partitions sorted by order_date (see PartitionedDatasetWriter).
+        With workers > 1 the OLAP cube is built from partial cubes of the
+        final dataset's partitions (by order month, or user_id hash buckets
+        with partition_by='user') in worker processes, a CSV output is
+        written by the workers block by block, and streaming mode enriches
+        its chunks in the workers (see PartitionedExecutor).
+        """
+        if join_mode not in JOIN_MODES:
+            raise ValueError(f"join_mode must be one of {JOIN_MODES}")
         self.orders_path = orders_path
         self.users_path = users_path
         self.restaurants_path = restaurants_path
+        self.compact = compact
+        self.verbose = verbose
+        self.join_mode = join_mode
+        self.index_dir = index_dir
+        self._dimension_indexes = {}
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.cache = cache
+        self.store = store
+        self.cube = None
+        self.approximate = approximate
+        self.hll_precision = hll_precision
+        self.quantile_error = quantile_error
+        self.partitioned = partitioned
+        self.memory_budget_mb = memory_budget_mb
+        self.spill_dir = spill_dir
+        self.workers = workers
+        self.partition_by = partition_by
+        self._user_partitions = None
+        self.validation = None
+        self.customer_features = None
+        self._cache_lock = threading.Lock()
+        self._thread_state = threading.local()
         self.orders_df = None
         self.users_df = None
         self.restaurants_df = None
         self.final_df = None
     
+    def __getstate__(self):
+        # Pickled for worker processes that are not forked: the lock and the
+        # thread-local state are recreated, the store stays with the parent
+        state = self.__dict__.copy()
+        del state['_cache_lock'], state['_thread_state']
+        state['store'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
+        self._thread_state = threading.local()
+    
+    @profiled('load_orders')
     def load_csv_data(self):
         """Step 1: Load CSV Data (Orders)"""
-        print("=" * 70)
-        print("STEP 1: Loading CSV Data (orders.csv)")
-        print("=" * 70)
-        
-        self.orders_df = pd.read_csv(self.orders_path)
-        
-        # Convert date to datetime format
-        self.orders_df['order_date'] = pd.to_datetime(self.orders_df['order_date'], format='%d-%m-%Y')
-        
-        print(f"✓ Loaded {len(self.orders_df)} orders")
-        print(f"✓ Date range: {self.orders_df['order_date'].min()} to {self.orders_df['order_date'].max()}")
-        print(f"\nColumns: {list(self.orders_df.columns)}")
-        print(f"\nFirst 5 rows:")
-        print(self.orders_df.head())
-        print(f"\nData types:")
-        print(self.orders_df.dtypes)
-        print()
-        
+        self._log_step('orders')
+        self.orders_df = self._read_source('orders')
+        self._show_orders()
         return self.orders_df
     
+    def _show_orders(self):
+        if self.verbose:
+            diagnostics = self.diagnostics('orders', 'date_range', 'columns', 'head', 'dtypes')
+            print(f"✓ Loaded {len(self.orders_df)} orders")
+            print(f"✓ Date range: {diagnostics['date_range'][0]} to {diagnostics['date_range'][1]}")
+            print(f"\nColumns: {diagnostics['columns']}")
+            print(f"\nFirst 5 rows:")
+            print(diagnostics['head'])
+            print(f"\nData types:")
+            print(diagnostics['dtypes'])
+            print()
+    
+    @profiled('load_users')
     def load_json_data(self):
         """Step 2: Load JSON Data (Users)"""
-        print("=" * 70)
-        print("STEP 2: Loading JSON Data (users.json)")
-        print("=" * 70)
-        
-        with open(self.users_path, 'r') as f:
-            users_data = json.load(f)
+        self._log_step('users')
+        self.users_df = self._read_source('users')
+        self._show_users()
+        return self.users_df
+    
+    def _show_users(self):
+        if self.verbose and self._user_partitions is not None:
+            partitions = self._user_partitions
+            print(f"✓ Spilled {partitions.rows.sum()} users into {partitions.buckets} on-disk "
+                  f"buckets ({partitions.size_bytes / 1024 ** 2:.2f} MB in {partitions.directory})")
+            print()
+        elif self.verbose:
+            diagnostics = self.diagnostics('users', 'columns', 'head', 'membership_counts', 'city_counts')
+            print(f"✓ Loaded {len(self.users_df)} users")
+            print(f"\nColumns: {diagnostics['columns']}")
+            print(f"\nFirst 5 rows:")
+            print(diagnostics['head'])
+            print(f"\nMembership distribution:")
+            print(diagnostics['membership_counts'])
+            print(f"\nCity distribution:")
+            print(diagnostics['city_counts'])
+            print()
+    
+    @profiled('load_restaurants')
+    def load_sql_data(self, loader='stream'):
+        """Step 3: Load SQL Data (Restaurants)
         
-        self.users_df = pd.DataFrame(users_data)
+        loader='stream' parses the INSERT statements directly into columns
+        (falling back to SQLite for statements it cannot apply);
+        loader='sqlite' executes the whole script in an in-memory database.
+        """
+        self._log_step('restaurants')
+        self.restaurants_df = self._read_source('restaurants', loader)
+        self._show_restaurants()
+        return self.restaurants_df
+    
+    def _show_restaurants(self):
+        if self.verbose:
+            diagnostics = self.diagnostics('restaurants', 'columns', 'head', 'cuisine_counts', 'rating_stats')
+            print(f"✓ Loaded {len(self.restaurants_df)} restaurants")
+            print(f"\nColumns: {diagnostics['columns']}")
+            print(f"\nFirst 5 rows:")
+            print(diagnostics['head'])
+            print(f"\nCuisine distribution:")
+            print(diagnostics['cuisine_counts'])
+            print(f"\nRating statistics:")
+            print(diagnostics['rating_stats'])
+            print()
+    
+    @profiled('load_sources')
+    def load_sources(self, sources=tuple(SOURCE_STEPS), loader='stream'):
+        """Steps 1-3 with the given sources read and parsed concurrently
         
-        print(f"✓ Loaded {len(self.users_df)} users")
-        print(f"\nColumns: {list(self.users_df.columns)}")
-        print(f"\nFirst 5 rows:")
-        print(self.users_df.head())
-        print(f"\nMembership distribution:")
-        print(self.users_df['membership'].value_counts())
-        print(f"\nCity distribution:")
-        print(self.users_df['city'].value_counts())
-        print()
+        Each source is read in its own thread: reading and parsing wait on
+        I/O (slow on network-mounted inputs) and release the GIL in the
+        pandas/pyarrow parsers, and the tables need no pickling back. Once
+        every source is ready, the console output follows in step order as
+        with the sequential loaders. If any source fails, SourceLoadError
+        reports the error of each failed source.
+        """
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = {
+                name: executor.submit(self._read_source_logged, name, loader) for name in sources
+            }
+        errors = {name: future.exception() for name, future in futures.items() if future.exception()}
+        if errors:
+            raise SourceLoadError(errors)
         
-        return self.users_df
+        for name in SOURCE_STEPS:
+            if name not in futures:
+                continue
+            df, messages = futures[name].result()
+            setattr(self, f"{name}_df", df)
+            self._log_step(name)
+            for message in messages:
+                self._log(message)
+            getattr(self, f"_show_{name}")()
+        return {name: getattr(self, f"{name}_df") for name in sources}
     
-    def load_sql_data(self):
-        """Step 3: Load SQL Data (Restaurants)"""
-        print("=" * 70)
-        print("STEP 3: Loading SQL Data (restaurants.sql)")
-        print("=" * 70)
+    def _read_source(self, name, loader='stream'):
+        """Parsed table of one source (through the cache, when one is configured)"""
+        if name == 'orders':
+            return self._cached('orders', [self.orders_path], self._read_orders)
+        if name == 'users' and self.join_mode == 'spill':
+            # Hash-partitioned to disk instead of loaded; joined in merge_datasets
+            self._user_partitions = self._spill_users()
+            return None
+        if name == 'users':
+            # Streamed and projected onto the fields the merge needs
+            # (JSON array or JSON Lines), without a list of dicts for the whole file
+            return self._cached(
+                'users', [self.users_path],
+                lambda: self._compact(load_json_records(self.users_path, USER_COLUMNS))
+            )
+        if name == 'restaurants':
+            return self._cached(
+                'restaurants', [self.restaurants_path], lambda: self._read_restaurants(loader)
+            )
+        raise ValueError(f"Unknown source: {name}")
+    
+    def _read_source_logged(self, name, loader):
+        """_read_source in a worker thread, with its log lines held back for the main thread"""
+        self._thread_state.messages = []
+        try:
+            return self._read_source(name, loader), self._thread_state.messages
+        finally:
+            self._thread_state.messages = None
+    
+    def _log_step(self, name):
+        self._log("=" * 70)
+        self._log(SOURCE_STEPS[name])
+        self._log("=" * 70)
+    
+    def _read_orders(self):
+        """Parse orders.csv with datetime order dates and the compact schema"""
+        orders_df = pd.read_csv(self.orders_path)
         
+        # Convert date to datetime format
+        orders_df = self._parse_order_dates(orders_df)
+        return self._compact(orders_df)
+    
+    def _read_restaurants(self, loader):
+        """Read the restaurants table from restaurants.sql with the given loader"""
+        if loader == 'stream':
+            try:
+                return self._compact(load_sql_dump(self.restaurants_path, 'restaurants'))
+            except UnsupportedSQLError as e:
+                self._log(f"⚠ Streaming SQL loader not applicable ({e}); using SQLite")
+        return self._compact(self._load_sql_with_sqlite())
+    
+    def _load_sql_with_sqlite(self):
+        """Execute restaurants.sql in an in-memory SQLite database and read the table"""
         # Read the SQL file
         with open(self.restaurants_path, 'r') as f:
             sql_content = f.read()
@@ -93,285 +716,1128 @@ class FoodDeliveryDataIntegration:
         cursor.executescript(sql_content)
         
         # Read the data into a DataFrame
-        self.restaurants_df = pd.read_sql_query("SELECT * FROM restaurants", conn)
+        restaurants_df = pd.read_sql_query("SELECT * FROM restaurants", conn)
         
         conn.close()
         
-        print(f"✓ Loaded {len(self.restaurants_df)} restaurants")
-        print(f"\nColumns: {list(self.restaurants_df.columns)}")
-        print(f"\nFirst 5 rows:")
-        print(self.restaurants_df.head())
-        print(f"\nCuisine distribution:")
-        print(self.restaurants_df['cuisine'].value_counts())
-        print(f"\nRating statistics:")
-        print(self.restaurants_df['rating'].describe())
-        print()
+        return restaurants_df
+    
+    @profiled('validate', rows_in=lambda self: len(self.orders_df))
+    def validate_sources(self, quarantine_dir=None):
+        """Check the loaded tables against VALIDATION_RULES before merging
         
-        return self.restaurants_df
+        Failing rows are removed from the tables and, with `quarantine_dir`,
+        written there with their reason codes (see write_quarantine). The
+        failing rows per rule are kept in `validation`. Spilled users are
+        not in memory, so orphan user_ids are not checked with join_mode='spill'.
+        """
+        self._log("=" * 70)
+        self._log("VALIDATION: Checking Data-Quality Rules")
+        self._log("=" * 70)
+        
+        tables = {'orders': self.orders_df, 'users': self.users_df, 'restaurants': self.restaurants_df}
+        valid, quarantine, counts = validate_tables(tables)
+        for name, df in valid.items():
+            setattr(self, f"{name}_df", df)
+        self.validation = counts
+        
+        for code, count in counts.items():
+            self._log(f"  {code:<24} {'skipped' if count is None else f'{count:,} rows'}")
+        for name, rows in quarantine.items():
+            self._log(f"✓ {name}: {len(rows):,} rows quarantined, {len(valid[name]):,} kept")
+        if quarantine_dir:
+            write_quarantine(quarantine, counts, quarantine_dir)
+            self._log(f"✓ Quarantined rows saved to: {quarantine_dir}")
+        self._log()
+        return counts
     
+    @profiled('merge', rows_in=lambda self: len(self.orders_df))
     def merge_datasets(self):
         """Step 4: Merge the Data using LEFT JOIN"""
-        print("=" * 70)
-        print("STEP 4: Merging Datasets")
-        print("=" * 70)
+        self._log("=" * 70)
+        self._log("STEP 4: Merging Datasets")
+        self._log("=" * 70)
+        
+        sources = [self.orders_path, self.users_path, self.restaurants_path]
+        self.final_df = self._cached('merged', sources, self._merge,
+                                     params={'validated': self.validation is not None})
+        if self._user_partitions is not None:
+            # Merge served from the cache: the spilled users are not needed
+            shutil.rmtree(os.path.dirname(self._user_partitions.directory), ignore_errors=True)
+            self._user_partitions = None
+        
+        if self.verbose:
+            diagnostics = self.diagnostics('final', 'columns', 'null_counts')
+            print(f"\nFinal columns: {diagnostics['columns']}")
+            print(f"\nNull values check:")
+            print(diagnostics['null_counts'])
+            print()
+        
+        return self.final_df
+    
+    def _merge(self):
+        """orders LEFT JOIN users LEFT JOIN restaurants"""
+        if self.join_mode == 'spill':
+            return self._spill_merge()
         
         # First merge: orders + users (on user_id)
-        print("Merging orders with users on user_id...")
-        merged_df = pd.merge(
-            self.orders_df,
-            self.users_df,
-            on='user_id',
-            how='left'
-        )
-        print(f"✓ After merging with users: {len(merged_df)} rows")
+        self._log("Merging orders with users on user_id...")
+        merged_df = self._join_users(self.orders_df)
+        self._log(f"✓ After merging with users: {len(merged_df)} rows")
         
         # Second merge: (orders + users) + restaurants (on restaurant_id)
-        print("Merging with restaurants on restaurant_id...")
-        self.final_df = pd.merge(
-            merged_df,
-            self.restaurants_df,
-            on='restaurant_id',
-            how='left',
-            suffixes=('_order', '_restaurant')
-        )
-        print(f"✓ Final dataset: {len(self.final_df)} rows")
-        
-        # Clean up column names (remove duplicate restaurant_name from orders)
-        if 'restaurant_name_order' in self.final_df.columns:
-            self.final_df = self.final_df.drop('restaurant_name_order', axis=1)
-            self.final_df = self.final_df.rename(columns={'restaurant_name_restaurant': 'restaurant_name'})
+        self._log("Merging with restaurants on restaurant_id...")
+        final_df = self._join_restaurants(merged_df)
+        self._log(f"✓ Final dataset: {len(final_df)} rows")
+        return final_df
+    
+    def _spill_users(self):
+        """Stream users.json into user_id hash buckets sized for the memory budget"""
+        input_bytes = os.path.getsize(self.orders_path) + os.path.getsize(self.users_path)
+        buckets = bucket_count(input_bytes, self.memory_budget_mb)
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        spill_root = tempfile.mkdtemp(prefix='food_delivery_spill_', dir=self.spill_dir)
+        users = SpillPartitions(os.path.join(spill_root, 'users'), buckets)
+        for block in iter_json_records(self.users_path, USER_COLUMNS):
+            users.add(block, 'user_id')
+        return users
+    
+    def _spill_merge(self):
+        """orders LEFT JOIN users one on-disk bucket pair at a time, then LEFT JOIN restaurants
         
-        print(f"\nFinal columns: {list(self.final_df.columns)}")
-        print(f"\nNull values check:")
-        print(self.final_df.isnull().sum())
-        print()
+        The orders are spilled into the users' buckets with their row number,
+        which restores the order of orders.csv in the result. orders_df is
+        released once it is spilled, but it is loaded whole before that and
+        the joined result is assembled in memory: only the users side is
+        bounded by the memory budget.
+        """
+        users = self._user_partitions
+        if users is None:
+            raise ValueError("Load users (spilled by load_json_data) before merging")
+        spill_root = os.path.dirname(users.directory)
+        orders = SpillPartitions(os.path.join(spill_root, 'orders'), users.buckets)
+        try:
+            # At least one (possibly empty) block, so the buckets know the order columns
+            for start in range(0, max(len(self.orders_df), 1), SPILL_BLOCK_ROWS):
+                block = self.orders_df.iloc[start:start + SPILL_BLOCK_ROWS]
+                orders.add(block.assign(_row_number=np.arange(start, start + len(block))), 'user_id')
+            self.orders_df = None
+            self._log(f"Merging orders with users in {users.buckets} on-disk buckets "
+                      f"(memory budget {self.memory_budget_mb:,g} MB)...")
+            
+            joined = []
+            # Without orders, one empty bucket pair still gives the joined column layout
+            for bucket in np.flatnonzero(orders.rows) if orders.rows.any() else [0]:
+                users_bucket = users.read(bucket)
+                if self.compact:
+                    users_bucket = compact_frame(users_bucket)
+                merged_df = pd.merge(orders.read(bucket), users_bucket, on='user_id', how='left')
+                joined.append(self._join_restaurants(merged_df))
+        finally:
+            shutil.rmtree(spill_root, ignore_errors=True)
+            self._user_partitions = None
         
-        return self.final_df
+        final_df = concat_buckets(joined, '_row_number')
+        self._log(f"✓ Final dataset: {len(final_df)} rows")
+        return final_df
     
+    @profiled('create_final_dataset', rows_in=lambda self: len(self.final_df))
     def create_final_dataset(self, output_path):
         """Step 5: Create Final Dataset with additional features"""
+        self._log("=" * 70)
+        self._log("STEP 5: Creating Final Dataset with Enriched Features")
+        self._log("=" * 70)
+        
+        # Add time-based features and reorder columns for better readability
+        self.final_df = self._add_time_features(self.final_df)
+        if self.compact:
+            self.final_df = compact_frame(self.final_df)
+        
+        # Save as CSV, Parquet or Arrow IPC depending on the file extension
+        if self.workers > 1 and not self.partitioned and dataset_format(output_path) == 'csv':
+            # Formatting CSV text is the slow part: one block of rows per worker
+            with PartitionedExecutor(self, self.workers) as executor:
+                executor.write_csv(output_path)
+        else:
+            save_dataset(self.final_df, output_path, self._category_dtypes(), partitioned=self.partitioned)
+        if self.store is not None:
+            self.store.materialize(self.final_df)
+        
+        if self.verbose:
+            print(f"✓ Final dataset saved to: {output_path}")
+            if self.store is not None:
+                print(f"✓ Indexed SQL store: {self.store.path} ({self.store.engine})")
+            print(f"✓ Total rows: {len(self.final_df)}")
+            print(f"✓ Total columns: {len(self.final_df.columns)}")
+            print(f"\nDataset Summary:")
+            print(f"  - Date range: {self.final_df['order_date'].min().date()} to {self.final_df['order_date'].max().date()}")
+            print(f"  - Unique users: {self.final_df['user_id'].nunique()}")
+            print(f"  - Unique restaurants: {self.final_df['restaurant_id'].nunique()}")
+            print(f"  - Total revenue: ${self.final_df['total_amount'].sum():,.2f}")
+            print(f"  - Average order value: ${self.final_df['total_amount'].mean():.2f}")
+            print(f"  - In-memory size: {memory_usage_mb(self.final_df):.2f} MB")
+            print(f"\nFirst 10 rows of final dataset:")
+            print(self.final_df.head(10))
+            print()
+        
+        return self.final_df
+    
+    @profiled('stream_final_dataset')
+    def stream_final_dataset(self, output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Steps 1, 4 & 5 in streaming mode: enrich orders chunk by chunk
+        
+        Orders are read in blocks of `chunk_size` rows, joined against the
+        users and restaurants tables (which must already be loaded) and
+        appended straight to `output_path`, so peak memory is bounded by the
+        chunk size rather than by the size of orders.csv. `final_df` is not
+        kept in memory in this mode. With workers > 1 chunks are enriched in
+        parallel worker processes and written in their original order.
+        """
+        self._log("=" * 70)
+        self._log(f"STREAMING: Enriching orders in chunks of {chunk_size:,} rows")
+        self._log("=" * 70)
+        
+        if self.users_df is None or self.restaurants_df is None:
+            raise ValueError("Load users and restaurants before streaming orders")
+        
+        total_rows = 0
+        total_revenue = 0.0
+        min_date = max_date = None
+        unique_users = set()
+        unique_restaurants = set()
+        
+        # Dictionaries are pinned to the dimension tables so every chunk
+        # shares one schema in the columnar formats
+        writer = (PartitionedDatasetWriter if self.partitioned else DatasetWriter)(
+            output_path, self._category_dtypes()
+        )
+        reader = pd.read_csv(self.orders_path, chunksize=chunk_size)
+        with (PartitionedExecutor(self, self.workers) if self.workers > 1 else nullcontext()) as executor:
+            enriched_chunks = executor.enrich_chunks(reader) if executor else map(self._enrich_orders, reader)
+            for chunk_number, enriched in enumerate(enriched_chunks, start=1):
+                writer.write(enriched)
+                if self.store is not None:
+                    self.store.write(enriched, replace=chunk_number == 1)
+                total_rows += len(enriched)
+                if not self.verbose:
+                    continue
+                
+                # Running totals for the summary (the dimensions bound the sets)
+                total_revenue += enriched['total_amount'].sum()
+                chunk_min = enriched['order_date'].min()
+                chunk_max = enriched['order_date'].max()
+                min_date = chunk_min if min_date is None else min(min_date, chunk_min)
+                max_date = chunk_max if max_date is None else max(max_date, chunk_max)
+                unique_users.update(enriched['user_id'].unique())
+                unique_restaurants.update(enriched['restaurant_id'].unique())
+                
+                self._log(f"✓ Chunk {chunk_number}: {len(enriched):,} rows written ({total_rows:,} total)")
+        
+        writer.close()
+        if self.store is not None:
+            self.store.finish()
+        
+        if self.verbose:
+            print(f"\n✓ Final dataset saved to: {output_path}")
+            print(f"✓ Total rows: {total_rows}")
+            print(f"✓ Total columns: {len(FINAL_COLUMNS)}")
+            print(f"\nDataset Summary:")
+            if total_rows:
+                print(f"  - Date range: {min_date.date()} to {max_date.date()}")
+            print(f"  - Unique users: {len(unique_users)}")
+            print(f"  - Unique restaurants: {len(unique_restaurants)}")
+            print(f"  - Total revenue: ${total_revenue:,.2f}")
+            if total_rows:
+                print(f"  - Average order value: ${total_revenue / total_rows:.2f}")
+            print()
+        
+        return total_rows
+    
+    @profiled('process_incremental')
+    def process_incremental(self, state_dir, output_path, watermark_column='order_id',
+                            chunk_size=DEFAULT_CHUNK_SIZE, features_path=None):
+        """Incremental mode: enrich only orders beyond the persisted watermark
+        
+        New orders are joined with the (already loaded) dimension tables,
+        appended to the output (a CSV file, a new part file in a
+        Parquet/Arrow output directory, or new monthly parts of a
+        partitioned dataset) and folded into the running
+        aggregates stored in `state_dir`. The customer feature table at
+        `features_path`, when given, is refreshed with the new orders.
+        """
+        self._log("=" * 70)
+        self._log("INCREMENTAL: Processing orders beyond the watermark")
+        self._log("=" * 70)
+        
+        if self.users_df is None or self.restaurants_df is None:
+            raise ValueError("Load users and restaurants before processing new orders")
+        
+        state = IncrementalState.load(state_dir, watermark_column, self.hll_precision, self.quantile_error)
+        start_watermark = state.watermark
+        self._log(f"✓ Watermark ({watermark_column}): {start_watermark if start_watermark is not None else 'none (first run)'}")
+        
+        writer = None
+        new_rows = 0
+        new_watermark = None
+        feature_orders = []
+        for orders_chunk in pd.read_csv(self.orders_path, chunksize=chunk_size):
+            orders_chunk = self._parse_order_dates(orders_chunk)
+            orders_chunk = state.new_orders(orders_chunk, start_watermark)
+            if orders_chunk.empty:
+                continue
+            if self.compact:
+                orders_chunk = compact_frame(orders_chunk)
+            
+            enriched = self._add_time_features(self._join_restaurants(self._join_users(orders_chunk)))
+            if writer is None:
+                writer = self._delta_writer(output_path, len(state.runs) + 1)
+            writer.write(enriched)
+            if self.store is not None:
+                self.store.write(enriched)
+            state.update(enriched)
+            if features_path:
+                feature_orders.append(enriched[FEATURE_INPUT_COLUMNS])
+            
+            new_rows += len(enriched)
+            chunk_max = enriched[watermark_column].max()
+            new_watermark = chunk_max if new_watermark is None else max(new_watermark, chunk_max)
+        
+        if writer is not None:
+            writer.close()
+        if self.store is not None and new_rows:
+            self.store.finish()
+        if features_path and (new_rows or start_watermark is None):
+            # A first run starts the feature table; later runs fold in the delta
+            new_orders = (pd.concat(feature_orders, ignore_index=True) if feature_orders
+                          else pd.DataFrame(columns=FEATURE_INPUT_COLUMNS))
+            if start_watermark is not None and os.path.exists(features_path):
+                days_path = order_days_path(features_path)
+                if os.path.exists(days_path):
+                    days = load_dataset(days_path)
+                else:
+                    # A table saved without its order days: take them from the dataset once
+                    days = order_days(load_dataset(output_path, columns=ORDER_DAY_COLUMNS))
+                features, days = refresh_customer_features(load_dataset(features_path), new_orders, days)
+            else:
+                features, days = customer_features(new_orders), order_days(new_orders)
+            self._save_customer_features(features, features_path, days)
+        
+        # The state is only persisted once the delta is safely written
+        state.finish_run(new_watermark, new_rows)
+        state.save(state_dir)
+        
+        self._log(f"✓ New orders processed: {new_rows}")
+        self._log(f"✓ Watermark advanced to: {state.watermark}")
+        self._log(f"✓ Orders in running aggregates: {state.rows_processed}")
+        self._log()
+        
+        return state
+    
+    @profiled('customer_features')
+    def build_customer_features(self, features_path, dataset_path=None, start=None, end=None):
+        """Per-user RFM / cohort feature table (see Customer_Features), saved to `features_path`
+        
+        Computed from final_df when it holds the order columns the features
+        need; otherwise (after streaming, or a report-only load) from those
+        columns of the saved dataset at `dataset_path`, orders of
+        `start`..`end` only.
+        """
+        self._log("=" * 70)
+        self._log("CUSTOMER FEATURES: Recency, Frequency, Monetary and Cohorts")
+        self._log("=" * 70)
+        
+        orders = self.final_df
+        if orders is None or not all(column in orders.columns for column in FEATURE_INPUT_COLUMNS):
+            if dataset_path is None:
+                raise ValueError("Create or load the final dataset before building customer features")
+            orders = load_dataset(dataset_path, columns=FEATURE_INPUT_COLUMNS, compact=self.compact,
+                                  start=start, end=end)
+        self.customer_features = customer_features(orders)
+        self._save_customer_features(self.customer_features, features_path)
+        return self.customer_features
+    
+    def _save_customer_features(self, features, features_path, days=None):
+        """Write the feature table atomically (a refresh reads the previous one)
+        
+        The order days a refresh needs, when given, are written first, next to
+        the table (see order_days_path); adding days twice is harmless.
+        """
+        base, extension = os.path.splitext(features_path)
+        if days is not None:
+            days_path = order_days_path(features_path)
+            save_dataset(days, f"{base}.order_days.tmp{extension}")
+            os.replace(f"{base}.order_days.tmp{extension}", days_path)
+        temp_path = f"{base}.tmp{extension}"
+        save_dataset(features, temp_path)
+        os.replace(temp_path, features_path)
+        self.customer_features = features
+        if self.verbose:
+            print(f"✓ Customer features: {len(features):,} users, {memory_usage_mb(features):.2f} MB")
+            print(f"✓ RFM score distribution (top 5):")
+            print(features['rfm_score'].value_counts().head(5).to_string())
+            print(f"✓ Saved to: {features_path}")
+            print()
+    
+    @profiled('incremental_report')
+    def generate_incremental_report(self, state):
+        """Report sections maintained by the incremental state
+        
+        Returns the sections as a dict of DataFrames (plus the estimated
+        'unique_users'); they are printed as well unless running quietly.
+        """
+        monthly = state.section('monthly')
+        # Keyed by (year, month_name) like the full report
+        monthly.index = pd.MultiIndex.from_arrays([
+            monthly.index.get_level_values('year'),
+            pd.Categorical.from_codes(monthly.index.get_level_values('month').astype(int) - 1,
+                                      dtype=MONTH_NAME_DTYPE),
+        ], names=['year', 'month_name'])
+        
+        # Names, cuisine and rating come from the restaurants table, as in the full report
+        restaurants = state.section('restaurant').join(
+            self.restaurants_df.drop_duplicates('restaurant_id').set_index('restaurant_id'), how='left'
+        ).astype({'rating': np.float64}).set_index(['restaurant_name', 'cuisine'], append=True)
+        
+        results = {
+            'order_trends': self._report_frame(
+                monthly, ['count', 'total_amount_sum'],
+                ['Total Orders', 'Total Revenue']),
+            'user_stats': self._report_frame(
+                state.section('user'), ['count', 'total_amount_sum', 'total_amount_mean'],
+                ['Order Count', 'Total Spent', 'Avg Order Value']
+            ).sort_values('Total Spent', ascending=False),
+            'city_stats': self._report_frame(
+                state.section('city'), ['count', 'total_amount_sum', 'total_amount_mean', 'unique_users'],
+                ['Total Orders', 'Total Revenue', 'Avg Order Value', 'Unique Users']
+            ).sort_values('Total Revenue', ascending=False),
+            'cuisine_stats': self._report_frame(
+                state.section('cuisine'), ['count', 'total_amount_sum', 'total_amount_mean', 'rating_mean'],
+                ['Total Orders', 'Total Revenue', 'Avg Order Value', 'Avg Rating']
+            ).sort_values('Total Revenue', ascending=False),
+            'membership_stats': self._report_frame(
+                state.section('membership'), ['count', 'total_amount_sum', 'total_amount_mean', 'unique_users'],
+                ['Total Orders', 'Total Revenue', 'Avg Order Value', 'Unique Users']),
+            'quarter_stats': self._report_frame(
+                state.section('quarter'), ['count', 'total_amount_sum'],
+                ['Total Orders', 'Total Revenue']),
+            'day_of_week_stats': self._report_frame(
+                state.section('day_of_week'), ['count', 'total_amount_sum', 'total_amount_mean'],
+                ['Total Orders', 'Total Revenue', 'Avg Order Value']
+            ).reindex(DAY_NAMES),
+            'restaurant_stats': self._report_frame(
+                restaurants, ['count', 'total_amount_sum', 'rating'],
+                ['Total Orders', 'Total Revenue', 'Rating']
+            ).sort_values('Total Revenue', ascending=False),
+            'rating_analysis': self._rating_analysis(state.section('rating').rename(
+                columns={'count': 'orders', 'total_amount_sum': 'revenue'})),
+            'unique_users': len(state.unique_users),
+        }
+        if state.amount_quantiles is not None and state.amount_quantiles.n:
+            results['revenue_distribution'] = pd.Series(approximate_amount_summary(
+                state.amount_quantiles, state.section('monthly')['total_amount_sum'].sum()
+            ), name='total_amount')
+        if not self.verbose:
+            return results
+        
         print("=" * 70)
-        print("STEP 5: Creating Final Dataset with Enriched Features")
+        print("INCREMENTAL ANALYSIS REPORT (running aggregates)")
         print("=" * 70)
+        print()
         
-        # Add time-based features
-        self.final_df['year'] = self.final_df['order_date'].dt.year
-        self.final_df['month'] = self.final_df['order_date'].dt.month
-        self.final_df['month_name'] = self.final_df['order_date'].dt.strftime('%B')
-        self.final_df['day_of_week'] = self.final_df['order_date'].dt.day_name()
-        self.final_df['quarter'] = self.final_df['order_date'].dt.quarter
-        
-        # Reorder columns for better readability
-        column_order = [
-            'order_id', 'order_date', 'year', 'month', 'month_name', 
-            'day_of_week', 'quarter',
-            'user_id', 'name', 'city', 'membership',
-            'restaurant_id', 'restaurant_name', 'cuisine', 'rating',
-            'total_amount'
+        sections = [
+            (" 1. ORDER TRENDS OVER TIME", None, results['order_trends']),
+            (" 2. USER BEHAVIOR PATTERNS", "Top 10 Users by Total Spending:", results['user_stats'].head(10)),
+            (" 3. CITY-WISE PERFORMANCE", None, results['city_stats']),
+            (" 4. CUISINE-WISE PERFORMANCE", None, results['cuisine_stats']),
+            (" 5. MEMBERSHIP IMPACT (Gold vs Regular)", None, results['membership_stats']),
+            (" 7. SEASONALITY ANALYSIS", None, results['quarter_stats']),
+            (" 8. DAY OF WEEK ANALYSIS", None, results['day_of_week_stats']),
+            (" 9. TOP PERFORMING RESTAURANTS", "Top 15 Restaurants by Revenue:",
+             results['restaurant_stats'].head(15)),
+            (" 10. RATING ANALYSIS", None, results['rating_analysis']),
         ]
+        for title, caption, table in sections:
+            print(title)
+            print("-" * 70)
+            if caption:
+                print(caption)
+            print(table)
+            print()
+            if title.startswith(" 5.") and 'revenue_distribution' in results:
+                self._print_revenue_distribution(results['revenue_distribution'])
         
-        self.final_df = self.final_df[column_order]
-        
-        # Save to CSV
-        self.final_df.to_csv(output_path, index=False)
-        
-        print(f"✓ Final dataset saved to: {output_path}")
-        print(f"✓ Total rows: {len(self.final_df)}")
-        print(f"✓ Total columns: {len(self.final_df.columns)}")
-        print(f"\nDataset Summary:")
-        print(f"  - Date range: {self.final_df['order_date'].min().date()} to {self.final_df['order_date'].max().date()}")
-        print(f"  - Unique users: {self.final_df['user_id'].nunique()}")
-        print(f"  - Unique restaurants: {self.final_df['restaurant_id'].nunique()}")
-        print(f"  - Total revenue: ${self.final_df['total_amount'].sum():,.2f}")
-        print(f"  - Average order value: ${self.final_df['total_amount'].mean():.2f}")
-        print(f"\nFirst 10 rows of final dataset:")
-        print(self.final_df.head(10))
+        print(f"Unique users: {results['unique_users']}")
+        print("(Unique user counts are HyperLogLog estimates, typically within ~1%;")
+        print(" the median and percentiles are KLL sketch estimates)")
         print()
+        print("=" * 70)
+        print("ANALYSIS COMPLETE")
+        print("=" * 70)
         
+        return results
+    
+    @staticmethod
+    def _report_frame(stats, columns, labels):
+        """Select, round and relabel the columns of one report section"""
+        frame = stats[columns].round(2)
+        frame.columns = labels
+        return frame
+    
+    def _delta_writer(self, output_path, run_number):
+        """Writer for one incremental delta: CSV appends, columnar adds a part file"""
+        category_dtypes = self._category_dtypes()
+        if self.partitioned:
+            return PartitionedDatasetWriter(output_path, category_dtypes, append=True)
+        if dataset_format(output_path) == 'csv':
+            return DatasetWriter(output_path, category_dtypes, append=True)
+        
+        if os.path.isfile(output_path):
+            raise ValueError(
+                f"{output_path} is a single file; incremental columnar output needs a directory of part files"
+            )
+        os.makedirs(output_path, exist_ok=True)
+        extension = os.path.splitext(output_path)[1]
+        part_path = os.path.join(output_path, f"part-{run_number:05d}{extension}")
+        return DatasetWriter(part_path, category_dtypes)
+    
+    @profiled('load_final_dataset')
+    def load_final_dataset(self, dataset_path, start=None, end=None):
+        """Load a previously saved final dataset for the analysis report
+        
+        Only the columns the report needs are read; with Parquet/Arrow input
+        no CSV or date parsing is involved. `start`/`end` ('YYYY-MM-DD',
+        inclusive) restrict the report to those order dates; of a
+        partitioned dataset only the overlapping parts are read.
+        """
+        self.final_df = self._cached(
+            'report_dataset', [dataset_path],
+            lambda: load_dataset(dataset_path, columns=REPORT_COLUMNS, compact=self.compact,
+                                 start=start, end=end),
+            params={'start': start, 'end': end}
+        )
+        if self.verbose:
+            print(f"✓ Loaded {len(self.final_df)} rows from {dataset_path}")
+            print(f"✓ Memory: {memory_usage_mb(self.final_df):.2f} MB")
         return self.final_df
     
+    def _category_dtypes(self):
+        """Fixed categorical dtypes for the string columns of the final dataset"""
+        dtypes = {
+            'month_name': MONTH_NAME_DTYPE,
+            'day_of_week': DAY_NAME_DTYPE,
+        }
+        for df, columns in ((self.users_df, ['name', 'city', 'membership']),
+                            (self.restaurants_df, ['restaurant_name', 'cuisine'])):
+            if df is None:
+                continue
+            for column in columns:
+                dtypes[column] = pd.CategoricalDtype(sorted(df[column].dropna().unique()))
+        return dtypes
+    
+    def _compact(self, df):
+        """Apply COMPACT_SCHEMA to a freshly loaded frame and report the saving"""
+        if not self.compact:
+            return df
+        if not self.verbose:
+            return compact_frame(df)
+        before = memory_usage_mb(df)
+        df = compact_frame(df)
+        after = memory_usage_mb(df)
+        saving = (1 - after / before) * 100 if before else 0.0
+        self._log(f"✓ Memory: {before:.2f} MB → {after:.2f} MB ({saving:.0f}% smaller)")
+        return df
+    
+    def _parse_order_dates(self, orders_df):
+        """Convert the dd-mm-YYYY order_date strings to datetime"""
+        orders_df['order_date'] = parse_dates(orders_df['order_date'], '%d-%m-%Y')
+        return orders_df
+    
+    def _enrich_orders(self, orders_chunk):
+        """Parse, join and add calendar features to one raw chunk of orders.csv"""
+        orders_chunk = self._parse_order_dates(orders_chunk)
+        if self.compact:
+            orders_chunk = compact_frame(orders_chunk)
+        enriched = self._join_restaurants(self._join_users(orders_chunk))
+        return self._add_time_features(enriched)
+    
+    def _dimension_index(self, name, table, key):
+        """Lookup index for a dimension table, built (or loaded) once per table
+        
+        None when the key is not unique; such tables keep pd.merge's
+        one-row-per-match LEFT JOIN semantics.
+        """
+        if self.join_mode != 'index':
+            return None
+        cached = self._dimension_indexes.get(name)
+        if cached is not None and cached[0] is table:
+            return cached[1]
+        
+        index = None
+        if self.index_dir:
+            path = os.path.join(self.index_dir, f"{name}_index.npz")
+            index = DimensionIndex.load(path, table)
+        if index is None:
+            try:
+                index = DimensionIndex(table, key)
+            except ValueError as e:
+                self._log(f"  ⚠ {e}; using pd.merge for {name}")
+            else:
+                if self.index_dir:
+                    index.save(path)
+        self._dimension_indexes[name] = (table, index)
+        return index
+    
+    def _join_users(self, orders_df):
+        """LEFT JOIN a block of orders with the users table on user_id"""
+        index = self._dimension_index('users', self.users_df, 'user_id')
+        if index is not None:
+            return index.join(orders_df)
+        return pd.merge(
+            orders_df,
+            self.users_df,
+            on='user_id',
+            how='left'
+        )
+    
+    def _join_restaurants(self, merged_df):
+        """LEFT JOIN (orders + users) with the restaurants table on restaurant_id"""
+        index = self._dimension_index('restaurants', self.restaurants_df, 'restaurant_id')
+        if index is not None:
+            joined_df = index.join(merged_df, suffixes=('_order', '_restaurant'))
+        else:
+            joined_df = pd.merge(
+                merged_df,
+                self.restaurants_df,
+                on='restaurant_id',
+                how='left',
+                suffixes=('_order', '_restaurant')
+            )
+        
+        # Clean up column names (remove duplicate restaurant_name from orders)
+        if 'restaurant_name_order' in joined_df.columns:
+            joined_df = joined_df.drop('restaurant_name_order', axis=1)
+            joined_df = joined_df.rename(columns={'restaurant_name_restaurant': 'restaurant_name'})
+        
+        return joined_df
+    
+    def _add_time_features(self, df):
+        """Derive calendar columns from order_date and apply FINAL_COLUMNS order
+        
+        Calendar fields are small integers looked up per distinct day; month
+        and day names are categoricals over the integer codes, so the label
+        strings are only materialized when displayed or written out.
+        """
+        for column, values in calendar_features(df['order_date']).items():
+            df[column] = values
+        return df[FINAL_COLUMNS]
+    
+    @profiled('build_cube', rows_in=lambda self: len(self.final_df))
+    def build_cube(self):
+        """Aggregate final_df into the OLAP cube behind the report and the charts
+        
+        With workers > 1 every worker aggregates a share of the partitions
+        into a partial cube and the partial cubes are merged.
+        """
+        if self.workers > 1:
+            partitions = partition_orders(self.final_df, self.partition_by, self.workers)
+            with PartitionedExecutor(self, self.workers) as executor:
+                self.cube = executor.build_cube(partitions, self.approximate, self.hll_precision,
+                                                self.quantile_error)
+        else:
+            self.cube = OLAPCube.build(self.final_df, self.approximate, self.hll_precision,
+                                       self.quantile_error)
+        return self.cube
+    
+    def analysis_results(self):
+        """Compute every section of the analysis report as data
+        
+        The order-level dataset is scanned once to build the OLAP cube;
+        every section is a rollup of it. Returns a dict of DataFrames (the
+        revenue distribution is a Series), keyed by section;
+        `report_to_json` converts it for export.
+        """
+        cube = self.build_cube()
+        results = {}
+        
+        # 1. Order Trends Over Time
+        monthly_orders = cube.rollup(['year', 'month_name'])[['orders', 'revenue']].round(2)
+        monthly_orders.columns = ['Total Orders', 'Total Revenue']
+        results['order_trends'] = monthly_orders
+        
+        # 2. User Behavior Patterns (an exact ranking, also in approximate mode)
+        if 'users' in cube.cuboids:
+            users = cube.cuboids['users'].set_index('user_id')
+        else:
+            users = AggregationEngine(self.final_df).aggregate('user_id', sums=['total_amount'])
+            users = users.rename(columns={'count': 'orders', 'total_amount_sum': 'revenue'})
+        user_stats = pd.DataFrame({
+            'Order Count': users['orders'],
+            'Total Spent': users['revenue'],
+            'Avg Order Value': users['revenue'].round(2) / users['orders'],
+        }).round(2)
+        results['user_stats'] = user_stats.sort_values('Total Spent', ascending=False)
+        
+        # 3. City-wise Performance
+        city_stats = self._rollup_stats(cube, 'city').round(2)
+        city_stats['Unique Users'] = cube.unique_users('city')
+        results['city_stats'] = city_stats.sort_values('Total Revenue', ascending=False)
+        
+        # 4. Cuisine-wise Performance
+        cuisine = cube.rollup('cuisine')
+        cuisine_stats = self._rollup_stats(cube, 'cuisine')
+        cuisine_stats['Avg Rating'] = cuisine['rating_sum'] / cuisine['rated_orders']
+        cuisine_stats = cuisine_stats.round(2)
+        results['cuisine_stats'] = cuisine_stats.sort_values('Total Revenue', ascending=False)
+        
+        # 5. Membership Impact
+        membership_stats = self._rollup_stats(cube, 'membership').round(2)
+        membership_stats['Unique Users'] = cube.unique_users('membership')
+        results['membership_stats'] = membership_stats
+        
+        # 6. Revenue Distribution
+        results['revenue_distribution'] = pd.Series(cube.amount_summary(), name='total_amount')
+        
+        # 7. Seasonality Analysis
+        quarter_stats = cube.rollup('quarter')[['orders', 'revenue']].round(2)
+        quarter_stats.columns = ['Total Orders', 'Total Revenue']
+        results['quarter_stats'] = quarter_stats
+        
+        # 8. Day of Week Analysis
+        dow_stats = self._rollup_stats(cube, 'day_of_week').round(2)
+        results['day_of_week_stats'] = dow_stats.reindex(DAY_NAMES)
+        
+        # 9. Top Performing Restaurants
+        restaurants = cube.rollup(['restaurant_id', 'restaurant_name', 'cuisine'])
+        restaurant_stats = pd.DataFrame({
+            'Total Orders': restaurants['orders'],
+            'Total Revenue': restaurants['revenue'],
+            'Rating': restaurants['rating_sum'] / restaurants['rated_orders'],
+        }).round(2)
+        results['restaurant_stats'] = restaurant_stats.sort_values('Total Revenue', ascending=False)
+        
+        # 10. Rating Analysis (the cube holds one row per distinct rating)
+        results['rating_analysis'] = self._rating_analysis(cube.rollup('rating'))
+        
+        return results
+    
+    @staticmethod
+    def _rating_analysis(ratings):
+        """Order Count / Avg Order Value per rating category, from orders and revenue per rating"""
+        rating_category = pd.cut(ratings.index, bins=RATING_BINS, labels=RATING_LABELS)
+        rating_analysis = ratings.groupby(rating_category, observed=True)[['orders', 'revenue']].sum()
+        rating_analysis = pd.DataFrame({
+            'Order Count': rating_analysis['orders'],
+            'Avg Order Value': rating_analysis['revenue'].round(2) / rating_analysis['orders'],
+        }).round(2)
+        rating_analysis = rating_analysis.reindex(pd.CategoricalIndex(
+            RATING_LABELS, categories=RATING_LABELS, ordered=True, name='rating_category'
+        ))
+        rating_analysis['Order Count'] = rating_analysis['Order Count'].fillna(0).astype(int)
+        return rating_analysis
+    
+    def _print_revenue_distribution(self, revenue):
+        print(" 6. REVENUE DISTRIBUTION")
+        print("-" * 70)
+        print(f"Total Revenue: ${revenue['sum']:,.2f}")
+        print(f"Average Order Value: ${revenue['mean']:.2f}")
+        print(f"Median Order Value: ${revenue['median']:.2f}")
+        print(f"Standard Deviation: ${revenue['std']:.2f}")
+        print(f"Min Order Value: ${revenue['min']:.2f}")
+        print(f"Max Order Value: ${revenue['max']:.2f}")
+        percentiles = [key for key in revenue.index if re.fullmatch(r'p\d+', key)]
+        if percentiles:
+            print("Percentiles: " + ", ".join(f"{key}=${revenue[key]:.2f}" for key in percentiles))
+            print(f"(Median, standard deviation and percentiles are KLL estimates, "
+                  f"rank error within ~{self.quantile_error:.1%})")
+        print()
+    
+    @staticmethod
+    def _rollup_stats(cube, key):
+        """Total Orders / Total Revenue / Avg Order Value per value of `key`
+        
+        Averages divide the revenue rounded to cents, so a cube merged from
+        partial cubes (summed in another order) gives the same rounded values.
+        """
+        rollup = cube.rollup(key)
+        return pd.DataFrame({
+            'Total Orders': rollup['orders'],
+            'Total Revenue': rollup['revenue'],
+            'Avg Order Value': rollup['revenue'].round(2) / rollup['orders'],
+        })
+    
+    @profiled('analysis_report', rows_in=lambda self: len(self.final_df))
     def generate_analysis_report(self):
-        """Generate comprehensive analysis of the final dataset"""
+        """Generate comprehensive analysis of the final dataset
+        
+        Returns the sections from `analysis_results`; they are printed as
+        well unless the pipeline runs quietly.
+        """
+        results = self.analysis_results()
+        if not self.verbose:
+            return results
+        
         print("=" * 70)
         print("COMPREHENSIVE DATA ANALYSIS REPORT")
         print("=" * 70)
         print()
+        if self.cube.approximate:
+            print(f"Approximate mode: unique users are HyperLogLog estimates "
+                  f"(~{1.04 / 2 ** (self.hll_precision / 2):.1%} standard error)")
+            print()
         
-        # 1. Order Trends Over Time
         print(" 1. ORDER TRENDS OVER TIME")
         print("-" * 70)
-        monthly_orders = self.final_df.groupby(['year', 'month_name']).agg({
-            'order_id': 'count',
-            'total_amount': 'sum'
-        }).round(2)
-        monthly_orders.columns = ['Total Orders', 'Total Revenue']
-        print(monthly_orders)
+        print(results['order_trends'])
         print()
         
-        # 2. User Behavior Patterns
         print(" 2. USER BEHAVIOR PATTERNS")
         print("-" * 70)
-        user_stats = self.final_df.groupby('user_id').agg({
-            'order_id': 'count',
-            'total_amount': ['sum', 'mean']
-        }).round(2)
-        user_stats.columns = ['Order Count', 'Total Spent', 'Avg Order Value']
-        user_stats = user_stats.sort_values('Total Spent', ascending=False)
         print("Top 10 Users by Total Spending:")
-        print(user_stats.head(10))
+        print(results['user_stats'].head(10))
         print()
         
-        # 3. City-wise Performance
         print(" 3. CITY-WISE PERFORMANCE")
         print("-" * 70)
-        city_stats = self.final_df.groupby('city').agg({
-            'order_id': 'count',
-            'total_amount': ['sum', 'mean'],
-            'user_id': 'nunique'
-        }).round(2)
-        city_stats.columns = ['Total Orders', 'Total Revenue', 'Avg Order Value', 'Unique Users']
-        city_stats = city_stats.sort_values('Total Revenue', ascending=False)
-        print(city_stats)
+        print(results['city_stats'])
         print()
         
-        # 4. Cuisine-wise Performance
         print(" 4. CUISINE-WISE PERFORMANCE")
         print("-" * 70)
-        cuisine_stats = self.final_df.groupby('cuisine').agg({
-            'order_id': 'count',
-            'total_amount': ['sum', 'mean'],
-            'rating': 'mean'
-        }).round(2)
-        cuisine_stats.columns = ['Total Orders', 'Total Revenue', 'Avg Order Value', 'Avg Rating']
-        cuisine_stats = cuisine_stats.sort_values('Total Revenue', ascending=False)
-        print(cuisine_stats)
+        print(results['cuisine_stats'])
         print()
         
-        # 5. Membership Impact
         print(" 5. MEMBERSHIP IMPACT (Gold vs Regular)")
         print("-" * 70)
-        membership_stats = self.final_df.groupby('membership').agg({
-            'order_id': 'count',
-            'total_amount': ['sum', 'mean'],
-            'user_id': 'nunique'
-        }).round(2)
-        membership_stats.columns = ['Total Orders', 'Total Revenue', 'Avg Order Value', 'Unique Users']
-        print(membership_stats)
+        print(results['membership_stats'])
         print()
         
-        # 6. Revenue Distribution
-        print(" 6. REVENUE DISTRIBUTION")
-        print("-" * 70)
-        print(f"Total Revenue: ${self.final_df['total_amount'].sum():,.2f}")
-        print(f"Average Order Value: ${self.final_df['total_amount'].mean():.2f}")
-        print(f"Median Order Value: ${self.final_df['total_amount'].median():.2f}")
-        print(f"Standard Deviation: ${self.final_df['total_amount'].std():.2f}")
-        print(f"Min Order Value: ${self.final_df['total_amount'].min():.2f}")
-        print(f"Max Order Value: ${self.final_df['total_amount'].max():.2f}")
-        print()
+        self._print_revenue_distribution(results['revenue_distribution'])
         
-        # 7. Seasonality Analysis
         print(" 7. SEASONALITY ANALYSIS")
         print("-" * 70)
-        quarter_stats = self.final_df.groupby('quarter').agg({
-            'order_id': 'count',
-            'total_amount': 'sum'
-        }).round(2)
-        quarter_stats.columns = ['Total Orders', 'Total Revenue']
-        print(quarter_stats)
+        print(results['quarter_stats'])
         print()
         
-        # 8. Day of Week Analysis
         print(" 8. DAY OF WEEK ANALYSIS")
         print("-" * 70)
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        dow_stats = self.final_df.groupby('day_of_week').agg({
-            'order_id': 'count',
-            'total_amount': ['sum', 'mean']
-        }).round(2)
-        dow_stats.columns = ['Total Orders', 'Total Revenue', 'Avg Order Value']
-        dow_stats = dow_stats.reindex(day_order)
-        print(dow_stats)
+        print(results['day_of_week_stats'])
         print()
         
-        # 9. Top Performing Restaurants
         print(" 9. TOP PERFORMING RESTAURANTS")
         print("-" * 70)
-        restaurant_stats = self.final_df.groupby(['restaurant_id', 'restaurant_name', 'cuisine']).agg({
-            'order_id': 'count',
-            'total_amount': 'sum',
-            'rating': 'first'
-        }).round(2)
-        restaurant_stats.columns = ['Total Orders', 'Total Revenue', 'Rating']
-        restaurant_stats = restaurant_stats.sort_values('Total Revenue', ascending=False)
         print("Top 15 Restaurants by Revenue:")
-        print(restaurant_stats.head(15))
+        print(results['restaurant_stats'].head(15))
         print()
         
-        # 10. Rating Analysis
         print(" 10. RATING ANALYSIS")
         print("-" * 70)
-        rating_bins = [0, 3.0, 3.5, 4.0, 4.5, 5.0]
-        rating_labels = ['Poor (0-3.0)', 'Fair (3.0-3.5)', 'Good (3.5-4.0)', 'Great (4.0-4.5)', 'Excellent (4.5-5.0)']
-        self.final_df['rating_category'] = pd.cut(self.final_df['rating'], bins=rating_bins, labels=rating_labels)
-        rating_analysis = self.final_df.groupby('rating_category').agg({
-            'order_id': 'count',
-            'total_amount': 'mean'
-        }).round(2)
-        rating_analysis.columns = ['Order Count', 'Avg Order Value']
-        print(rating_analysis)
+        print(results['rating_analysis'])
         print()
         
         print("=" * 70)
         print("ANALYSIS COMPLETE")
         print("=" * 70)
+        
+        return results
+    
+    def diagnostics(self, table, *items):
+        """Console diagnostics of a loaded table, computed only when asked for
+        
+        `table` is 'orders', 'users', 'restaurants' or 'final'; `items` are
+        keys of DIAGNOSTICS (all that apply to the table by default).
+        """
+        df = {
+            'orders': self.orders_df,
+            'users': self.users_df,
+            'restaurants': self.restaurants_df,
+            'final': self.final_df,
+        }[table]
+        if df is None:
+            raise ValueError(f"The {table} table is not loaded")
+        if not items:
+            items = [item for item, (columns, _) in DIAGNOSTICS.items()
+                     if all(column in df.columns for column in columns)]
+        return {item: DIAGNOSTICS[item][1](df) for item in items}
+    
+    def _cached(self, name, sources, compute, params=None):
+        """compute() through the intermediate cache, when one is configured"""
+        if self.cache is None:
+            return compute()
+        key = self.cache.key(name, sources, params={'compact': self.compact, **(params or {})})
+        # The cache index is shared by the loader threads of load_sources
+        with self._cache_lock:
+            df = self.cache.get(key)
+        if df is not None:
+            self._log(f"✓ {name} served from cache ({self.cache.cache_dir})")
+            return df
+        df = compute()
+        with self._cache_lock:
+            self.cache.put(key, df)
+        return df
+    
+    def _log(self, *args, **kwargs):
+        """print() unless the pipeline runs quietly
+        
+        In a load_sources worker thread the line is kept for the main thread.
+        """
+        if not self.verbose:
+            return
+        messages = getattr(self._thread_state, 'messages', None)
+        if messages is not None:
+            messages.append(' '.join(str(arg) for arg in args))
+        else:
+            print(*args, **kwargs)
+
+
+def report_to_json(results):
+    """JSON-ready form of a report dict: tables become lists of records"""
+    exported = {}
+    for section, value in results.items():
+        if isinstance(value, pd.DataFrame):
+            value = json.loads(value.reset_index().to_json(orient='records', date_format='iso'))
+        elif isinstance(value, pd.Series):
+            value = json.loads(value.to_json())
+        exported[section] = value
+    return exported
+
+
+def parse_args(argv=None):
+    """Command line options for the integration pipeline"""
+    parser = argparse.ArgumentParser(description="Food Delivery Data Integration Project")
+    parser.add_argument('--orders', default='/mnt/user-data/uploads/orders.csv',
+                        help="Path to orders.csv")
+    parser.add_argument('--users', default='/mnt/user-data/uploads/users.json',
+                        help="Path to users.json (JSON array or JSON Lines)")
+    parser.add_argument('--restaurants', default='/mnt/user-data/uploads/restaurants.sql',
+                        help="Path to restaurants.sql")
+    parser.add_argument('--output', default='/home/claude/final_food_delivery_dataset.csv',
+                        help="Where to write the final dataset; a .parquet or .arrow/.feather "
+                             "extension selects columnar output (requires pyarrow)")
+    parser.add_argument('--join', choices=JOIN_MODES, default='index',
+                        help="Enrich orders through id -> row lookup indexes of the dimension "
+                             "tables (default), with pd.merge LEFT JOINs, or with an on-disk "
+                             "hash-partitioned join of users that do not fit in memory (spill)")
+    parser.add_argument('--memory-budget-mb', type=float, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help="Memory for one bucket pair of the spill join; sets the bucket count "
+                             "(bounds the users side only: orders and the result stay in memory)")
+    parser.add_argument('--spill-dir',
+                        help="Where the spill join writes its buckets (default: a temp directory)")
+    parser.add_argument('--index-dir',
+                        help="Persist/reuse the dimension lookup indexes in this directory")
+    parser.add_argument('--sql-loader', choices=['stream', 'sqlite'], default='stream',
+                        help="How restaurants.sql is read: direct INSERT parsing (default) or "
+                             "executing the script in an in-memory SQLite database")
+    parser.add_argument('--no-compact', action='store_true',
+                        help="Keep the loaders' default dtypes instead of the compact schema "
+                             "(categoricals, narrow ints, float32 ratings)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only process orders beyond the watermark in --state-dir, append them to "
+                             "the output and update the persisted running aggregates")
+    parser.add_argument('--state-dir', default='/home/claude/incremental_state',
+                        help="Directory holding the incremental watermark and aggregates")
+    parser.add_argument('--watermark-column', choices=['order_id', 'order_date'], default='order_id',
+                        help="Column whose maximum marks the orders already processed")
+    parser.add_argument('--report-only', action='store_true',
+                        help="Skip integration and run the analysis report on an existing --output dataset")
+    parser.add_argument('--stream', action='store_true',
+                        help="Read orders in chunks and append enriched rows to the output "
+                             "(bounded memory, skips the in-memory analysis report)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes for the report's cube and the CSV output (full "
+                             "pipeline) or for enriching chunks (--stream); 0 uses every core")
+    parser.add_argument('--partition-by', choices=['month', 'user'], default='month',
+                        help="How orders are partitioned into the workers' partial cubes: "
+                             "by order month or by a hash of user_id")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Measure every step (wall/CPU time, rows, peak RSS, bytes read/written), "
+                             "print a summary table and save it to PATH (.json, or .csv)")
+    parser.add_argument('--cprofile-dir',
+                        help="Also run each step under cProfile and dump <step>.prof files here")
+    parser.add_argument('--quiet', action='store_true',
+                        help="Batch mode: no banners, previews or diagnostics (which cost extra "
+                             "passes over the data); only errors are printed")
+    parser.add_argument('--report-json', metavar='PATH',
+                        help="Save the analysis report sections as JSON")
+    parser.add_argument('--cache-dir',
+                        help="Cache parsed sources and the merged dataset here (Arrow IPC, "
+                             "memory-mapped reads); unchanged inputs skip parsing and merging")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help="Size cap of --cache-dir; least recently used entries are evicted")
+    parser.add_argument('--cache-key', choices=['mtime', 'hash'], default='mtime',
+                        help="Detect changed inputs by size + modification time or by content hash")
+    parser.add_argument('--store', metavar='PATH',
+                        help="Also materialize the final dataset into an indexed SQL store for "
+                             "ad-hoc queries (a .duckdb path uses DuckDB, anything else SQLite)")
+    parser.add_argument('--partitioned', action='store_true',
+                        help="Write the final dataset as a directory of year/month partitions sorted "
+                             "by order_date, with per-part min/max statistics")
+    parser.add_argument('--start', help="With --report-only: first order_date to analyze (YYYY-MM-DD)")
+    parser.add_argument('--end', help="With --report-only: last order_date to analyze (YYYY-MM-DD)")
+    parser.add_argument('--concurrent-load', action='store_true',
+                        help="Read and parse orders.csv, users.json and restaurants.sql "
+                             "concurrently (in threads) instead of one after another")
+    parser.add_argument('--approx', action='store_true',
+                        help="Approximate analytics: HyperLogLog unique users and KLL sketch "
+                             "median/percentiles (mergeable, fixed memory)")
+    parser.add_argument('--hll-precision', type=int, default=14,
+                        help="HyperLogLog precision p: 2**p registers, ~1.04/sqrt(2**p) error")
+    parser.add_argument('--quantile-error', type=float, default=0.01,
+                        help="Rank error of the KLL quantile sketches (e.g. 0.01 = 1%%)")
+    parser.add_argument('--cube', metavar='PATH',
+                        help="Save the OLAP cube behind the report here (read by "
+                             "Create_Visualizations.py --cube)")
+    parser.add_argument('--customer-features', metavar='PATH',
+                        help="Write a per-user feature table (recency, frequency, monetary, RFM "
+                             "scores, cohort month, inter-order gaps) here (.csv/.parquet/.arrow); "
+                             "--incremental refreshes it with the new orders")
+    parser.add_argument('--validate', action='store_true',
+                        help="Check data-quality rules (orphan ids, duplicate order_ids, negative "
+                             "amounts, out-of-range ratings) before the merge and quarantine failing rows")
+    parser.add_argument('--quarantine-dir', default='/home/claude/quarantine',
+                        help="With --validate: where quarantined rows and per-rule counts are written")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Order rows per chunk in --stream mode")
+    args = parser.parse_args(argv)
+    if args.join == 'spill' and (args.stream or args.incremental):
+        parser.error("--join spill needs the in-memory pipeline; --stream/--incremental keep users in memory")
+    if args.validate and (args.stream or args.incremental or args.report_only):
+        parser.error("--validate checks the loaded sources of the full pipeline")
+    if (args.start or args.end) and not args.report_only:
+        parser.error("--start/--end filter a saved dataset; use them with --report-only")
+    return args
 
 
-def main():
+def load_dimensions(integration, args):
+    """Steps 2-3 (users and restaurants), concurrently with --concurrent-load"""
+    if args.concurrent_load:
+        integration.load_sources(['users', 'restaurants'], loader=args.sql_loader)
+    else:
+        integration.load_json_data()
+        integration.load_sql_data(loader=args.sql_loader)
+
+
+def main(argv=None):
     """Main execution function"""
-    print("\n")
-    print("╔" + "═" * 68 + "╗")
-    print("║" + " " * 10 + "FOOD DELIVERY DATA INTEGRATION PROJECT" + " " * 19 + "║")
-    print("╚" + "═" * 68 + "╝")
-    print()
+    args = parse_args(argv)
+    workers = args.workers or default_workers()
+    profiler = StageProfiler(enabled=bool(args.profile or args.cprofile_dir),
+                             cprofile_dir=args.cprofile_dir)
+    cache = (IntermediateCache(args.cache_dir, args.cache_max_mb * 1024 ** 2, args.cache_key)
+             if args.cache_dir else None)
+    store = AnalyticalStore(args.store) if args.store and not args.report_only else None
+    
+    log = print if not args.quiet else (lambda *args, **kwargs: None)
+    
+    log("\n")
+    log("╔" + "═" * 68 + "╗")
+    log("║" + " " * 10 + "FOOD DELIVERY DATA INTEGRATION PROJECT" + " " * 19 + "║")
+    log("╚" + "═" * 68 + "╝")
+    log()
     
     # File paths
-    orders_path = '/mnt/user-data/uploads/orders.csv'
-    users_path = '/mnt/user-data/uploads/users.json'
-    restaurants_path = '/mnt/user-data/uploads/restaurants.sql'
-    output_path = '/home/claude/final_food_delivery_dataset.csv'
+    orders_path = args.orders
+    users_path = args.users
+    restaurants_path = args.restaurants
+    output_path = args.output
     
     # Initialize the integration pipeline
-    integration = FoodDeliveryDataIntegration(orders_path, users_path, restaurants_path)
+    integration = FoodDeliveryDataIntegration(orders_path, users_path, restaurants_path,
+                                              compact=not args.no_compact,
+                                              join_mode=args.join, index_dir=args.index_dir,
+                                              profiler=profiler, verbose=not args.quiet, cache=cache,
+                                              store=store, approximate=args.approx,
+                                              hll_precision=args.hll_precision,
+                                              quantile_error=args.quantile_error,
+                                              partitioned=args.partitioned,
+                                              memory_budget_mb=args.memory_budget_mb,
+                                              spill_dir=args.spill_dir, workers=workers,
+                                              partition_by=args.partition_by)
     
     # Execute the data integration pipeline
+    report = None
     try:
-        # Step 1: Load CSV
-        integration.load_csv_data()
-        
-        # Step 2: Load JSON
-        integration.load_json_data()
-        
-        # Step 3: Load SQL
-        integration.load_sql_data()
+        if args.report_only:
+            # Read the saved dataset (column projection) and rerun the report
+            integration.load_final_dataset(output_path, start=args.start, end=args.end)
+            report = integration.generate_analysis_report()
+            if args.customer_features:
+                integration.build_customer_features(args.customer_features, output_path,
+                                                    start=args.start, end=args.end)
+        elif args.incremental:
+            # Dimension tables are reloaded; only the order delta is enriched
+            load_dimensions(integration, args)
+            state = integration.process_incremental(
+                args.state_dir, output_path,
+                watermark_column=args.watermark_column,
+                chunk_size=args.chunk_size,
+                features_path=args.customer_features
+            )
+            report = integration.generate_incremental_report(state)
+        elif args.stream:
+            # Dimension tables are small and stay in memory
+            load_dimensions(integration, args)
+            
+            # Orders are read, merged and written one chunk at a time
+            integration.stream_final_dataset(output_path, chunk_size=args.chunk_size)
+            if args.customer_features:
+                integration.build_customer_features(args.customer_features, output_path)
+        else:
+            if args.concurrent_load:
+                # Steps 1-3: Load CSV, JSON and SQL concurrently
+                integration.load_sources(loader=args.sql_loader)
+            else:
+                # Step 1: Load CSV
+                integration.load_csv_data()
+                
+                # Step 2: Load JSON
+                integration.load_json_data()
+                
+                # Step 3: Load SQL
+                integration.load_sql_data(loader=args.sql_loader)
+            
+            if args.validate:
+                # Quarantine rows failing the data-quality rules
+                integration.validate_sources(args.quarantine_dir)
+            
+            # Step 4: Merge datasets
+            integration.merge_datasets()
+            
+            # Step 5: Create final dataset
+            integration.create_final_dataset(output_path)
+            
+            # Generate comprehensive analysis
+            report = integration.generate_analysis_report()
+            
+            if args.customer_features:
+                integration.build_customer_features(args.customer_features)
         
-        # Step 4: Merge datasets
-        integration.merge_datasets()
+        if args.cube and integration.cube is not None:
+            integration.cube.save(args.cube)
+            log(f"✓ OLAP cube ({integration.cube.size:,} rows) saved to: {args.cube}")
         
-        # Step 5: Create final dataset
-        integration.create_final_dataset(output_path)
+        if args.report_json and report is not None:
+            with open(args.report_json, 'w') as f:
+                json.dump(report_to_json(report), f, indent=2)
+            log(f"✓ Report saved to: {args.report_json}")
         
-        # Generate comprehensive analysis
-        integration.generate_analysis_report()
+        if profiler.enabled:
+            profiler.print_summary()
+            if args.profile:
+                profiler.save(args.profile)
+                log(f"✓ Stage profile saved to: {args.profile}")
         
-        print("\n SUCCESS! All steps completed successfully!")
-        print(f" Final dataset saved at: {output_path}")
-        print("\n")
+        log("\n SUCCESS! All steps completed successfully!")
+        log(f" Final dataset saved at: {output_path}")
+        log("\n")
         
     except Exception as e:
         print(f"\n ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        if store is not None:
+            store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+"""
+Incremental Aggregate State
+Persisted running aggregates for append-only processing of new orders.
+
+The state keeps a watermark (highest order_id or order_date processed so far),
+per-section sums and counts, HyperLogLog sketches for unique users and a KLL
+sketch of order amounts (median and percentiles). Each
+incremental run only folds the contribution of the new orders into it, so
+refreshing the report costs time proportional to the delta, not the history.
+"""
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from Aggregation_Engine import AggregationEngine
+from Sketches import HyperLogLog, KLLSketch, grouped_hyperloglogs
+
+STATE_FILE = 'incremental_state.pkl'
+
+# Report sections kept as running aggregates: name -> grouping keys
+INCREMENTAL_SECTIONS = {
+    'monthly': ['year', 'month'],
+    'user': ['user_id'],
+    'city': ['city'],
+    'cuisine': ['cuisine'],
+    'membership': ['membership'],
+    'quarter': ['quarter'],
+    'day_of_week': ['day_of_week'],
+    'restaurant': ['restaurant_id'],
+    'rating': ['rating'],
+}
+
+# Sections whose unique users are tracked with one sketch per group
+UNIQUE_USER_SECTIONS = ['city', 'membership']
+
+WATERMARK_COLUMNS = ['order_id', 'order_date']
+
+
+class IncrementalState:
+    def __init__(self, watermark_column='order_id', precision=14, quantile_error=0.01):
+        """Empty state: nothing processed yet"""
+        if watermark_column not in WATERMARK_COLUMNS:
+            raise ValueError(f"watermark_column must be one of {WATERMARK_COLUMNS}")
+        self.watermark_column = watermark_column
+        self.precision = precision
+        self.watermark = None
+        self.rows_processed = 0
+        self.runs = []
+        self.aggregates = {}
+        self.unique_users = HyperLogLog(precision)
+        self.section_unique_users = {section: {} for section in UNIQUE_USER_SECTIONS}
+        self.amount_quantiles = KLLSketch(quantile_error)
+
+    @classmethod
+    def load(cls, state_dir, watermark_column='order_id', precision=14, quantile_error=0.01):
+        """Load the persisted state from `state_dir` (a fresh state if there is none)
+
+        `precision` and `quantile_error` only apply to a fresh state; a saved
+        state keeps the sketches it was built with.
+        """
+        path = os.path.join(state_dir, STATE_FILE)
+        if not os.path.exists(path):
+            return cls(watermark_column, precision, quantile_error)
+
+        saved = pd.read_pickle(path)
+        cuisine = saved['aggregates'].get('cuisine')
+        if cuisine is not None and 'rating_count' not in cuisine.columns:
+            raise ValueError(f"State in {state_dir} has no rated-order counts (an older version); "
+                             f"remove it to rebuild the state")
+        if saved['watermark_column'] != watermark_column:
+            raise ValueError(
+                f"State in {state_dir} uses watermark column '{saved['watermark_column']}', "
+                f"not '{watermark_column}'"
+            )
+
+        state = cls(watermark_column, saved['precision'])
+        state.watermark = saved['watermark']
+        state.rows_processed = saved['rows_processed']
+        state.runs = saved['runs']
+        state.aggregates = saved['aggregates']
+        state.unique_users = HyperLogLog(state.precision, saved['unique_users'])
+        state.section_unique_users = {
+            section: {key: HyperLogLog(state.precision, registers) for key, registers in sketches.items()}
+            for section, sketches in saved['section_unique_users'].items()
+        }
+        # States saved before the amount sketch existed cannot report quantiles
+        amount_quantiles = saved.get('amount_quantiles')
+        state.amount_quantiles = KLLSketch.from_state(amount_quantiles) if amount_quantiles else None
+        return state
+
+    def save(self, state_dir):
+        """Persist the state atomically (write to a temp file, then rename)"""
+        os.makedirs(state_dir, exist_ok=True)
+        path = os.path.join(state_dir, STATE_FILE)
+        saved = {
+            'watermark_column': self.watermark_column,
+            'precision': self.precision,
+            'watermark': self.watermark,
+            'rows_processed': self.rows_processed,
+            'runs': self.runs,
+            'aggregates': self.aggregates,
+            'unique_users': self.unique_users.registers,
+            'section_unique_users': {
+                section: {key: sketch.registers for key, sketch in sketches.items()}
+                for section, sketches in self.section_unique_users.items()
+            },
+            'amount_quantiles': self.amount_quantiles.state() if self.amount_quantiles is not None else None,
+        }
+        pd.to_pickle(saved, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def new_orders(self, orders_df, watermark=None):
+        """Rows of `orders_df` beyond the watermark (all rows on the first run)"""
+        watermark = self.watermark if watermark is None else watermark
+        if watermark is None:
+            return orders_df
+        return orders_df[orders_df[self.watermark_column] > watermark]
+
+    def update(self, enriched_df):
+        """Fold the aggregates of a block of new, enriched orders into the state
+
+        The watermark is not moved here; call `finish_run` once every block of
+        the delta has been added, since order files need not be sorted.
+        """
+        if enriched_df.empty:
+            return
+
+        engine = AggregationEngine(enriched_df)
+        for section, keys in INCREMENTAL_SECTIONS.items():
+            sums = ['total_amount', 'rating'] if section == 'cuisine' else ['total_amount']
+            # Rated orders: the average rating leaves out orders without one
+            counts = ['rating'] if section == 'cuisine' else []
+            partial = engine.aggregate(keys, sums=sums, counts=counts)
+            if isinstance(partial.index, pd.CategoricalIndex):
+                # Plain labels so partials from different runs align
+                partial.index = partial.index.astype(object)
+            if section in self.aggregates:
+                partial = self.aggregates[section].add(partial, fill_value=0)
+            self.aggregates[section] = partial
+
+        self.unique_users.add(enriched_df['user_id'])
+        for section in UNIQUE_USER_SECTIONS:
+            sketches = self.section_unique_users[section]
+            key_column = INCREMENTAL_SECTIONS[section][0]
+            for key, sketch in grouped_hyperloglogs(enriched_df[key_column], enriched_df['user_id'],
+                                                     self.precision).items():
+                if key in sketches:
+                    sketches[key].merge(sketch)
+                else:
+                    sketches[key] = sketch
+        if self.amount_quantiles is not None:
+            self.amount_quantiles.add(enriched_df['total_amount'].to_numpy(dtype=np.float64))
+
+        self.rows_processed += len(enriched_df)
+
+    def finish_run(self, new_watermark, new_rows):
+        """Advance the watermark and record the run"""
+        if new_watermark is not None and (self.watermark is None or new_watermark > self.watermark):
+            self.watermark = new_watermark
+        self.runs.append({
+            'run_at': datetime.now().isoformat(timespec='seconds'),
+            'new_rows': int(new_rows),
+            'watermark': str(self.watermark),
+        })
+
+    def section(self, name):
+        """Current totals of one section with derived means / unique users"""
+        if name in self.aggregates:
+            stats = self.aggregates[name].copy()
+        else:
+            # Nothing processed yet: the same columns, no rows
+            sums = ['total_amount_sum', 'rating_sum', 'rating_count'] if name == 'cuisine' else ['total_amount_sum']
+            keys = INCREMENTAL_SECTIONS[name]
+            index = (pd.MultiIndex.from_arrays([[]] * len(keys), names=keys) if len(keys) > 1
+                     else pd.Index([], name=keys[0]))
+            stats = pd.DataFrame({column: pd.Series(dtype=np.float64) for column in ['count'] + sums}, index=index)
+        stats['count'] = stats['count'].astype(np.int64)
+        # Revenue at cent precision, as the full report divides it
+        stats['total_amount_mean'] = stats['total_amount_sum'].round(2) / stats['count']
+        if 'rating_sum' in stats.columns:
+            stats['rating_mean'] = stats['rating_sum'] / stats['rating_count']
+            stats = stats.drop(columns=['rating_sum', 'rating_count'])
+        if name in self.section_unique_users:
+            sketches = self.section_unique_users[name]
+            stats['unique_users'] = [len(sketches[key]) if key in sketches else 0 for key in stats.index]
+        return stats
+
@@ -0,0 +1,166 @@
+"""
+Intermediate Cache
+On-disk cache of parsed and merged DataFrames keyed on their source files.
+
+An entry is identified by a name (e.g. 'users'), the fingerprints of the
+files it was built from and any parameters that change the result. A
+fingerprint is either the file's size + modification time (cheap) or a
+BLAKE2 hash of its content (survives touch/copy). Entries are stored as
+uncompressed Arrow IPC files and read back through a memory map, so a hit
+costs little more than the page-cache reads. The cache keeps its total size
+under a cap by evicting the least recently used entries. Without pyarrow,
+entries are pickled instead.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+INDEX_FILE = 'cache_index.json'
+
+# Bump when the loaders change what they produce, to invalidate old entries
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+FINGERPRINT_MODES = ('mtime', 'hash')
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class IntermediateCache:
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, fingerprint='mtime'):
+        """Cache in `cache_dir`, capped at `max_bytes` of entry files"""
+        if fingerprint not in FINGERPRINT_MODES:
+            raise ValueError(f"fingerprint must be one of {FINGERPRINT_MODES}")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+        if self.size_bytes > max_bytes:
+            # The cap may have been lowered since the entries were written
+            self._evict()
+            self._save_index()
+
+    def load_or_compute(self, name, sources, compute, params=None):
+        """Cached DataFrame for `name` built from `sources`, or compute() and store it"""
+        key = self.key(name, sources, params)
+        df = self.get(key)
+        if df is None:
+            df = compute()
+            self.put(key, df)
+        return df
+
+    def key(self, name, sources, params=None):
+        """Entry key: name + fingerprints of the source files + parameters"""
+        fingerprints = [self.file_fingerprint(path) for path in sources]
+        payload = json.dumps([CACHE_VERSION, name, fingerprints, params], sort_keys=True, default=str)
+        return f"{name}-{hashlib.sha1(payload.encode()).hexdigest()[:20]}"
+
+    def file_fingerprint(self, path):
+        """Fingerprint of one source file (of every file, for a directory of parts)"""
+        if os.path.isdir(path):
+            return [self.file_fingerprint(os.path.join(path, name)) for name in sorted(os.listdir(path))]
+        if self.fingerprint == 'hash':
+            digest = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+            return digest.hexdigest()
+        stat = os.stat(path)
+        return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+    def get(self, key):
+        """The cached DataFrame for `key`, or None"""
+        entry = self._index.get(key)
+        path = os.path.join(self.cache_dir, entry['file']) if entry else None
+        if path is None or not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        df = _read_entry(path)
+        entry['last_used'] = time.time()
+        self._save_index()
+        self.hits += 1
+        return df
+
+    def put(self, key, df):
+        """Store `df` under `key`, then evict least recently used entries over the cap"""
+        file_name = key + _entry_extension()
+        path = os.path.join(self.cache_dir, file_name)
+        _write_entry(df, path + '.tmp', arrow=file_name.endswith('.arrow'))
+        os.replace(path + '.tmp', path)
+
+        self._index[key] = {'file': file_name, 'bytes': os.path.getsize(path), 'last_used': time.time()}
+        self._evict()
+        self._save_index()
+
+    def clear(self):
+        for key in list(self._index):
+            self._remove(key)
+        self._save_index()
+
+    @property
+    def size_bytes(self):
+        return sum(entry['bytes'] for entry in self._index.values())
+
+    def _evict(self):
+        for key in sorted(self._index, key=lambda k: self._index[k]['last_used']):
+            if self.size_bytes <= self.max_bytes:
+                break
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._index.pop(key)
+        path = os.path.join(self.cache_dir, entry['file'])
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _load_index(self):
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_index(self):
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._index, f)
+        os.replace(path + '.tmp', path)
+
+
+def _entry_extension():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return '.pkl'
+    return '.arrow'
+
+
+def _write_entry(df, path, arrow=True):
+    if not arrow:
+        pd.to_pickle(df, path)
+        return
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    table = pa.Table.from_pandas(df)
+    with pa.OSFile(path, 'wb') as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_entry(path):
+    if not path.endswith('.arrow'):
+        return pd.read_pickle(path)
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    with pa.memory_map(path, 'r') as source:
+        return pyarrow.ipc.open_file(source).read_all().to_pandas()
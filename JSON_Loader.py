@@ -0,0 +1,154 @@
+"""
+JSON Loader
+Streaming, column-projecting reader for the users master data.
+
+Accepts either a JSON array of objects (users.json) or JSON Lines (one
+object per line, .jsonl / .ndjson). The file is decoded one buffer (about
+1 MB) at a time and each batch of records is projected onto the requested
+columns immediately, so the whole file is never materialized as a list of
+dicts. JSON Lines files are read with pyarrow's multithreaded reader when it
+is installed.
+"""
+
+import json
+import os
+import re
+
+import pandas as pd
+
+# Records decoded into a DataFrame block at a time
+DEFAULT_BLOCK_ROWS = 200_000
+
+# Characters read from the file per buffer refill
+READ_SIZE = 1 << 20
+
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def is_json_lines(path):
+    """JSON Lines by extension, otherwise by the first non-blank character"""
+    if os.path.splitext(path)[1].lower() in JSON_LINES_EXTENSIONS:
+        return True
+    with open(path, 'r') as f:
+        while True:
+            char = f.read(1)
+            if not char or not char.isspace():
+                return char == '{'
+
+
+def load_json_records(path, columns, block_rows=DEFAULT_BLOCK_ROWS):
+    """Read `columns` of every record in a JSON array or JSON Lines file"""
+    if is_json_lines(path):
+        try:
+            return _read_json_lines_arrow(path, columns)
+        except ImportError:
+            pass
+
+    frames = list(iter_json_records(path, columns, block_rows))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def iter_json_records(path, columns, block_rows=DEFAULT_BLOCK_ROWS):
+    """Yield `columns` of the records of a JSON array or JSON Lines file, one block at a time"""
+    if is_json_lines(path):
+        batches = _batched(_iter_json_lines(path), block_rows)
+    else:
+        batches = _iter_json_array_batches(path)
+
+    # Each decoded batch is projected straight away; only the requested
+    # columns outlive it
+    for batch in batches:
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+
+
+def _read_json_lines_arrow(path, columns):
+    import pyarrow.json
+
+    table = pyarrow.json.read_json(path)
+    missing = [column for column in columns if column not in table.column_names]
+    table = table.select([column for column in columns if column in table.column_names])
+    df = table.to_pandas()
+    for column in missing:
+        df[column] = None
+    return df[columns]
+
+
+def _batched(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    yield batch
+
+
+def _iter_json_lines(path):
+    loads = json.loads
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def _iter_json_array_batches(path):
+    """Decode the elements of a top-level JSON array one buffer at a time
+
+    Each buffer is cut after its last '}' and decoded in one json.loads
+    call. A cut that lands inside a string or a nested object cannot form
+    valid JSON, so it is detected by the decode error and that buffer is
+    decoded element by element with raw_decode instead.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r') as f:
+        buffer = f.read(READ_SIZE).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} is not a JSON array of records")
+        buffer = buffer[1:]
+        eof = False
+
+        while True:
+            chunk = '' if eof else f.read(READ_SIZE)
+            eof = eof or not chunk
+            buffer += chunk
+
+            if eof:
+                body = buffer[SEPARATORS.match(buffer).end():].rstrip()
+                if not body.endswith(']'):
+                    raise ValueError(f"{path}: JSON array is not terminated")
+                yield json.loads('[' + body)
+                return
+
+            cut = buffer.rfind('}') + 1
+            if cut == 0:
+                continue
+            candidate = buffer[:cut].strip().lstrip(',')
+            try:
+                batch = json.loads('[' + candidate + ']')
+            except json.JSONDecodeError:
+                batch, consumed = _raw_decode_elements(decoder, buffer)
+                buffer = buffer[consumed:]
+            else:
+                buffer = buffer[cut:]
+            yield batch
+
+
+def _raw_decode_elements(decoder, buffer):
+    """Decode complete elements from the start of `buffer`; return them and
+    the number of characters consumed"""
+    batch = []
+    position = 0
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            return batch, position
+        batch.append(record)
+        position = end
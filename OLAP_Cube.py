@@ -0,0 +1,334 @@
+"""
+OLAP Cube
+Materialized rollups of the final dataset behind the report and the charts.
+
+Every report section and chart is a rollup of order count and revenue over
+some mix of date, city, cuisine, membership and restaurant. The cube scans
+the order-level dataset once and keeps a small lattice of cuboids, each a
+table of additive measures (orders, revenue, rated_orders, rating_sum) per
+combination of its dimensions:
+
+- calendar: year, month, quarter, weekday x city, membership, cuisine
+- restaurants: restaurant_id with its name, cuisine and rating
+- users: user_id with its city and membership (a user has one of each, so
+  unique users per city or membership are exact row counts here)
+- amounts: distinct total_amount values (exact median, std and histogram)
+
+Their sizes are bounded by the dimension cardinalities, not by the number of
+orders. `rollup` answers from the first cuboid holding every requested
+dimension and `slice` restricts the cuboids to given dimension values.
+Cubes of disjoint blocks of orders `merge` into the cube of their union, so
+`build_batches` aggregates a dataset one block at a time.
+Orders with missing user or restaurant attributes keep their own rows, so
+totals are complete.
+
+In approximate mode the two cuboids that grow with the data (users and
+amounts) are replaced by sketches per year, month, city and membership: a
+HyperLogLog of user_id and a KLL sketch of total_amount. Their size is fixed
+by the error bounds, and they merge across any rollup or slice of those
+dimensions (e.g. unique users of one city over a quarter).
+"""
+
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+
+from Aggregation_Engine import AggregationEngine
+from Sketches import HyperLogLog, KLLSketch, hash64
+
+CUBE_VERSION = 1
+
+# Cuboids and their dimensions (whichever of these the dataset has), in the
+# order rollups look for them
+CUBOIDS = {
+    'calendar': ['year', 'month', 'month_name', 'quarter', 'day_of_week', 'city', 'membership', 'cuisine'],
+    'restaurants': ['restaurant_id', 'restaurant_name', 'cuisine', 'rating'],
+    'users': ['user_id', 'city', 'membership'],
+    'amounts': ['total_amount'],
+}
+
+# Cuboids replaced by the sketches in approximate mode, and the sketch grain
+EXACT_ONLY_CUBOIDS = ['users', 'amounts']
+SKETCH_DIMENSIONS = ['year', 'month', 'city', 'membership']
+
+# Amount percentiles reported in approximate mode
+REPORTED_PERCENTILES = [0.25, 0.75, 0.9, 0.99]
+
+# Additive measures of every cuboid row; counts stay integers in rollups
+MEASURES = ['orders', 'revenue', 'rated_orders', 'rating_sum']
+COUNT_MEASURES = ['orders', 'rated_orders']
+
+
+class OLAPCube:
+    def __init__(self, cuboids, sketches=None):
+        """Cube from a dict of cuboid name -> DataFrame (see `build`)
+
+        `sketches` (approximate mode) has one row per SKETCH_DIMENSIONS
+        combination with a 'users' HyperLogLog and an 'amounts' KLLSketch.
+        """
+        self.cuboids = cuboids
+        self.sketches = sketches
+        self._engines = {}
+
+    @classmethod
+    def build(cls, df, approximate=False, precision=14, quantile_error=0.01):
+        """Aggregate an order-level dataset into every cuboid its columns allow
+
+        With approximate=True, unique users and the amount distribution are
+        sketched (HyperLogLog `precision`, KLL rank error `quantile_error`).
+        """
+        engine = AggregationEngine(df)
+        has_rating = 'rating' in df.columns
+        cuboids = {}
+        covered = set()
+        for name, dimensions in CUBOIDS.items():
+            if approximate and name in EXACT_ONLY_CUBOIDS:
+                continue
+            dimensions = [column for column in dimensions if column in df.columns]
+            if set(dimensions) <= covered:
+                # e.g. users without user_id: nothing an earlier cuboid lacks
+                continue
+            covered.update(dimensions)
+            cuboid = engine.aggregate(
+                dimensions, sums=['total_amount', 'rating'] if has_rating else ['total_amount'],
+                counts=['rating'] if has_rating else [], dropna=False
+            ).reset_index()
+            cuboid = cuboid.rename(columns={
+                'count': 'orders', 'total_amount_sum': 'revenue', 'rating_count': 'rated_orders'
+            })
+            if not has_rating:
+                cuboid['rated_orders'] = 0
+                cuboid['rating_sum'] = 0.0
+            cuboids[name] = cuboid
+
+        sketches = build_sketches(df, engine, precision, quantile_error) if approximate else None
+        return cls(cuboids, sketches)
+
+    @classmethod
+    def build_batches(cls, batches, approximate=False, precision=14, quantile_error=0.01):
+        """Cube of a dataset read block by block (e.g. with iter_dataset)
+
+        Each block is aggregated and merged into the running cube, so only
+        one block of orders is in memory at a time.
+        """
+        cube = None
+        for batch in batches:
+            partial = cls.build(batch, approximate, precision, quantile_error)
+            cube = partial if cube is None else cube.merge(partial)
+        if cube is None:
+            raise ValueError("No batches to build the cube from")
+        return cube
+
+    def merge(self, *others):
+        """Cube of the orders of all the cubes: cuboid rows re-aggregated, sketches merged per cell
+
+        Several cubes are combined in one aggregation per cuboid, not pairwise.
+        """
+        cubes = [self, *others]
+        cuboids = {}
+        for name in self.cuboids:
+            combined = pd.concat([cube.cuboids[name] for cube in cubes], ignore_index=True)
+            dimensions = [column for column in combined.columns if column not in MEASURES]
+            merged = AggregationEngine(combined).aggregate(dimensions, sums=MEASURES, dropna=False)
+            merged = merged.drop(columns='count').rename(columns=lambda column: column[:-len('_sum')])
+            cuboids[name] = merged.astype({measure: np.int64 for measure in COUNT_MEASURES}).reset_index()
+
+        sketches = None
+        if all(cube.sketches is not None for cube in cubes):
+            combined = pd.concat([cube.sketches for cube in cubes], ignore_index=True)
+            dimensions = [column for column in combined.columns if column not in ('users', 'amounts')]
+            sketches = combined.groupby(dimensions, dropna=False, observed=True, sort=False)[
+                ['users', 'amounts']].agg(_merged).reset_index()
+        return OLAPCube(cuboids, sketches)
+
+    def rollup(self, keys):
+        """Measures summed per group of `keys` (rows with a missing key are left out)"""
+        name = self.cuboid_for(keys)
+        if name not in self._engines:
+            self._engines[name] = AggregationEngine(self.cuboids[name])
+        result = self._engines[name].aggregate(keys, sums=MEASURES)
+        result = result.drop(columns='count').rename(columns=lambda column: column[:-len('_sum')])
+        return result.astype({measure: np.int64 for measure in COUNT_MEASURES})
+
+    def cuboid_for(self, keys):
+        """Name of the first cuboid that has every column in `keys`"""
+        keys = {keys} if isinstance(keys, str) else set(keys)
+        for name, cuboid in self.cuboids.items():
+            if keys <= set(cuboid.columns) - set(MEASURES):
+                return name
+        raise ValueError(f"No cuboid has all of {sorted(keys)}")
+
+    def slice(self, **filters):
+        """Cube restricted to the given value(s) of some dimensions
+
+        Cuboids lacking one of the filtered dimensions cannot be restricted
+        and are left out of the slice.
+        """
+        cuboids = {}
+        for name, cuboid in self.cuboids.items():
+            if not set(filters) <= set(cuboid.columns):
+                continue
+            mask = np.ones(len(cuboid), dtype=bool)
+            for column, value in filters.items():
+                values = value if isinstance(value, (list, tuple, set)) else [value]
+                mask &= cuboid[column].isin(values).to_numpy()
+            cuboids[name] = cuboid[mask].reset_index(drop=True)
+
+        sketches = None
+        if self.sketches is not None and set(filters) <= set(self.sketches.columns):
+            mask = np.ones(len(self.sketches), dtype=bool)
+            for column, value in filters.items():
+                values = value if isinstance(value, (list, tuple, set)) else [value]
+                mask &= self.sketches[column].isin(values).to_numpy()
+            sketches = self.sketches[mask].reset_index(drop=True)
+        return OLAPCube(cuboids, sketches)
+
+    @property
+    def approximate(self):
+        return 'amounts' not in self.cuboids and self.sketches is not None
+
+    def unique_users(self, key):
+        """Users with at least one order per value of a user attribute
+
+        Exact from the users cuboid, or merged HyperLogLog estimates.
+        """
+        if 'users' in self.cuboids:
+            return self.rollup([key, 'user_id']).groupby(level=key, observed=True).size()
+        if self.sketches is None:
+            raise ValueError("This cube has no users cuboid or sketches")
+        return self.sketches.groupby(key, observed=True)['users'].agg(lambda sketches: len(_merged(sketches)))
+
+    def amount_distribution(self):
+        """Orders per total_amount value (exact), or the KLL sketch's weighted items"""
+        if 'amounts' in self.cuboids:
+            return self.rollup('total_amount')['orders']
+        items, weights = self.amount_sketch().weighted_items()
+        return pd.Series(weights, index=pd.Index(items, name='total_amount'), name='orders')
+
+    def amount_sketch(self):
+        """All KLL amount sketches of the cube merged into one"""
+        if self.sketches is None:
+            raise ValueError("This cube has no sketches (built without approximate=True)")
+        if self.sketches.empty:
+            return KLLSketch()
+        return _merged(self.sketches['amounts'])
+
+    def amount_summary(self):
+        """sum, mean, median, std, min and max of total_amount over all orders
+
+        In approximate mode the median and std are estimated from the KLL
+        sketch (sum, mean, min and max stay exact) and the REPORTED_PERCENTILES
+        are added as 'p25', 'p75', ... Without orders the sum is 0 and the
+        other statistics are NaN, as with pandas.
+        """
+        if not self.approximate:
+            amounts = self.rollup('total_amount')['orders']
+            values = amounts.index.to_numpy(dtype=np.float64)
+            counts = amounts.to_numpy()
+            orders = counts.sum()
+            if not orders:
+                return _empty_amount_summary()
+            total = (values * counts).sum()
+            mean = total / orders
+            return {
+                'sum': total,
+                'mean': mean,
+                'median': weighted_median(values, counts),
+                'std': np.sqrt((counts * (values - mean) ** 2).sum() / (orders - 1)),
+                'min': values.min(),
+                'max': values.max(),
+            }
+
+        return approximate_amount_summary(self.amount_sketch(), self.cuboids['calendar']['revenue'].sum())
+
+    @property
+    def size(self):
+        """Rows over all cuboids"""
+        return sum(len(cuboid) for cuboid in self.cuboids.values())
+
+    def save(self, path):
+        """Persist the cube atomically (write to a temp file, then rename)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        saved = {'version': CUBE_VERSION, 'cuboids': self.cuboids, 'sketches': self.sketches}
+        pd.to_pickle(saved, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        saved = pd.read_pickle(path)
+        if saved.get('version') != CUBE_VERSION:
+            raise ValueError(f"{path} was written by an incompatible version; rebuild the cube")
+        return cls(saved['cuboids'], saved.get('sketches'))
+
+
+def approximate_amount_summary(sketch, total):
+    """amount_summary() from a KLL sketch of total_amount and the exact revenue `total`"""
+    if not sketch.n:
+        return _empty_amount_summary(REPORTED_PERCENTILES)
+    values, weights = sketch.weighted_items()
+    mean = total / sketch.n
+    summary = {
+        'sum': total,
+        'mean': mean,
+        'median': sketch.quantile(0.5),
+        'std': np.sqrt((weights * (values - mean) ** 2).sum() / (sketch.n - 1)),
+        'min': sketch.min,
+        'max': sketch.max,
+    }
+    for fraction, value in zip(REPORTED_PERCENTILES, sketch.quantiles(REPORTED_PERCENTILES)):
+        summary[f"p{round(fraction * 100)}"] = value
+    return summary
+
+
+def _empty_amount_summary(percentiles=()):
+    """amount_summary() of no orders"""
+    summary = {'sum': 0.0, 'mean': np.nan, 'median': np.nan, 'std': np.nan, 'min': np.nan, 'max': np.nan}
+    for fraction in percentiles:
+        summary[f"p{round(fraction * 100)}"] = np.nan
+    return summary
+
+
+def build_sketches(df, engine, precision=14, quantile_error=0.01):
+    """One HyperLogLog of user_id and one KLL of total_amount per SKETCH_DIMENSIONS cell"""
+    dimensions = [column for column in SKETCH_DIMENSIONS if column in df.columns]
+    codes, index = engine.group_codes(dimensions, dropna=False)
+
+    # Rows grouped by cell with one stable sort; each cell is then a slice
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(index) + 1))
+    hashes = hash64(df['user_id'].to_numpy()[order]) if 'user_id' in df.columns else None
+    amounts = df['total_amount'].to_numpy(dtype=np.float64)[order]
+
+    users, amount_sketches = [], []
+    for cell in range(len(index)):
+        rows = slice(bounds[cell], bounds[cell + 1])
+        sketch = HyperLogLog(precision)
+        if hashes is not None:
+            sketch.add_hashes(hashes[rows])
+        users.append(sketch)
+        amount_sketches.append(KLLSketch(quantile_error, seed=cell).add(amounts[rows]))
+
+    sketches = index.to_frame(index=False)
+    sketches['users'] = users
+    sketches['amounts'] = amount_sketches
+    return sketches
+
+
+def _merged(sketches):
+    """Copy of the first sketch with all the others merged into it"""
+    sketches = list(sketches)
+    return functools.reduce(lambda total, sketch: total.merge(sketch), sketches[1:], sketches[0].copy())
+
+
+def weighted_median(values, counts):
+    """Median of sorted `values` repeated `counts` times, like np.median (NaN when empty)"""
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1] if len(cumulative) else 0
+    if not total:
+        return np.nan
+    # Values at the two middle positions (the same one for an odd count)
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cumulative, total // 2, side='right')]
+    return (lower + upper) / 2
@@ -0,0 +1,140 @@
+"""
+Partition Manifest
+Layout and statistics of a final dataset stored as year/month partitions.
+
+A partitioned dataset is a directory of part files in Hive-style month
+directories, in any of the dataset formats:
+
+    final_food_delivery_dataset.parquet/
+        _manifest.json
+        year=2023/month=01/part-00000.parquet
+        year=2023/month=02/part-00001.parquet
+        ...
+
+Every part holds orders of one month sorted by order_date. The manifest
+records each part's row count and the min/max of order_date, order_id and
+total_amount, so a date-range read opens only the parts that overlap the
+range and cuts partly covered parts with a binary search on the sorted
+dates. Later blocks (streamed chunks, incremental deltas) add parts, so a
+month can have several.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = '_manifest.json'
+
+# Bump when the layout or the statistics change
+MANIFEST_VERSION = 1
+
+# Columns with min/max statistics per part (whichever the dataset has)
+STATS_COLUMNS = ['order_date', 'order_id', 'total_amount']
+
+
+class PartitionManifest:
+    def __init__(self, root, parts=None):
+        """Manifest of the partitioned dataset in directory `root`"""
+        self.root = root
+        self.parts = parts or []
+
+    @classmethod
+    def load(cls, root):
+        """The saved manifest of `root` (an empty one if there is none)"""
+        path = os.path.join(root, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return cls(root)
+        with open(path) as f:
+            saved = json.load(f)
+        if saved.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"{root} was written by an incompatible version; rewrite the dataset")
+        return cls(root, saved['parts'])
+
+    def save(self):
+        """Persist the manifest atomically (write to a temp file, then rename)"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'parts': self.parts}, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def new_part_path(self, year, month, extension):
+        """Path (relative to the root) for the next part file of a month"""
+        return os.path.join(f"year={year}", f"month={month:02d}", f"part-{len(self.parts):05d}{extension}")
+
+    def add(self, path, df):
+        """Record a written part: its relative path, rows and column statistics"""
+        part = {'path': path, 'rows': len(df)}
+        for column in STATS_COLUMNS:
+            if column in df.columns and len(df):
+                low, high = df[column].min(), df[column].max()
+                if column == 'order_date':
+                    part[column] = [low.strftime('%Y-%m-%d'), high.strftime('%Y-%m-%d')]
+                else:
+                    part[column] = [low.item(), high.item()]
+        self.parts.append(part)
+
+    def select(self, start=None, end=None):
+        """Parts whose order_date range overlaps [start, end] (inclusive dates)"""
+        start, end = date_bounds(start, end)
+        selected = []
+        for part in self.parts:
+            low, high = (pd.Timestamp(value) for value in part['order_date'])
+            if (start is None or high >= start) and (end is None or low <= end):
+                selected.append(part)
+        return selected
+
+    @property
+    def rows(self):
+        return sum(part['rows'] for part in self.parts)
+
+
+def is_partitioned(path):
+    """Whether `path` is a partitioned dataset directory"""
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def date_bounds(start=None, end=None):
+    """'YYYY-MM-DD' (or date-like) bounds as Timestamps, None for open ends"""
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"Start date {start.date()} is after end date {end.date()}")
+    return start, end
+
+
+def month_groups(df):
+    """(year, month, rows sorted by order_date) for every month in `df`"""
+    df = df.sort_values('order_date', kind='stable')
+    days = df['order_date'].to_numpy().astype('datetime64[M]')
+    months, starts = np.unique(days, return_index=True)
+    bounds = np.append(starts, len(df))
+    for i, month in enumerate(months):
+        year, month_number = divmod(int(month.astype(np.int64)), 12)
+        yield 1970 + year, month_number + 1, df.iloc[bounds[i]:bounds[i + 1]]
+
+
+def filter_date_range(df, start=None, end=None):
+    """Rows of `df` with order_date in [start, end] (inclusive dates)
+
+    Rows sorted by order_date (as in every part) are cut with a binary
+    search instead of a full comparison.
+    """
+    start, end = date_bounds(start, end)
+    if start is None and end is None:
+        return df
+    dates = df['order_date']
+    if dates.is_monotonic_increasing:
+        values = dates.to_numpy()
+        first = np.searchsorted(values, start.to_datetime64(), 'left') if start is not None else 0
+        last = (np.searchsorted(values, (end + pd.Timedelta(days=1)).to_datetime64(), 'left')
+                if end is not None else len(df))
+        return df.iloc[first:last]
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (dates >= start).to_numpy()
+    if end is not None:
+        mask &= (dates < end + pd.Timedelta(days=1)).to_numpy()
+    return df[mask]
@@ -0,0 +1,185 @@
+"""
+Partitioned Execution
+Multi-process stages of the integration pipeline.
+
+The final dataset is split into partitions (by order month or by a hash of
+user_id) and every worker process aggregates its share into a partial OLAP
+cube; the parent merges the partial cubes into the cube behind the report.
+A CSV output is formatted by the workers as well, each writing one
+contiguous block of rows to a part file, and the parts are concatenated in
+order, so the file is byte-identical to a single-process write. In
+streaming mode each chunk of orders is enriched in a worker.
+
+The integration object (tables, lookup indexes and the final dataset) is
+handed to each worker once, when it starts (inherited without pickling
+where processes are forked), so a task only carries row positions or a
+block range - or, in streaming mode, one chunk of orders - and returns a
+small partial cube or a file path rather than rows.
+"""
+
+import multiprocessing
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from OLAP_Cube import OLAPCube
+from Sketches import hash64
+
+PARTITION_KEYS = ('month', 'user')
+
+# Integration object shared with the worker processes (set by _init_worker)
+_integration = None
+
+
+def default_workers():
+    """All available cores"""
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+
+def partition_orders(orders_df, partition_by='month', partitions=None):
+    """Row positions of each partition of `orders_df`
+
+    partition_by='month' gives one partition per order month;
+    partition_by='user' spreads user_id hashes over `partitions` buckets, so
+    every order of a user lands in the same partition.
+    """
+    if partition_by == 'month' and 'order_date' in orders_df.columns:
+        dates = orders_df['order_date'].dt
+        codes, _ = pd.factorize(dates.year.to_numpy() * 12 + dates.month.to_numpy(), sort=True)
+    elif partition_by == 'month':
+        # A saved final dataset projected for the report has no order_date
+        codes = orders_df.groupby(['year', 'month_name'], observed=True, dropna=False).ngroup().to_numpy()
+    elif partition_by == 'user':
+        codes = (hash64(orders_df['user_id'].fillna(-1)) % np.uint64(partitions or 1)).astype(np.int64)
+    else:
+        raise ValueError(f"partition_by must be one of {PARTITION_KEYS}")
+
+    order = np.argsort(codes, kind='stable')
+    boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+    return [positions for positions in np.split(order, boundaries) if len(positions)]
+
+
+def balanced_groups(partitions, groups):
+    """Partitions combined into at most `groups` sets of positions of similar size
+
+    The largest partitions are placed first, each into the smallest group so
+    far; a group keeps whole partitions (e.g. whole months).
+    """
+    sizes = np.zeros(min(groups, len(partitions)), dtype=np.int64)
+    members = [[] for _ in sizes]
+    for positions in sorted(partitions, key=len, reverse=True):
+        group = int(np.argmin(sizes))
+        members[group].append(positions)
+        sizes[group] += len(positions)
+    return [np.sort(np.concatenate(group)) for group in members]
+
+
+class PartitionedExecutor:
+    """Pool of worker processes over the tables of an integration
+
+    Use as a context manager; the pool forks when it is entered, so the
+    tables a stage reads (the final dataset for `build_cube` and
+    `write_csv`, users and restaurants for `enrich_chunks`) must be loaded
+    first.
+    """
+
+    def __init__(self, integration, workers=None, start_method=None):
+        """Pool of `workers` processes (all cores by default)
+
+        `start_method` is a multiprocessing start method; by default 'fork'
+        where available, so the tables are inherited rather than pickled.
+        """
+        self.integration = integration
+        self.workers = workers or default_workers()
+        self.start_method = start_method
+        self.pool = None
+
+    def __enter__(self):
+        # Build the lookup indexes first so the workers inherit them
+        if self.integration.users_df is not None and self.integration.restaurants_df is not None:
+            self.integration._dimension_index('users', self.integration.users_df, 'user_id')
+            self.integration._dimension_index('restaurants', self.integration.restaurants_df, 'restaurant_id')
+
+        start_method = self.start_method
+        if start_method is None and 'fork' in multiprocessing.get_all_start_methods():
+            start_method = 'fork'
+        context = multiprocessing.get_context(start_method)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=context,
+            initializer=_init_worker, initargs=(self.integration,)
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.shutdown()
+        self.pool = None
+
+    def build_cube(self, partitions, approximate=False, precision=14, quantile_error=0.01):
+        """OLAP cube of the final dataset: one partial cube per group of partitions, merged here"""
+        groups = balanced_groups(partitions, self.workers)
+        futures = [self.pool.submit(_build_cube, positions, approximate, precision, quantile_error)
+                   for positions in groups]
+        cubes = [future.result() for future in futures]
+        if not cubes:
+            return OLAPCube.build(self.integration.final_df, approximate, precision, quantile_error)
+        return cubes[0].merge(*cubes[1:])
+
+    def write_csv(self, path):
+        """Write the final dataset to `path` as CSV, one block of rows per worker
+
+        Each worker writes its block to a part file next to `path`; the parts
+        are concatenated in order into a temporary file that replaces `path`.
+        """
+        rows = len(self.integration.final_df)
+        bounds = np.linspace(0, rows, min(self.workers, max(rows, 1)) + 1).astype(np.int64)
+        parts = [f"{path}.part{block}" for block in range(len(bounds) - 1)]
+        try:
+            futures = [self.pool.submit(_write_csv_block, int(start), int(stop), part)
+                       for start, stop, part in zip(bounds[:-1], bounds[1:], parts)]
+            for future in futures:
+                future.result()
+            with open(path + '.tmp', 'wb') as output:
+                for part in parts:
+                    with open(part, 'rb') as f:
+                        shutil.copyfileobj(f, output, 16 * 1024 ** 2)
+            os.replace(path + '.tmp', path)
+        finally:
+            for part in parts:
+                if os.path.exists(part):
+                    os.remove(part)
+
+    def enrich_chunks(self, chunks):
+        """Enrich a stream of raw order chunks, yielding results in input order
+
+        At most two chunks per worker are in flight, so memory stays bounded
+        by the chunk size as in serial streaming.
+        """
+        pending = deque()
+        for chunk in chunks:
+            pending.append(self.pool.submit(_enrich_chunk, chunk))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _init_worker(integration):
+    global _integration
+    _integration = integration
+
+
+def _build_cube(positions, approximate, precision, quantile_error):
+    return OLAPCube.build(_integration.final_df.take(positions), approximate, precision, quantile_error)
+
+
+def _write_csv_block(start, stop, path):
+    # Only the first block carries the header, as in a single to_csv call
+    _integration.final_df.iloc[start:stop].to_csv(path, header=start == 0, index=False)
+
+
+def _enrich_chunk(orders_chunk):
+    return _integration._enrich_orders(orders_chunk)
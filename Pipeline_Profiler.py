@@ -0,0 +1,259 @@
+"""
+Pipeline Profiler
+Stage-level instrumentation for the integration pipeline and the charts.
+
+Each stage records wall time, CPU time (including finished worker
+processes), rows in and out, its peak RSS and the bytes read and written by
+the process. On Linux the peak is the stage's own: the kernel's high-water
+mark (VmHWM) is reset through /proc/self/clear_refs when a stage starts and
+read when it ends. Elsewhere only the process-lifetime peak is available,
+so later stages repeat the peak of the largest earlier one. Results can be printed as a summary table or exported as JSON/CSV.
+Optionally every stage also runs under cProfile and its stats are dumped to
+`<cprofile_dir>/<stage>.prof` (inspect with `python -m pstats` or snakeviz).
+
+Stages may nest (e.g. build_cube inside analysis_report). A nested stage
+records its enclosing stage as `parent`, and its time is part of the parent's.
+Only the outermost stage runs under cProfile, since one profiler hook can be
+active at a time, so its .prof file covers the nested stages too.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SUMMARY_COLUMNS = [
+    'stage', 'parent', 'wall_s', 'cpu_s', 'rows_in', 'rows_out', 'rows_per_s',
+    'peak_rss_mb', 'bytes_read', 'bytes_written',
+]
+COUNT_COLUMNS = ['rows_in', 'rows_out', 'rows_per_s', 'bytes_read', 'bytes_written']
+
+
+class StageProfiler:
+    def __init__(self, enabled=True, cprofile_dir=None):
+        """Collect one record per stage; a disabled profiler only runs the stages"""
+        self.enabled = enabled
+        self.cprofile_dir = cprofile_dir
+        self.records = []
+        # Stages running now, outermost first (shared by the pipeline's threads)
+        self._active = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # A pickled copy (e.g. in a spawned worker) starts with no running stage
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_active'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Measure the enclosed block; set `record['rows_out']` inside it"""
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        if not self.enabled:
+            yield record
+            return
+
+        with self._lock:
+            record['parent'] = self._active[-1]['stage'] if self._active else None
+            # The enclosing stages keep the peak so far; the mark restarts here
+            reset = reset_peak_rss(self._active)
+            record['_peak_kb'] = current_rss_kb() if reset else 0
+            self._active.append(record)
+        children_peak = children_peak_kb()
+        profile = cProfile.Profile() if self.cprofile_dir and record['parent'] is None else None
+        io_before = io_counters()
+        cpu_before = cpu_seconds()
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile:
+                profile.disable()
+            with self._lock:
+                peak_kb = max(record.pop('_peak_kb'), high_water_mark_kb() or 0)
+                self._active.remove(record)
+                if self._active:
+                    self._active[-1]['_peak_kb'] = max(self._active[-1]['_peak_kb'], peak_kb)
+            if peak_kb and children_peak_kb() > children_peak:
+                # Worker processes that finished in this stage
+                peak_kb = max(peak_kb, children_peak_kb())
+            wall = time.perf_counter() - start
+            io_after = io_counters()
+            record.update(
+                wall_s=round(wall, 4),
+                cpu_s=round(cpu_seconds() - cpu_before, 4),
+                peak_rss_mb=round(peak_kb / 1024, 1) if peak_kb else peak_rss_mb(),
+                bytes_read=_delta(io_before, io_after, 'read_bytes'),
+                bytes_written=_delta(io_before, io_after, 'write_bytes'),
+            )
+            rows = record['rows_out'] if record['rows_out'] is not None else record['rows_in']
+            record['rows_per_s'] = round(rows / wall) if rows is not None and wall > 0 else None
+            if profile:
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{_file_name(name)}.prof"))
+            self.records.append(record)
+
+    def add(self, record):
+        """Append a record measured elsewhere (e.g. in a worker process)"""
+        if self.enabled:
+            self.records.append(record)
+
+    @property
+    def total_wall_s(self):
+        """Wall time of the outermost stages (nested stages are part of their parent's)"""
+        return sum(record['wall_s'] for record in self.records if not record.get('parent'))
+
+    def summary(self):
+        """All records as a DataFrame, one row per stage"""
+        summary = pd.DataFrame(self.records, columns=SUMMARY_COLUMNS)
+        return summary.astype({column: 'Int64' for column in COUNT_COLUMNS})
+
+    def print_summary(self):
+        print("=" * 70)
+        print("STAGE PROFILE")
+        print("=" * 70)
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(self.summary().astype(object).fillna('-').to_string(index=False))
+        if any(record.get('parent') for record in self.records):
+            print("(Nested stages are included in the time of their parent stage)")
+        print()
+
+    def save(self, path):
+        """Write the records as JSON, or as CSV for a .csv path"""
+        if os.path.splitext(path)[1].lower() == '.csv':
+            self.summary().to_csv(path, index=False)
+        else:
+            with open(path, 'w') as f:
+                json.dump(self.records, f, indent=2, default=_json_default)
+
+
+def profiled(stage, rows_in=None):
+    """Method decorator timing a pipeline step with `self.profiler`
+
+    `rows_in` is an optional function of the instance; rows out are taken
+    from the length of the returned frame (or the returned row count).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = getattr(self, 'profiler', None)
+            if profiler is None or not profiler.enabled:
+                return method(self, *args, **kwargs)
+            with profiler.stage(stage, rows_in(self) if rows_in else None) as record:
+                result = method(self, *args, **kwargs)
+                record['rows_out'] = row_count(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def row_count(result):
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    return None
+
+
+def cpu_seconds():
+    """User + system CPU time of this process and its reaped children"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def reset_peak_rss(active=()):
+    """Restart the kernel's RSS high-water mark (Linux); False where unsupported
+
+    The mark so far is first folded into the `_peak_kb` of the `active`
+    stage records, which still need it.
+    """
+    peak = high_water_mark_kb()
+    if peak is None:
+        return False
+    for record in active:
+        record['_peak_kb'] = max(record['_peak_kb'], peak)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def high_water_mark_kb():
+    """Peak RSS since the last reset (VmHWM), None where unavailable"""
+    return _proc_status_kb('VmHWM')
+
+
+def current_rss_kb():
+    return _proc_status_kb('VmRSS') or 0
+
+
+def _proc_status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def children_peak_kb():
+    """Largest peak RSS of the reaped worker processes (0 where unavailable)"""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def peak_rss_mb():
+    """Peak resident set size so far (this process and its reaped children)"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return round(peak / (1024 ** 2 if os.uname().sysname == 'Darwin' else 1024), 1)
+
+
+def io_counters():
+    """Bytes read/written by this process so far, from /proc/self/io (Linux)"""
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(':') for line in f)
+    except OSError:
+        return None
+    # rchar/wchar count every read()/write() call, page cache hits included
+    return {'read_bytes': int(counters['rchar']), 'write_bytes': int(counters['wchar'])}
+
+
+def _delta(before, after, key):
+    return after[key] - before[key] if before and after else None
+
+
+def _file_name(stage):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', stage)
+
+
+def _json_default(value):
+    # numpy scalars from row counts
+    return value.item() if hasattr(value, 'item') else str(value)
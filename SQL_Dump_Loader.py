@@ -0,0 +1,239 @@
+"""
+SQL Dump Loader
+Streaming reader for table dumps made of CREATE TABLE + INSERT statements
+(such as restaurants.sql) that builds the DataFrame without SQLite.
+
+The file is read line by line. The common one-row-per-line
+`INSERT INTO t VALUES (...);` statements are reduced to their value tuple
+and handed to pandas' C CSV parser in blocks (single quotes as the quote
+character, '' as the escaped quote). Only the bare NULL keyword is
+missing: it is rewritten to a NULL_FIELD marker outside quoted strings, so a
+quoted 'NULL' stays the text 'NULL' as in SQLite. Multi-row and multi-line
+INSERTs go through a small tokenizer. Anything that would need a
+real SQL engine (UPDATE, DELETE, ALTER, ...) raises UnsupportedSQLError so
+the caller can fall back to SQLite.
+"""
+
+import csv
+import io
+import re
+
+import pandas as pd
+
+# Value tuples handed to read_csv per block
+DEFAULT_BLOCK_ROWS = 200_000
+
+# Statements that carry no data for the target table and can be skipped
+IGNORED_STATEMENTS = (
+    'BEGIN', 'COMMIT', 'END', 'START TRANSACTION', 'PRAGMA', 'SET', 'USE',
+    'DROP TABLE', 'CREATE INDEX', 'CREATE UNIQUE INDEX', 'LOCK TABLES', 'UNLOCK TABLES',
+)
+
+TEXT_TYPES = ('CHAR', 'VARCHAR', 'TEXT', 'CLOB', 'STRING', 'DATE', 'TIME')
+
+VALUE_TOKEN = re.compile(
+    r"\s*(?:'((?:[^']|'')*)'|(NULL)\b|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|(\()|(\))|(,))",
+    re.IGNORECASE
+)
+MULTI_ROW = re.compile(r"\)\s*,\s*\(")
+
+# Field read as missing; a dump containing this control character goes to SQLite
+NULL_FIELD = '\x1f'
+HAS_NULL = re.compile(r"NULL", re.IGNORECASE)
+BARE_NULL = re.compile(r"('(?:[^']|'')*')|\bNULL\b", re.IGNORECASE)
+
+
+class UnsupportedSQLError(ValueError):
+    """The dump contains statements the streaming loader cannot apply"""
+
+
+def load_sql_dump(path, table, block_rows=DEFAULT_BLOCK_ROWS):
+    """Read `table` from a SQL dump file into a DataFrame in one streaming pass"""
+    plain_prefix = f"INSERT INTO {table} VALUES ("
+    fast_insert = re.compile(
+        r"INSERT\s+INTO\s+[`\"\[]?%s[`\"\]]?\s+VALUES\s*\((.*)\)\s*;$" % re.escape(table),
+        re.IGNORECASE
+    )
+
+    columns = None
+    text_columns = []
+    frames = []
+    block = io.StringIO()
+    block_writer = csv.writer(block, quotechar="'", quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+    rows_in_block = 0
+    pending = []
+
+    def flush():
+        nonlocal block, block_writer, rows_in_block
+        if rows_in_block:
+            block.seek(0)
+            frames.append(pd.read_csv(
+                block, header=None, names=columns, quotechar="'", doublequote=True,
+                skipinitialspace=True, na_values=[NULL_FIELD], keep_default_na=False,
+                dtype={column: str for column in text_columns}
+            ))
+        block = io.StringIO()
+        block_writer = csv.writer(block, quotechar="'", quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+        rows_in_block = 0
+
+    with open(path, 'r') as f:
+        for line in f:
+            stripped = line.strip()
+            if NULL_FIELD in line:
+                raise UnsupportedSQLError("Dump contains the NULL_FIELD control character")
+            if not pending:
+                if not stripped or stripped.startswith('--'):
+                    continue
+                # Fast path: one complete single-row INSERT on this line
+                values = None
+                if columns is not None:
+                    if stripped.startswith(plain_prefix) and stripped.endswith(');'):
+                        values = stripped[len(plain_prefix):-2]
+                    else:
+                        match = fast_insert.match(stripped)
+                        values = match.group(1) if match else None
+                if values is not None and not MULTI_ROW.search(values):
+                    if HAS_NULL.search(values):
+                        values = _mark_nulls(values)
+                    block.write(values)
+                    block.write('\n')
+                    rows_in_block += 1
+                    if rows_in_block >= block_rows:
+                        flush()
+                    continue
+
+            pending.append(line)
+            statement = ''.join(pending).strip()
+            if not _statement_complete(statement):
+                continue
+            pending = []
+
+            keyword = ' '.join(statement.split(None, 3)[:3]).upper()
+            if keyword.startswith('CREATE TABLE'):
+                name, definitions = _parse_create_table(statement)
+                if name.lower() == table.lower():
+                    columns = [column for column, _ in definitions]
+                    text_columns = [column for column, sql_type in definitions
+                                    if sql_type.startswith(TEXT_TYPES)]
+            elif keyword.startswith('INSERT INTO'):
+                name, insert_columns, rows = _parse_insert(statement)
+                if name.lower() != table.lower():
+                    continue
+                if columns is None:
+                    raise UnsupportedSQLError(f"INSERT into {table} before its CREATE TABLE")
+                for row in rows:
+                    if insert_columns is not None:
+                        values = dict(zip(insert_columns, row))
+                        row = [values.get(column) for column in columns]
+                    block_writer.writerow([NULL_FIELD if value is None else value for value in row])
+                    rows_in_block += 1
+                if rows_in_block >= block_rows:
+                    flush()
+            elif not keyword.startswith(IGNORED_STATEMENTS):
+                raise UnsupportedSQLError(f"Unsupported statement: {statement[:60]}")
+
+    if pending:
+        raise UnsupportedSQLError("Unterminated statement at end of file")
+    if columns is None:
+        raise UnsupportedSQLError(f"No CREATE TABLE for {table}")
+
+    flush()
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _statement_complete(statement):
+    """True once the statement ends with ';' outside a quoted string"""
+    return statement.endswith(';') and statement.count("'") % 2 == 0
+
+
+def _mark_nulls(values):
+    """Value tuple text with every bare NULL keyword (not quoted strings) as NULL_FIELD"""
+    return BARE_NULL.sub(lambda match: match.group(1) or NULL_FIELD, values)
+
+
+def _split_top_level(text):
+    """Split on commas that are not nested inside parentheses"""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _unquote(identifier):
+    return identifier.strip('`"[]')
+
+
+def _parse_create_table(statement):
+    """Return (table name, [(column, SQL TYPE), ...]) of a CREATE TABLE"""
+    header, _, body = statement.partition('(')
+    name = _unquote(header.split()[-1])
+    body = body[:body.rindex(')')]
+
+    definitions = []
+    for part in _split_top_level(body):
+        tokens = part.split()
+        if tokens[0].upper() in ('PRIMARY', 'FOREIGN', 'UNIQUE', 'CONSTRAINT', 'CHECK', 'KEY', 'INDEX'):
+            continue
+        sql_type = tokens[1].upper() if len(tokens) > 1 else ''
+        definitions.append((_unquote(tokens[0]), sql_type))
+    return name, definitions
+
+
+def _parse_insert(statement):
+    """Return (table name, column list or None, rows) of an INSERT statement"""
+    head, _, values = _partition_values(statement)
+    head = re.sub(r"^\s*INSERT\s+INTO\s+", '', head, flags=re.IGNORECASE).strip()
+    insert_columns = None
+    if '(' in head:
+        name, _, column_list = head.partition('(')
+        insert_columns = [_unquote(column.strip()) for column in column_list.rstrip(') ').split(',')]
+    else:
+        name = head
+    return _unquote(name.strip()), insert_columns, _parse_value_tuples(values)
+
+
+def _partition_values(statement):
+    match = re.search(r"\bVALUES\b", statement, flags=re.IGNORECASE)
+    if match is None:
+        raise UnsupportedSQLError(f"INSERT without VALUES: {statement[:60]}")
+    return statement[:match.start()], match.group(0), statement[match.end():]
+
+
+def _parse_value_tuples(text):
+    """Tokenize `(v, ...), (v, ...);` into rows of Python values"""
+    rows, row = [], None
+    position = 0
+    text = text.rstrip().rstrip(';')
+    while position < len(text):
+        match = VALUE_TOKEN.match(text, position)
+        if match is None:
+            if text[position:].strip() == '':
+                break
+            raise UnsupportedSQLError(f"Cannot parse VALUES near: {text[position:position + 40]}")
+        position = match.end()
+        string, null, number, open_paren, close_paren, comma = match.groups()
+        if open_paren:
+            row = []
+        elif close_paren:
+            rows.append(row)
+            row = None
+        elif comma:
+            continue
+        elif row is None:
+            raise UnsupportedSQLError(f"Value outside a tuple near: {text[match.start():match.start() + 40]}")
+        elif string is not None:
+            row.append(string.replace("''", "'"))
+        elif null:
+            row.append(None)
+        else:
+            row.append(float(number) if any(c in number for c in '.eE') else int(number))
+    return rows
@@ -0,0 +1,127 @@
+"""
+Spill Join
+Hash-partitioned, on-disk buckets for joining orders with a users table
+that does not fit in memory (a grace hash join).
+
+Both sides are split on the join key as they are read: every block of rows
+is divided by key hash and each piece is appended (pickled) to its
+bucket's file, so neither table has to be whole in memory. The buckets are
+then joined one pair at a time. A key always lands in the same bucket on
+both sides, so per-bucket LEFT JOINs produce exactly the rows of one large
+LEFT JOIN, unmatched and duplicate keys included; a row number carried
+through the spill restores the order of the left side.
+
+The number of buckets follows from a memory budget: enough buckets that
+one pair of them fits in it. The budget bounds the side that is never
+loaded (users); the pipeline still holds the orders before spilling them
+and the assembled result, so its peak memory is not below the in-memory
+join's.
+"""
+
+import math
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from Sketches import hash64
+
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+# Rows of the in-memory side split and spilled per block
+SPILL_BLOCK_ROWS = 500_000
+
+
+class SpillPartitions:
+    def __init__(self, directory, buckets):
+        """Empty set of `buckets` bucket files in `directory`"""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.buckets = buckets
+        self.rows = np.zeros(buckets, dtype=np.int64)
+        self._empty = None
+
+    def add(self, df, key):
+        """Split a block of rows by the hash of `key` and append each piece to its bucket"""
+        if self._empty is None:
+            self._empty = df.iloc[:0]
+        buckets = key_buckets(df[key], self.buckets)
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(self.buckets + 1))
+        for bucket in np.flatnonzero(np.diff(bounds)):
+            piece = df.iloc[order[bounds[bucket]:bounds[bucket + 1]]]
+            with open(self.path(bucket), 'ab') as f:
+                pickle.dump(piece, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.rows[bucket] += len(piece)
+
+    def read(self, bucket):
+        """All rows of one bucket, in the order they were added"""
+        pieces = []
+        if self.rows[bucket]:
+            with open(self.path(bucket), 'rb') as f:
+                while True:
+                    try:
+                        pieces.append(pickle.load(f))
+                    except EOFError:
+                        break
+        if not pieces:
+            return self._empty.copy() if self._empty is not None else pd.DataFrame()
+        return pd.concat(pieces, ignore_index=True) if len(pieces) > 1 else pieces[0].reset_index(drop=True)
+
+    def path(self, bucket):
+        return os.path.join(self.directory, f"bucket-{bucket:05d}.pkl")
+
+    @property
+    def size_bytes(self):
+        return sum(os.path.getsize(self.path(bucket)) for bucket in np.flatnonzero(self.rows))
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def concat_buckets(frames, row_number):
+    """Joined buckets as one frame, in the order of their `row_number` column
+
+    Built column by column. Categoricals whose categories differ between
+    buckets (e.g. users compacted bucket by bucket) are combined into one
+    categorical with sorted categories instead of falling back to strings.
+    """
+    if not frames:
+        raise ValueError("No joined buckets; join at least one (empty) bucket pair for the columns")
+    order = np.argsort(np.concatenate([frame[row_number].to_numpy() for frame in frames]), kind='stable')
+    columns = {}
+    for column in frames[0].columns.drop(row_number):
+        pieces = [frame[column] for frame in frames]
+        if all(isinstance(piece.dtype, pd.CategoricalDtype) for piece in pieces):
+            values = pd.Series(union_categoricals(pieces, sort_categories=True))
+        else:
+            values = pd.concat(pieces, ignore_index=True)
+        columns[column] = values.iloc[order].reset_index(drop=True)
+    return pd.DataFrame(columns)
+
+
+def key_buckets(keys, buckets):
+    """Bucket (0..buckets-1) of every join key; equal keys share a bucket
+
+    Ids read as floats (because some are missing) hash like the integers
+    they hold; missing keys all go to bucket 0.
+    """
+    keys = pd.Series(keys)
+    missing = keys.isna().to_numpy()
+    if keys.dtype.kind in 'iuf':
+        keys = keys.fillna(0).astype(np.int64)
+    elif missing.any():
+        keys = keys.where(~missing, '')
+    bucket = (hash64(keys) % np.uint64(buckets)).astype(np.int64)
+    bucket[missing] = 0
+    return bucket
+
+
+def bucket_count(input_bytes, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Buckets needed so that 1/buckets of the inputs fits in the memory budget"""
+    if memory_budget_mb <= 0:
+        raise ValueError("memory_budget_mb must be positive")
+    return max(1, math.ceil(input_bytes / (memory_budget_mb * 1024 ** 2)))
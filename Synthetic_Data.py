@@ -0,0 +1,186 @@
+"""
+Synthetic Data Generator
+Writes orders.csv, users.json and restaurants.sql in the project's source
+schemas at any scale (10k to 100M orders), for benchmarks and load tests.
+
+Row counts, key cardinalities and key skew are configurable: with a skew
+s > 0 the user and restaurant ids of orders follow a Zipf-like distribution
+(the k-th most popular id is drawn with probability proportional to
+1 / k**s), so a few users and restaurants account for most orders, as in
+real delivery data. Orders are generated and written in blocks, so memory
+does not grow with the number of orders.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+CITIES = ['Bangalore', 'Chennai', 'Hyderabad', 'Pune']
+CUISINES = ['Chinese', 'Indian', 'Italian', 'Mexican']
+MEMBERSHIPS = ['Gold', 'Regular']
+
+ORDER_COLUMNS = ['order_id', 'user_id', 'restaurant_id', 'order_date', 'total_amount', 'restaurant_name']
+
+# Orders generated and written per block
+DEFAULT_BLOCK_ROWS = 1_000_000
+
+
+def generate_dataset(output_dir, orders=10_000, users=3_000, restaurants=500,
+                     user_skew=0.0, restaurant_skew=0.0, unknown_user_rate=0.0,
+                     start_date='2023-01-01', end_date='2023-12-31',
+                     cities=None, cuisines=None, users_format='json', seed=0,
+                     block_rows=DEFAULT_BLOCK_ROWS):
+    """Write orders.csv, users.json (or users.jsonl) and restaurants.sql to `output_dir`
+
+    `unknown_user_rate` is the share of orders whose user_id has no user
+    record (exercises the LEFT JOIN). Returns the paths of the three files.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {
+        'orders': os.path.join(output_dir, 'orders.csv'),
+        'users': os.path.join(output_dir, 'users.jsonl' if users_format == 'jsonl' else 'users.json'),
+        'restaurants': os.path.join(output_dir, 'restaurants.sql'),
+    }
+
+    write_users(paths['users'], users, cities or CITIES, rng, json_lines=users_format == 'jsonl')
+    write_restaurants(paths['restaurants'], restaurants, cuisines or CUISINES, rng)
+    write_orders(paths['orders'], orders, users, restaurants, user_skew, restaurant_skew,
+                 unknown_user_rate, start_date, end_date, rng, block_rows)
+    return paths
+
+
+def zipf_sampler(n_keys, skew, rng):
+    """Function drawing ids 1..n_keys, uniformly or with Zipf-like skew"""
+    if skew <= 0:
+        return lambda size: rng.integers(1, n_keys + 1, size)
+
+    # Popularity ranks are assigned to ids in random order
+    weights = 1.0 / np.arange(1, n_keys + 1) ** skew
+    cumulative = np.cumsum(weights)
+    cumulative /= cumulative[-1]
+    ids = rng.permutation(n_keys) + 1
+
+    def sample(size):
+        ranks = np.searchsorted(cumulative, rng.random(size), side='right')
+        return ids[np.minimum(ranks, n_keys - 1)]
+    return sample
+
+
+def write_orders(path, n_orders, n_users, n_restaurants, user_skew, restaurant_skew,
+                 unknown_user_rate, start_date, end_date, rng, block_rows=DEFAULT_BLOCK_ROWS):
+    """orders.csv with dd-mm-YYYY dates and the restaurant name denormalized"""
+    sample_user = zipf_sampler(n_users, user_skew, rng)
+    sample_restaurant = zipf_sampler(n_restaurants, restaurant_skew, rng)
+
+    # Formatted once per distinct date / restaurant and gathered by index
+    dates = pd.date_range(start_date, end_date, freq='D').strftime('%d-%m-%Y').to_numpy()
+    restaurant_names = np.array([f"Restaurant_{i}" for i in range(n_restaurants + 1)], dtype=object)
+
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(ORDER_COLUMNS) + '\n')
+        for start in range(0, n_orders, block_rows):
+            size = min(block_rows, n_orders - start)
+            user_ids = sample_user(size)
+            if unknown_user_rate > 0:
+                unknown = rng.random(size) < unknown_user_rate
+                user_ids[unknown] = n_users + rng.integers(1, n_users + 1, unknown.sum())
+            restaurant_ids = sample_restaurant(size)
+            block = pd.DataFrame({
+                'order_id': np.arange(start + 1, start + size + 1),
+                'user_id': user_ids,
+                'restaurant_id': restaurant_ids,
+                'order_date': dates[rng.integers(0, len(dates), size)],
+                'total_amount': np.round(rng.uniform(100, 1500, size), 2),
+                'restaurant_name': restaurant_names[restaurant_ids],
+            })
+            block.to_csv(f, header=False, index=False, float_format='%.2f')
+
+
+def write_users(path, n_users, cities, rng, json_lines=False):
+    """users.json as an indented JSON array (or one object per line)"""
+    city = np.asarray(cities, dtype=object)[rng.integers(0, len(cities), n_users)]
+    membership = np.asarray(MEMBERSHIPS, dtype=object)[rng.integers(0, len(MEMBERSHIPS), n_users)]
+
+    if json_lines:
+        template = '{"user_id": %d, "name": "User_%d", "city": "%s", "membership": "%s"}'
+        separator, opening, closing = '\n', '', '\n'
+    else:
+        template = ('  {\n    "user_id": %d,\n    "name": "User_%d",\n'
+                    '    "city": "%s",\n    "membership": "%s"\n  }')
+        separator, opening, closing = ',\n', '[\n', '\n]'
+
+    with open(path, 'w') as f:
+        f.write(opening)
+        for start in range(0, n_users, DEFAULT_BLOCK_ROWS):
+            stop = min(start + DEFAULT_BLOCK_ROWS, n_users)
+            if start:
+                f.write(separator)
+            f.write(separator.join(
+                template % (i + 1, i + 1, city[i], membership[i]) for i in range(start, stop)
+            ))
+        f.write(closing)
+
+
+def write_restaurants(path, n_restaurants, cuisines, rng):
+    """restaurants.sql: CREATE TABLE plus one INSERT per restaurant"""
+    cuisine = np.asarray(cuisines, dtype=object)[rng.integers(0, len(cuisines), n_restaurants)]
+    rating = rng.integers(30, 51, n_restaurants) / 10
+
+    with open(path, 'w') as f:
+        f.write("\nCREATE TABLE restaurants (\n"
+                "    restaurant_id INT,\n"
+                "    restaurant_name VARCHAR(100),\n"
+                "    cuisine VARCHAR(50),\n"
+                "    rating DECIMAL(2,1)\n"
+                ");\n\n")
+        for start in range(0, n_restaurants, DEFAULT_BLOCK_ROWS):
+            stop = min(start + DEFAULT_BLOCK_ROWS, n_restaurants)
+            f.writelines(
+                f"INSERT INTO restaurants VALUES ({i + 1}, 'Restaurant_{i + 1}', '{cuisine[i]}', {rating[i]:.1f});\n"
+                for i in range(start, stop)
+            )
+
+
+def parse_args(argv=None):
+    """Command line options for the generator"""
+    parser = argparse.ArgumentParser(description="Generate synthetic food delivery source data")
+    parser.add_argument('output_dir', help="Directory for orders.csv, users.json and restaurants.sql")
+    parser.add_argument('--orders', type=int, default=10_000, help="Number of orders")
+    parser.add_argument('--users', type=int, default=3_000, help="Number of users (user_id cardinality)")
+    parser.add_argument('--restaurants', type=int, default=500,
+                        help="Number of restaurants (restaurant_id cardinality)")
+    parser.add_argument('--user-skew', type=float, default=0.0,
+                        help="Zipf exponent of order user_ids (0 = uniform, ~1 = heavy skew)")
+    parser.add_argument('--restaurant-skew', type=float, default=0.0,
+                        help="Zipf exponent of order restaurant_ids")
+    parser.add_argument('--unknown-user-rate', type=float, default=0.0,
+                        help="Share of orders whose user_id has no user record")
+    parser.add_argument('--start-date', default='2023-01-01', help="First order date")
+    parser.add_argument('--end-date', default='2023-12-31', help="Last order date")
+    parser.add_argument('--cities', nargs='+', default=CITIES, help="City values of users")
+    parser.add_argument('--cuisines', nargs='+', default=CUISINES, help="Cuisine values of restaurants")
+    parser.add_argument('--users-format', choices=['json', 'jsonl'], default='json',
+                        help="users.json as a JSON array (default) or users.jsonl as JSON Lines")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = generate_dataset(
+        args.output_dir, orders=args.orders, users=args.users, restaurants=args.restaurants,
+        user_skew=args.user_skew, restaurant_skew=args.restaurant_skew,
+        unknown_user_rate=args.unknown_user_rate,
+        start_date=args.start_date, end_date=args.end_date,
+        cities=args.cities, cuisines=args.cuisines,
+        users_format=args.users_format, seed=args.seed
+    )
+    for name, path in paths.items():
+        print(f"✓ {name}: {path} ({os.path.getsize(path) / 1024 ** 2:,.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Partitioned execution with worker processes that are spawned rather than
+forked (the only start method on Windows, the default on macOS): the
+integration object is pickled into every worker.
+"""
+
+import os
+import pickle
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Food_Delivery_Data_Integration import FoodDeliveryDataIntegration  # noqa: E402
+from OLAP_Cube import OLAPCube  # noqa: E402
+from Partitioned_Execution import PartitionedExecutor, partition_orders  # noqa: E402
+from Pipeline_Profiler import StageProfiler  # noqa: E402
+from Synthetic_Data import generate_dataset  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def integration(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('data')
+    paths = generate_dataset(str(directory), orders=5_000, users=800, restaurants=60,
+                             unknown_user_rate=0.01)
+    integration = FoodDeliveryDataIntegration(paths['orders'], paths['users'], paths['restaurants'],
+                                              profiler=StageProfiler(), verbose=False)
+    integration.load_csv_data()
+    integration.load_json_data()
+    integration.load_sql_data()
+    integration.merge_datasets()
+    integration.create_final_dataset(str(directory / 'serial.csv'))
+    return integration
+
+
+def test_integration_pickles_inside_a_stage(integration):
+    with integration.profiler.stage('outer'):
+        copy = pickle.loads(pickle.dumps(integration))
+    assert copy.store is None
+    assert copy.profiler._active == []
+    with copy.profiler.stage('inner'):
+        pass
+    pd.testing.assert_frame_equal(copy.final_df, integration.final_df)
+
+
+@pytest.mark.parametrize('partition_by', ['month', 'user'])
+def test_spawned_workers_build_the_serial_cube(integration, partition_by):
+    partitions = partition_orders(integration.final_df, partition_by, 3)
+    with PartitionedExecutor(integration, 2, start_method='spawn') as executor:
+        cube = executor.build_cube(partitions)
+
+    serial = OLAPCube.build(integration.final_df)
+    for keys in ['city', 'cuisine', ['year', 'month_name'], 'user_id', 'restaurant_id']:
+        pd.testing.assert_frame_equal(cube.rollup(keys), serial.rollup(keys), check_exact=False)
+    assert cube.amount_summary() == pytest.approx(serial.amount_summary())
+
+
+def test_spawned_workers_write_the_serial_csv(integration, tmp_path):
+    path = str(tmp_path / 'workers.csv')
+    with PartitionedExecutor(integration, 2, start_method='spawn') as executor:
+        executor.write_csv(path)
+
+    serial = os.path.join(os.path.dirname(integration.orders_path), 'serial.csv')
+    with open(path, 'rb') as f, open(serial, 'rb') as g:
+        assert f.read() == g.read()
+    assert not [name for name in os.listdir(tmp_path) if '.part' in name or name.endswith('.tmp')]